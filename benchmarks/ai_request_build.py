@@ -0,0 +1,66 @@
+"""
+Cost of building a v5 AI request, per call.
+
+"kwargs" resolves the customisation parameters of `get_ai_response` on every call,
+"persona" uses a `BotPersona` created once and builds the complete URL itself. Both
+columns include encoding the final URL the way `requests` does when sending it, a
+persona URL is only passed through without params.
+
+    PYTHONPATH=. python benchmarks/ai_request_build.py
+"""
+import argparse
+import timeit
+
+from requests.models import PreparedRequest
+
+import randomstuff
+from randomstuff.persona import _EncodedURL
+
+CUSTOMISATION = {
+    "name": "Mia",
+    "master": "Ahmad",
+    "gender": "Female",
+    "company": "Example Inc.",
+    "favorite_color": "Green",
+    "favorite_book": "Dune",
+}
+
+
+def prepare(params, url):
+    request = PreparedRequest()
+    request.prepare_url(url, None if isinstance(url, _EncodedURL) else params)
+    return request.url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    client = randomstuff.Client(api_key="key", suppress_warnings=True)
+    persona = randomstuff.BotPersona("pro", server="main", **CUSTOMISATION)
+
+    cases = {
+        "kwargs": lambda: client._resolve_ai_params(
+            "Hello there", "pro", server="main", **CUSTOMISATION
+        ),
+        "persona": lambda: client._resolve_ai_params("Hello there", persona=persona),
+    }
+
+    print(f"{'':<8} {'resolve (us)':>13} {'+ encode (us)':>14}")
+    for name, build in cases.items():
+        resolve = min(timeit.repeat(build, number=args.number, repeat=5))
+        encode = min(
+            timeit.repeat(
+                lambda: prepare(*build()), number=args.number // 4, repeat=5
+            )
+        )
+        print(
+            f"{name:<8} {resolve / args.number * 1e6:>13.2f}"
+            f" {encode / (args.number // 4) * 1e6:>14.2f}"
+        )
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Throughput of `AsyncClient.fetch_many` against a local mock server.
+
+Every request waits `--delay` seconds on the server, so the achieved
+requests/second should scale close to linearly with the concurrency limit
+until the event loop becomes the bottleneck.
+
+    python benchmarks/batch_throughput.py --requests 400 --delay 0.02
+"""
+import argparse
+import asyncio
+import time
+
+import randomstuff
+from mock_server import MockServer
+
+
+CALLS = [
+    ("get_ai_response", ("Hello",), {}),
+    ("get_joke", {"type": "dev"}),
+    ("get_image", {"type": "cat"}),
+    ("get_weather", ("London",), {}),
+    ("get_covid_data", {"country": "India"}),
+]
+
+
+async def run(total: int, delay: float, levels):
+    async with MockServer(delay=delay) as server:
+        async with randomstuff.AsyncClient(api_key="key") as client:
+            server.attach(client)
+            calls = [CALLS[i % len(CALLS)] for i in range(total)]
+
+            print(f"{'concurrency':>11} {'seconds':>8} {'req/s':>9} {'errors':>6}")
+            for concurrency in levels:
+                start = time.perf_counter()
+                results = await client.fetch_many(calls, concurrency=concurrency)
+                elapsed = time.perf_counter() - start
+                errors = sum(not result.ok for result in results)
+                print(
+                    f"{concurrency:>11} {elapsed:>8.3f} {total / elapsed:>9.1f} {errors:>6}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument(
+        "--levels", type=int, nargs="+", default=[1, 4, 16, 64, 128]
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.delay, args.levels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Per-call overhead of the client's non-network path.
+
+The network is taken out by answering `_request` with a recorded payload, so what
+is measured is argument validation, the async-environment check, building the
+request and turning the payload into data classes.
+
+"before" swaps in the previous `_check_coro`, which called `inspect.stack()` on
+every call, to show what the cheap running-loop check saves. Calls are made
+`--depth` frames deep because the cost of `inspect.stack()` grows with the stack.
+
+    PYTHONPATH=. python benchmarks/call_overhead.py
+"""
+import argparse
+import inspect
+import json
+import timeit
+
+import randomstuff
+from randomstuff import client as client_module
+from randomstuff._helper import _warn
+from mock_server import load_payload
+
+
+def legacy_check_coro(client) -> None:
+    tup = inspect.stack()[2]
+    try:
+        if inspect.iscoroutinefunction(tup[0].f_globals[tup[3]]):
+            _warn(client, "async environment")
+    except KeyError:
+        return
+
+
+PAYLOADS = {
+    "ai": json.loads(load_payload("ai.json")),
+    "joke": json.loads(load_payload("joke.json")),
+    "image": ["https://i.redd.it/example.jpg"],
+    "waifu": [{"url": "https://i.waifu.pics/example.png"}],
+}
+
+CALLS = {
+    "get_ai_response": lambda client: client.get_ai_response("Hello"),
+    "get_joke": lambda client: client.get_joke(type="dev"),
+    "get_image": lambda client: client.get_image(type="cat"),
+    "get_waifu": lambda client: client.get_waifu("pro", type="neko"),
+}
+
+
+def nested(depth: int, func):
+    if depth == 0:
+        return func()
+    return nested(depth - 1, func)
+
+
+def measure(client, call, depth: int, number: int) -> float:
+    return (
+        min(
+            timeit.repeat(
+                lambda: nested(depth, lambda: call(client)), number=number, repeat=5
+            )
+        )
+        / number
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=30)
+    args = parser.parse_args()
+
+    client = randomstuff.Client(api_key="key", suppress_warnings=True)
+    client._request = lambda method, endpoint, url, **kwargs: PAYLOADS[endpoint]
+
+    current = client_module._check_coro
+    print(f"{'method':<16} {'before (us)':>12} {'after (us)':>11} {'speedup':>8}")
+    for name, call in CALLS.items():
+        client_module._check_coro = legacy_check_coro
+        before = measure(client, call, args.depth, args.number)
+        client_module._check_coro = current
+        after = measure(client, call, args.depth, args.number)
+        print(
+            f"{name:<16} {before * 1e6:>12.2f} {after * 1e6:>11.2f} {before / after:>7.1f}x"
+        )
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
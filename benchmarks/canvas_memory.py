@@ -0,0 +1,118 @@
+"""
+Measures the peak memory of downloading one canvas image of various sizes.
+
+"buffered" is how `canvas` used to work: read the whole body, parse it, decode the
+base64 string and wrap it in a `BytesIO`. The others stream the body and decode it
+in chunks, into a `BytesIO` ("stream") or straight into a file ("file", "async file").
+
+Every download runs in a fresh process and the reported number is how much its peak
+RSS grew during the download, so the results don't affect each other. The mock
+server runs in this process.
+
+    PYTHONPATH=. python benchmarks/canvas_memory.py --sizes 4 16 64
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+
+import randomstuff
+from mock_server import MockServer
+
+MODES = ["buffered", "stream", "file", "async file"]
+
+
+def peak_rss() -> int:
+    """Returns the peak RSS of this process in bytes."""
+    # ru_maxrss survives exec on Linux, so a fresh process would start at the peak
+    # of this one. VmHWM doesn't.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def download(mode: str, base_url: str) -> int:
+    query = {"method": "trigger", "img1": "https://example.com/avatar.png"}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "image.gif")
+
+        if mode == "async file":
+
+            async def run():
+                async with randomstuff.AsyncClient(api_key="key") as client:
+                    client._base_url = base_url
+                    before = peak_rss()
+                    await client.canvas(**query, save_to=path)
+                    return peak_rss() - before
+
+            return asyncio.run(run())
+
+        with randomstuff.Client(api_key="key") as client:
+            client._base_url = base_url
+            before = peak_rss()
+            if mode == "buffered":
+                io.BytesIO(base64.b64decode(client._call("canvas", **query)))
+            elif mode == "stream":
+                client.canvas(**query)
+            else:
+                client.canvas(**query, save_to=path)
+            return peak_rss() - before
+
+
+def serve(size: int, ready: threading.Event, stop: threading.Event, urls: list):
+    async def run():
+        async with MockServer(canvas_size=size) as server:
+            urls.append(server.base_url)
+            ready.set()
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64], help="MiB")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(download(*args.child))
+        return
+
+    print(f"{'image':>8}" + "".join(f" {mode:>12}" for mode in MODES))
+    for size in args.sizes:
+        ready, stop, urls = threading.Event(), threading.Event(), []
+        thread = threading.Thread(target=serve, args=(size << 20, ready, stop, urls))
+        thread.start()
+        ready.wait()
+
+        row = f"{size:>5}MiB"
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, urls[0]],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            row += f" {int(output) / (1 << 20):>9.1f}MiB"
+        print(row)
+
+        stop.set()
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
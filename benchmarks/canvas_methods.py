@@ -0,0 +1,104 @@
+"""
+Cost of validating a canvas call and building its query, per call.
+
+"legacy" is how `canvas` used to do it: `_validate_method_image` and
+`_image_query_params`, which rebuilt the method dict three times and scanned
+`ALL_METHODS`. "table" is `_canvas_query`, a single lookup in the method table built
+at import. `distracted` isn't measured for "legacy", which raised `AttributeError`
+for it.
+
+    PYTHONPATH=. python benchmarks/canvas_methods.py
+"""
+import argparse
+import timeit
+
+from randomstuff.constants import *
+from randomstuff._helper import _canvas_query
+
+CALLS = {
+    "trigger": {"img1": "https://example.com/a.png"},
+    "kiss": {"img1": "https://example.com/a.png", "img2": "https://example.com/b.png"},
+    "distracted": {
+        "img1": "https://example.com/a.png",
+        "img2": "https://example.com/b.png",
+        "img3": "https://example.com/c.png",
+    },
+    "changemymind": {"txt": "Tabs are better than spaces"},
+}
+
+
+def _get_method_images(method: str):
+    final = {key: 1 for key in ONE_IMAGE_METHODS}
+    for key in TWO_IMAGE_METHODS:
+        final[key] = 2
+    for key in THREE_IMAGE_METHODS:
+        final[key] = 3
+    for key in TEXT_METHODS:
+        final[key] = 4
+    return final[method]
+
+
+def _validate_method_image(method, **kwargs):
+    if method not in ALL_METHODS:
+        raise ValueError("Method not supported.")
+
+    img1, img2, img3, txt = (kwargs.get(i) for i in ["img1", "img2", "img3", "txt"])
+
+    images = _get_method_images(method)
+
+    if (images == 1) and (img1 is None):
+        raise ValueError(f"img1 is required for method {method}")
+    if (images == 2) and (not all([img1, img2])):
+        raise ValueError(f"img1 and img2 are required for method {method}")
+    if (images == 3) and (not all([img1, img2.img3])):
+        raise ValueError(f"img1, img2 and img3 are required for method {method}")
+    if (images == 4) and (txt is None):
+        raise ValueError(f"txt is required for method {method}")
+
+
+def _image_query_params(method, *, img1=None, img2=None, img3=None, txt=None):
+    images = _get_method_images(method)
+    query = {"method": method}
+    data = {
+        1: {"img1": img1},
+        2: {"img1": img1, "img2": img2},
+        3: {"img1": img1, "img2": img2, "img3": img3},
+        4: {"txt": txt},
+    }
+    query.update(data[images])
+    return query
+
+
+def legacy(method, **inputs):
+    _validate_method_image(method.lower(), **inputs)
+    return _image_query_params(method.lower(), **inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'method':<14} {'legacy (us)':>12} {'table (us)':>11} {'speedup':>8}")
+    for method, inputs in CALLS.items():
+        timings = []
+        for build in [legacy, _canvas_query]:
+            if build is legacy and method == "distracted":
+                timings.append(None)
+                continue
+            seconds = min(
+                timeit.repeat(
+                    lambda: build(method, **inputs), number=args.number, repeat=5
+                )
+            )
+            timings.append(seconds / args.number * 1e6)
+
+        old, new = timings
+        if old is None:
+            print(f"{method:<14} {'error':>12} {new:>11.2f} {'':>8}")
+        else:
+            print(f"{method:<14} {old:>12.2f} {new:>11.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
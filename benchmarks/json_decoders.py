@@ -0,0 +1,46 @@
+"""
+Compares the JSON decoders available to `json_decoder` on the recorded payloads.
+
+"json" is the standard library, the fallback the clients use when neither `orjson`
+nor `ujson` is installed. Decoders which aren't installed are skipped.
+
+    PYTHONPATH=. python benchmarks/json_decoders.py
+"""
+import argparse
+import timeit
+
+from randomstuff.decoders import _load_decoder
+from mock_server import PAYLOADS
+
+
+def load_decoders():
+    decoders = {}
+    for name in ["json", "ujson", "orjson"]:
+        try:
+            decoders[name] = _load_decoder(name)
+        except ImportError:
+            print(f"{name} is not installed, skipping")
+    return decoders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    decoders = load_decoders()
+    payloads = {path.stem: path.read_bytes() for path in sorted(PAYLOADS.glob("*.json"))}
+
+    print(f"{'payload':<16} {'bytes':>6}" + "".join(f" {name:>11}" for name in decoders))
+    for name, body in payloads.items():
+        row = f"{name:<16} {len(body):>6}"
+        for decode in decoders.values():
+            seconds = min(
+                timeit.repeat(lambda: decode(body), number=args.number, repeat=5)
+            )
+            row += f" {seconds / args.number * 1e6:>9.2f}us"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
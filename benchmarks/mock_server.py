@@ -0,0 +1,139 @@
+"""
+A tiny local stand-in for Random Stuff API used by the benchmarks.
+
+It serves the recorded payloads in ``benchmarks/payloads`` for the v5 endpoints
+with an optional artificial latency so that network waits can be simulated
+without touching the real API.
+
+Usage
+-----
+
+    async with MockServer(delay=0.05) as server:
+        async with randomstuff.AsyncClient(api_key="key") as client:
+            server.attach(client)
+            await client.get_joke()
+"""
+import asyncio
+import base64
+import json
+import pathlib
+import random
+
+from aiohttp import web
+
+PAYLOADS = pathlib.Path(__file__).parent / "payloads"
+
+
+def load_payload(name: str) -> bytes:
+    """Returns the raw bytes of a recorded payload."""
+    return (PAYLOADS / name).read_bytes()
+
+
+class MockServer:
+    """Serves recorded payloads on ``127.0.0.1``.
+
+    Parameters
+    ----------
+      delay : float
+        Seconds to wait before answering each request.
+
+      canvas_size : int
+        Size in bytes of the (random) image returned by the canvas endpoint.
+
+    AI servers named in `down_servers` answer with 503 and `server_delays` overrides
+    `delay` per AI server.
+    """
+
+    def __init__(self, delay: float = 0.0, canvas_size: int = 64 * 1024):
+        self.delay = delay
+        self.requests = 0
+        self.statuses = {}
+        self._failures = {}
+        self.down_servers = set()
+        self.server_delays = {}
+        self._runner = None
+        self.port = None
+        self._bodies = {
+            "ai": load_payload("ai.json"),
+            "premium/joke": load_payload("joke.json"),
+            "weather": load_payload("weather.json"),
+            "image": json.dumps(["https://i.redd.it/example.jpg"]).encode(),
+            "waifu": json.dumps([{"url": "https://i.waifu.pics/example.png"}]).encode(),
+        }
+        self._covid_country = load_payload("covid_country.json")
+        self._covid_global = load_payload("covid_global.json")
+        self.canvas_image = (
+            random.Random(canvas_size)
+            .getrandbits(canvas_size * 8)
+            .to_bytes(canvas_size, "little")
+        )
+        self._canvas = json.dumps(
+            [{"base64": base64.b64encode(self.canvas_image).decode()}]
+        ).encode()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v5"
+
+    def fail(self, path: str, status: int, times: int = 1, headers=None) -> None:
+        """Makes the next `times` requests to `path` answer with `status`."""
+        self._failures.setdefault(path, []).extend(
+            [(status, headers or {})] * times
+        )
+
+    def attach(self, client) -> None:
+        """Points a client at this server instead of the real API."""
+        client._base_url = self.base_url
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        server = request.query.get("server")
+        delay = self.server_delays.get(server, self.delay)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if server in self.down_servers:
+            return web.Response(status=503, text="server down")
+
+        path = "/".join(part for part in request.path.split("/") if part)
+        path = path[len("v5/"):]
+
+        if self._failures.get(path):
+            status, headers = self._failures[path].pop(0)
+            return web.Response(status=status, text="mocked error", headers=headers)
+
+        status = self.statuses.get(path)
+        if status is not None:
+            return web.Response(status=status, text="mocked error")
+
+        if path.endswith("/waifu"):
+            body = self._bodies["waifu"]
+        elif path.endswith("ai"):
+            body = self._bodies["ai"]
+        elif path == "covid":
+            body = (
+                self._covid_country
+                if request.query.get("country")
+                else self._covid_global
+            )
+        elif path == "canvas":
+            body = self._canvas
+        else:
+            body = self._bodies.get(path)
+
+        if body is None:
+            return web.Response(status=404, text="not found")
+        return web.Response(body=body, content_type="application/json")
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        await self._runner.cleanup()
@@ -15,6 +15,23 @@ from .errors import *
 from .joke import *
 from .waifu import *
 from .covid import *
+from .batch import *
+from .transport import *
+from .ratelimit import *
+from .retry import *
+from .metrics import *
+from .servers import *
+from .hedging import *
+from .cache import *
+from .prefetch import *
+from .decoders import *
+from .persona import *
+from .keys import *
+from .breaker import *
+from .timeouts import *
+from .concurrency import *
+from .scheduler import *
+from .canvas import *
 from . import utils
 
 __title__ = 'randomstuff.py'
@@ -0,0 +1,282 @@
+"""Internal registry of the API's endpoints.
+
+Every endpoint method of `Client` and `AsyncClient` looks up its `_Endpoint` here by
+API version and name, builds the URL and query from it and parses the decoded body
+with its parser. Supporting a new version or endpoint only means adding entries.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .ai_response import *
+from .covid import *
+from .errors import *
+from .joke import *
+from .waifu import *
+from .weather import *
+
+
+# Default of the AI endpoints' session parameter, replaced by the client's own uid.
+_UID = object()
+
+
+@dataclass(frozen=True)
+class _Endpoint:
+    """
+    Represents an endpoint of a single API version.
+
+    Attributes
+    ----------
+
+      name : str
+        The name of the endpoint, also used for rate limits and metrics.
+
+      method : str
+        The HTTP method.
+
+      path : str
+        The path relative to the versioned base URL. `{name}` placeholders are filled
+        from the call's values.
+
+      plan_path : Optional[str]
+        The path used instead of `path` when a plan is passed.
+
+      params : Tuple[Tuple[str, str, Any], ...]
+        The query as `(param, value, default)`. The param is taken from the call's
+        values by the name `value`. Params which end up `None` are not sent.
+
+      parse : Callable[[Any, dict], Any]
+        Turns the decoded body and the sent query into the method's result.
+    """
+
+    name: str
+    method: str
+    path: str
+    parse: Callable[[Any, dict], Any]
+    params: Tuple[Tuple[str, str, Any], ...] = ()
+    plan_path: Optional[str] = None
+
+    def build(self, base_url: str, values: dict, uid: str = None):
+        """Returns the URL and the query of a call."""
+        params = {}
+        for param, value, default in self.params:
+            value = values.get(value, default)
+            if value is _UID:
+                value = uid
+            if value is not None:
+                params[param] = value
+
+        path = self.plan_path if self.plan_path and values.get("plan") else self.path
+        return f"{base_url}/{path.format_map(values)}", params
+
+
+def _params(*names: str) -> Tuple[Tuple[str, str, Any], ...]:
+    return tuple((name, name, None) for name in names)
+
+
+def _parse_ai_v3(response, params) -> AIResponse:
+    return AIResponse(
+        message=response[0].get("message"),
+        response=response[0].get("message"),
+        api_key=response[0].get("api_key"),
+        success=response[0].get("success"),
+    )
+
+
+def _parse_ai_v4(response, params) -> AIResponse:
+    return AIResponse(
+        message=response[0].get("message"),
+        response=response[0].get("message"),
+        response_time=response[1].get("response_time"),
+        success=True,
+        uid=params.get("uid"),
+        server=params.get("server"),
+    )
+
+
+def _parse_ai_v5(response, params) -> AIResponse:
+    return AIResponse(
+        message=response[0].get("response"),
+        response=response[0].get("response"),
+        success=True,
+        uid=params.get("uid"),
+        server=params.get("server"),
+    )
+
+
+def _parse_joke(response, params) -> Joke:
+    return Joke(
+        category=response.get("category"),
+        type=response.get("type"),
+        joke=response.get("joke")
+        if response.get("joke")
+        else {
+            "setup": response.get("setup"),
+            "delivery": response.get("delivery"),
+        },
+        flags=JokeFlags(**response.get("flags")),
+        id=response.get("id"),
+        safe=response.get("safe"),
+        lang=response.get("lang"),
+    )
+
+
+def _parse_image(response, params) -> str:
+    return response[0]
+
+
+def _parse_waifu(response, params) -> Waifu:
+    return Waifu(url=response[0]["url"])
+
+
+def _parse_weather(response, params) -> Weather:
+    if response[0].get("error") is True:
+        raise InvalidCityError(response[0].get("message"))
+
+    return Weather(
+        location=WeatherLocation(**response[0].get("location", {})),
+        current=CurrentWeather(**response[0].get("current", {})),
+        forecast=[
+            WeatherForecast(**forecast) for forecast in response[0].get("forecast")
+        ],
+    )
+
+
+def _parse_covid(response, params):
+    if not "country" in params:
+        return GlobalCovidData(
+            total_cases=response.get("totalCases"),
+            total_deaths=response.get("totalDeaths"),
+            total_recovered=response.get("totalRecovered"),
+            active_cases=response.get("activeCases"),
+            closed_cases=response.get("closedCases"),
+            condition=CovidCondition(
+                mild=response.get("condition")["mild"],
+                critical=response.get("condition")["critical"],
+            ),
+        )
+
+    return CountryCovidData(
+        country=Country(
+            name=response.get("country")["name"],
+            flag_img=response.get("country")["flagImg"],
+        ),
+        cases=Cases(
+            total=response.get("cases")["total"],
+            recovered=response.get("cases")["recovered"],
+            deaths=response.get("cases")["deaths"],
+        ),
+        closed_cases=ClosedCases(
+            total=response.get("closedCases")["total"],
+            percentage=ClosedCasesPercentage(
+                death=response.get("closedCases")["percentage"]["death"],
+                discharge=response.get("closedCases")["percentage"]["discharge"],
+            ),
+        ),
+    )
+
+
+def _parse_canvas(response, params) -> str:
+    return response[0]["base64"]
+
+
+_CANVAS = _Endpoint(
+    "canvas",
+    "POST",
+    "canvas",
+    _parse_canvas,
+    params=_params("method", "img1", "img2", "img3", "txt"),
+)
+
+_WEATHER = _Endpoint("weather", "GET", "weather", _parse_weather, _params("city"))
+
+_IMAGE = _Endpoint("image", "GET", "image", _parse_image, _params("type"))
+
+ENDPOINTS: Dict[str, Dict[str, _Endpoint]] = {
+    "3": {
+        "ai": _Endpoint(
+            "ai",
+            "GET",
+            "ai/response",
+            _parse_ai_v3,
+            params=(
+                ("message", "message", None),
+                ("lang", "lang", "en"),
+                ("type", "type", "stable"),
+                ("bot_name", "bot_name", "RSA"),
+                ("dev_name", "dev_name", "PGamerX"),
+                ("unique_id", "unique_id", _UID),
+            ),
+            plan_path="{plan}/ai/response",
+        ),
+        "joke": _Endpoint("joke", "GET", "joke/{type}", _parse_joke),
+        "image": _Endpoint("image", "GET", "image/{type}", _parse_image),
+        "canvas": _CANVAS,
+    },
+    "4": {
+        "ai": _Endpoint(
+            "ai",
+            "GET",
+            "/ai",
+            _parse_ai_v4,
+            params=(
+                ("message", "message", None),
+                ("server", "server", "primary"),
+                ("master", "master", "PGamerX"),
+                ("bot", "bot", "RSA"),
+                ("uid", "uid", _UID),
+                ("language", "language", "en"),
+            ),
+            plan_path="{plan}//ai",
+        ),
+        "joke": _Endpoint("joke", "GET", "joke", _parse_joke, _params("type")),
+        "image": _IMAGE,
+        "waifu": _Endpoint(
+            "waifu", "GET", "{plan}/waifu", _parse_waifu, _params("type")
+        ),
+        "weather": _WEATHER,
+        "canvas": _CANVAS,
+    },
+    "5": {
+        "ai": _Endpoint(
+            "ai",
+            "GET",
+            "/ai",
+            _parse_ai_v5,
+            params=(
+                ("message", "message", None),
+                ("server", "server", "main"),
+                ("uid", "uid", _UID),
+                ("bot_name", "name", "Random Stuff API"),
+                ("bot_master", "master", "PGamerX"),
+                ("bot_gender", "gender", "Male"),
+                ("bot_age", "age", "19"),
+                ("bot_company", "company", "PGamerX Studio"),
+                ("bot_location", "location", "India"),
+                ("bot_email", "email", "admin@pgamerx.com"),
+                ("bot_build", "build", "Public"),
+                ("bot_birth_year", "birth_year", "2002"),
+                ("bot_birth_date", "birth_date", "1st January 2002"),
+                ("bot_birth_place", "birth_place", "India"),
+                ("bot_favorite_color", "favorite_color", "Blue"),
+                ("bot_favorite_book", "favorite_book", "Harry Potter"),
+                ("bot_favorite_band", "favorite_band", "Imagine Doggos"),
+                ("bot_favorite_artist", "favorite_artist", "Eminem"),
+                ("bot_favorite_actress", "favorite_actress", "Emma Watson"),
+                ("bot_favorite_actor", "favorite_actor", "Jim Carrey"),
+            ),
+            plan_path="premium/{plan}//ai",
+        ),
+        "joke": _Endpoint(
+            "joke", "GET", "premium/joke", _parse_joke, _params("type", "blacklist")
+        ),
+        "image": _IMAGE,
+        "waifu": _Endpoint(
+            "waifu", "GET", "premium/{plan}/waifu", _parse_waifu, _params("type")
+        ),
+        "weather": _WEATHER,
+        "covid": _Endpoint(
+            "covid", "GET", "covid", _parse_covid, _params("country")
+        ),
+        "canvas": _CANVAS,
+    },
+}
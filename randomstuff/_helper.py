@@ -1,4 +1,9 @@
-import inspect
+import asyncio
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
 from colorama import init
 from .errors import *
 from .constants import *
@@ -17,17 +22,62 @@ def _warn(client, warning) -> None:
 
 
 def _check_coro(client) -> None:
-    """Private method to initiate warning if the enivornment is asynchronus"""
-    tup = inspect.stack()[2]
+    """Private method to initiate warning if the enivornment is asynchronus
+
+    This runs on every call of synchronous methods so it only checks for a running
+    event loop in the current thread, which is cheap, and warns once per client.
+    """
+    if client._warned_async:
+        return
     try:
-        if inspect.iscoroutinefunction(tup[0].f_globals[tup[3]]):
-            _warn(
-                client,
-                "It seems you're using randomstuff.Client in an async enivornment. It is strongly recommended that you use randomstuff.AsyncClient to avoid blocking functions.",
-            )
-    except KeyError:
+        asyncio.get_running_loop()
+    except RuntimeError:
         return
 
+    client._warned_async = True
+    _warn(
+        client,
+        "It seems you're using randomstuff.Client in an async enivornment. It is strongly recommended that you use randomstuff.AsyncClient to avoid blocking functions.",
+    )
+
+
+async def _wait_for_slot(
+    future: asyncio.Future, release: Callable[[], None], leave: Callable[[], None]
+) -> None:
+    """Waits until a queue hands a slot over by resolving `future`.
+
+    If the wait is cancelled, the slot is passed on with `release` when it was
+    handed over just before the cancellation, otherwise `leave` takes the waiter
+    out of the queue.
+    """
+    try:
+        await future
+    except asyncio.CancelledError:
+        if (
+            future.done()
+            and not future.cancelled()
+            and future.exception() is None
+        ):
+            release()
+        else:
+            leave()
+        raise
+
+
+def _parse_retry_after(headers):
+    """Returns the seconds to wait from a `Retry-After` header or `None`."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 
 def _check_status(response) -> None:
     try:
@@ -42,66 +92,73 @@ def _check_status(response) -> None:
         raise PlanNotAllowed(response.text)
 
     elif status == 429:
-        raise RateLimited(response.text)
+        raise RateLimited(
+            response.text, retry_after=_parse_retry_after(response.headers)
+        )
 
     elif status >= 500:
         raise HTTPError(
             f"An error occured while connecting to the API. Returned with status code: {status}",
             status=status,
+            retry_after=_parse_retry_after(response.headers),
         )
 
 
-def _get_method_images(method: str):
-    final = {key: 1 for key in ONE_IMAGE_METHODS}
-    for key in TWO_IMAGE_METHODS:
-        final[key] = 2
-    for key in THREE_IMAGE_METHODS:
-        final[key] = 3
-    for key in TEXT_METHODS:
-        final[key] = 4
-    return final[method]
+@dataclass(frozen=True)
+class _CanvasMethod:
+    """The query of a canvas method, built once for every method in `_CANVAS_METHODS`."""
 
+    name: str
+    # (param, position in the values passed to `query`) of every required input.
+    inputs: Tuple[Tuple[str, int], ...]
+    error: str
 
-def _validate_method_image(method, **kwargs):
-    if method not in ALL_METHODS:
-        raise ValueError(
-            "Method not supported. "
-            "Visit https://api-docs.pgamerx.com/Canvas/optional-customisation/ for valid methods"
-        )
+    @property
+    def arity(self) -> int:
+        return len(self.inputs)
 
-    img1, img2, img3, txt = (
-        kwargs.get(i) for i in ["img1", "img2", "img3", "txt"]
-    )
+    def query(self, values: Tuple[Optional[str], ...]) -> Dict[str, str]:
+        """Validates the inputs and builds the query in one pass."""
+        query = {"method": self.name}
+        for param, index in self.inputs:
+            value = values[index]
+            if not value:
+                raise ValueError(f"{self.error} required for method {self.name}")
+            query[param] = value
+        return query
 
-    images = _get_method_images(method)
 
-    if (images == 1) and (img1 is None):
-        raise ValueError(f"img1 is required for method {method}")
-    if (images == 2) and (not all([img1, img2])):
-        raise ValueError(f"img1 and img2 are required for method {method}")
-    if (images == 3) and (not all([img1, img2.img3])):
-        raise ValueError(
-            f"img1, img2 and img3 are required for method {method}"
+_CANVAS_INPUTS = ("img1", "img2", "img3", "txt")
+
+_CANVAS_METHODS: Mapping[str, _CanvasMethod] = MappingProxyType(
+    {
+        method.lower(): _CanvasMethod(
+            method, tuple((param, _CANVAS_INPUTS.index(param)) for param in inputs), error
         )
-    if (images == 4) and (txt is None):
-        raise ValueError(f"txt is required for method {method}")
+        for methods, inputs, error in [
+            (ONE_IMAGE_METHODS, ("img1",), "img1 is"),
+            (TWO_IMAGE_METHODS, ("img1", "img2"), "img1 and img2 are"),
+            (THREE_IMAGE_METHODS, ("img1", "img2", "img3"), "img1, img2 and img3 are"),
+            (TEXT_METHODS, ("txt",), "txt is"),
+        ]
+        for method in methods
+    }
+)
 
 
-def _image_query_params(
-    method,
+def _canvas_query(
+    method: str,
     *,
     img1: str = None,
     img2: str = None,
     img3: str = None,
     txt: str = None,
-):
-    images = _get_method_images(method)
-    query = {"method": method}
-    data = {
-        1: {"img1": img1},
-        2: {"img1": img1, "img2": img2},
-        3: {"img1": img1, "img2": img2, "img3": img3},
-        4: {"txt": txt},
-    }
-    query.update(data[images])
-    return query
+) -> Dict[str, str]:
+    """Returns the query of a canvas call, raising `ValueError` for invalid input."""
+    spec = _CANVAS_METHODS.get(method.lower())
+    if spec is None:
+        raise ValueError(
+            "Method not supported. "
+            "Visit https://api-docs.pgamerx.com/Canvas/optional-customisation/ for valid methods"
+        )
+    return spec.query((img1, img2, img3, txt))
@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+BATCH_METHODS = [
+    "get_ai_response",
+    "get_joke",
+    "get_image",
+    "get_waifu",
+    "get_weather",
+    "get_covid_data",
+]
+
+
+@dataclass(frozen=True)
+class BatchRequest:
+    """
+    Represents a single call in a batch passed to `AsyncClient.fetch_many`.
+
+    Attributes
+    ----------
+
+      method : str
+        The name of client method to call. Must be one from `BATCH_METHODS`.
+
+      args : tuple
+        The positional arguments passed to the method.
+
+      kwargs : dict
+        The keyword arguments passed to the method.
+    """
+
+    method: str = None
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_call(cls, call) -> "BatchRequest":
+        """Builds a `BatchRequest` from a shorthand call.
+
+        The call can either be a `BatchRequest`, the method name as a `str` or a tuple
+        of `(method, kwargs)` or `(method, args, kwargs)`.
+        """
+        if isinstance(call, cls):
+            request = call
+        elif isinstance(call, str):
+            request = cls(method=call)
+        elif isinstance(call, tuple) and len(call) == 2:
+            request = cls(method=call[0], kwargs=dict(call[1] or {}))
+        elif isinstance(call, tuple) and len(call) == 3:
+            request = cls(
+                method=call[0], args=tuple(call[1]), kwargs=dict(call[2] or {})
+            )
+        else:
+            raise TypeError(f"Cannot build a batch request from {call!r}")
+
+        if request.method not in BATCH_METHODS:
+            raise ValueError(
+                f"Method {request.method!r} cannot be batched. Choose from {BATCH_METHODS}"
+            )
+        return request
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """
+    Represents the outcome of a single call of a batch.
+
+    Attributes
+    ----------
+
+      request : BatchRequest
+        The request this result belongs to. This is `None` if the call could not be
+        turned into a `BatchRequest`, `error` then holds the reason.
+
+      result : Any
+        The value returned by the method. This is `None` if the call failed.
+
+      error : Optional[Exception]
+        The exception raised by the method. This is `None` if the call succeeded.
+    """
+
+    request: BatchRequest = None
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Determines if the call succeeded or not."""
+        return self.error is None
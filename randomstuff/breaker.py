@@ -0,0 +1,268 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple, Type
+import threading
+import time
+
+from .errors import CircuitOpen
+
+
+CIRCUIT_STATES = ["closed", "open", "half_open"]
+
+
+@dataclass(frozen=True)
+class CircuitEvent:
+    """
+    Represents a state change of a circuit, passed to the listeners of a `CircuitBreaker`.
+
+    Attributes
+    ----------
+
+      circuit : str
+        The name of the circuit, like `weather` or `ai/main`.
+
+      previous : str
+        The state the circuit was in, one of `CIRCUIT_STATES`.
+
+      state : str
+        The state the circuit is in now, one of `CIRCUIT_STATES`.
+
+      failures : int
+        Consecutive failures recorded when the state changed.
+    """
+
+    circuit: str
+    previous: str
+    state: str
+    failures: int = 0
+
+
+@dataclass(frozen=True)
+class CircuitStats:
+    """
+    Represents the state of a single circuit.
+
+    Attributes
+    ----------
+
+      state : str
+        One of `CIRCUIT_STATES`.
+
+      failures : int
+        Consecutive failures of requests through the circuit.
+
+      rejected : int
+        Requests failed fast by the circuit since it was created.
+
+      retry_after : Optional[float]
+        Seconds until an open circuit lets a trial request through, `None` otherwise.
+    """
+
+    state: str = "closed"
+    failures: int = 0
+    rejected: int = 0
+    retry_after: Optional[float] = None
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = "closed"
+        self.failures = 0
+        self.successes = 0
+        self.trials = 0
+        self.rejected = 0
+        self.opened_at = 0.0
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast while the API keeps failing for an endpoint.
+
+    Pass an instance to `Client` or `AsyncClient` through the `circuit_breaker`
+    parameter. Every endpoint has its own circuit and AI requests have one per server,
+    named like `ai/main`. Server errors (5xx), connection errors and timeouts count as
+    failures; other errors like `RateLimited` don't count either way.
+
+    A circuit is `closed` until `failure_threshold` requests in a row fail. It then
+    `open`s and every request through it raises `CircuitOpen` without being sent. After
+    `recovery_timeout` seconds it becomes `half_open` and lets `half_open_requests`
+    trial requests through at a time: it closes once `success_threshold` of them
+    succeed and opens again as soon as one fails.
+
+    With a `ServerSelector`, an open circuit of an AI server makes the request fail over
+    to the next server.
+
+    Parameters
+    ----------
+      failure_threshold : Optional[int]
+        Consecutive failures which open a circuit.
+
+      recovery_timeout : Optional[float]
+        Seconds a circuit stays open before letting trial requests through.
+
+      half_open_requests : Optional[int]
+        Trial requests allowed at once while half open.
+
+      success_threshold : Optional[int]
+        Successful trial requests needed to close a half open circuit.
+
+      on_state_change : Optional[Callable[[CircuitEvent], None]]
+        Called with a `CircuitEvent` whenever a circuit changes its state. More
+        listeners can be added with `add_listener`. Listeners are called synchronously
+        from the request, so they should be quick and must not raise.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = 5,
+        *,
+        recovery_timeout: Optional[float] = 30.0,
+        half_open_requests: Optional[int] = 1,
+        success_threshold: Optional[int] = 1,
+        on_state_change: Optional[Callable[[CircuitEvent], None]] = None,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        if half_open_requests < 1:
+            raise ValueError("half_open_requests must be at least 1")
+        if success_threshold < 1:
+            raise ValueError("success_threshold must be at least 1")
+
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_requests = half_open_requests
+        self.success_threshold = success_threshold
+        self._listeners = [] if on_state_change is None else [on_state_change]
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[CircuitEvent], None]) -> None:
+        """Adds a function called with a `CircuitEvent` on every state change."""
+        self._listeners.append(listener)
+
+    def _transition(self, name: str, circuit: _Circuit, state: str) -> CircuitEvent:
+        event = CircuitEvent(name, circuit.state, state, circuit.failures)
+        circuit.state = state
+        circuit.successes = 0
+        if state == "open":
+            circuit.opened_at = time.monotonic()
+        elif state == "closed":
+            circuit.failures = 0
+        return event
+
+    def _emit(self, event: Optional[CircuitEvent]) -> None:
+        if event is not None:
+            for listener in self._listeners:
+                listener(event)
+
+    def _allow(self, name: str) -> bool:
+        """Reserves a request through a circuit, returns whether it is a trial request."""
+        event = None
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if circuit is None:
+                circuit = self._circuits[name] = _Circuit()
+
+            if circuit.state == "open":
+                wait = circuit.opened_at + self.recovery_timeout - time.monotonic()
+                if wait > 0:
+                    circuit.rejected += 1
+                    raise CircuitOpen(
+                        f"Circuit {name!r} is open. Retry after {wait:.2f}s.",
+                        circuit=name,
+                        retry_after=wait,
+                    )
+                event = self._transition(name, circuit, "half_open")
+
+            if circuit.state == "half_open":
+                if circuit.trials >= self.half_open_requests:
+                    circuit.rejected += 1
+                    raise CircuitOpen(
+                        f"Circuit {name!r} is half open and waiting for trial requests.",
+                        circuit=name,
+                        retry_after=0.0,
+                    )
+                circuit.trials += 1
+                trial = True
+            else:
+                trial = False
+
+        self._emit(event)
+        return trial
+
+    def _record(self, name: str, trial: bool, failed: Optional[bool]) -> None:
+        # `failed` is None for errors which say nothing about the API's health.
+        event = None
+        with self._lock:
+            circuit = self._circuits[name]
+            if trial:
+                circuit.trials -= 1
+
+            if failed:
+                circuit.failures += 1
+                # Only trial requests decide about a half open circuit, others were
+                # sent before it opened.
+                if (circuit.state == "half_open" and trial) or (
+                    circuit.state == "closed"
+                    and circuit.failures >= self.failure_threshold
+                ):
+                    event = self._transition(name, circuit, "open")
+            elif failed is False:
+                if circuit.state == "half_open" and trial:
+                    circuit.successes += 1
+                    if circuit.successes >= self.success_threshold:
+                        event = self._transition(name, circuit, "closed")
+                elif circuit.state == "closed":
+                    circuit.failures = 0
+
+        self._emit(event)
+
+    @contextmanager
+    def _guard(self, name: str, failures: Tuple[Type[BaseException], ...]):
+        trial = self._allow(name)
+        try:
+            yield
+        except failures:
+            self._record(name, trial, True)
+            raise
+        except BaseException:
+            self._record(name, trial, None)
+            raise
+        else:
+            self._record(name, trial, False)
+
+    def state(self, name: str) -> str:
+        """Returns the state of a circuit, like `breaker.state("ai/main")`."""
+        with self._lock:
+            circuit = self._circuits.get(name)
+            return "closed" if circuit is None else circuit.state
+
+    def stats(self) -> Dict[str, CircuitStats]:
+        """Returns the `CircuitStats` of every circuit used so far."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                name: CircuitStats(
+                    state=circuit.state,
+                    failures=circuit.failures,
+                    rejected=circuit.rejected,
+                    retry_after=max(
+                        0.0, circuit.opened_at + self.recovery_timeout - now
+                    )
+                    if circuit.state == "open"
+                    else None,
+                )
+                for name, circuit in self._circuits.items()
+            }
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Closes a circuit or, if `name` is `None`, all circuits."""
+        with self._lock:
+            names = list(self._circuits) if name is None else [name]
+            events = [
+                self._transition(key, self._circuits[key], "closed")
+                for key in names
+                if key in self._circuits and self._circuits[key].state != "closed"
+            ]
+        for event in events:
+            self._emit(event)
@@ -0,0 +1,649 @@
+from collections import OrderedDict
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .constants import CACHE_TTLS
+from .ai_response import AIResponse
+from .covid import *
+from .joke import Joke, JokeFlags
+from .waifu import Waifu
+from .weather import CurrentWeather, Weather, WeatherForecast, WeatherLocation
+from .scheduler import _background
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """
+    Represents the counters of a `ResponseCache`.
+
+    Attributes
+    ----------
+
+      hits : int
+        Lookups answered from the cache with a fresh entry.
+
+      stale : int
+        Lookups answered from the cache with an entry older than `refresh_after`
+        while it was refreshed in the background.
+
+      misses : int
+        Lookups which had to request the API.
+
+      coalesced : int
+        Lookups which waited for another in-flight request for the same key instead
+        of requesting the API themselves.
+
+      refresh_errors : int
+        Background refreshes which failed. The stale entry is kept in that case.
+
+      size : int
+        The number of entries currently stored.
+    """
+
+    hits: int = 0
+    stale: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    refresh_errors: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups answered without waiting for the API themselves."""
+        total = self.hits + self.stale + self.misses + self.coalesced
+        return (self.hits + self.stale + self.coalesced) / total if total else 0.0
+
+
+class CacheBackend:
+    """
+    The base class of storages used by `ResponseCache`.
+
+    Subclasses must implement `get`, `set`, `delete`, `clear` and `__len__`. Entries
+    are stored along with the unix time they were stored at and they expire at.
+
+    `AsyncClient` calls the `_async` variants, which call the blocking methods by
+    default. Backends doing I/O override them to keep it off the event loop.
+    """
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns `(value, stored_at)` for a key or `None` if it isn't stored."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float) -> None:
+        """Stores a value. The backend may drop it at any time after `expires_at`."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Removes a key if it is stored."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """Returns the number of entries which haven't expired."""
+        raise NotImplementedError
+
+    async def get_async(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Equivalent to `get`."""
+        return self.get(key)
+
+    async def set_async(
+        self, key: str, value: Any, stored_at: float, expires_at: float
+    ) -> None:
+        """Equivalent to `set`."""
+        self.set(key, value, stored_at, expires_at)
+
+    async def len_async(self) -> int:
+        """Equivalent to `len()`."""
+        return len(self)
+
+
+class MemoryCache(CacheBackend):
+    """
+    An in-memory LRU cache backend.
+
+    Parameters
+    ----------
+      max_size : Optional[int]
+        Maximum number of entries. The least recently used entry is evicted when full.
+    """
+
+    def __init__(self, max_size: Optional[int] = 1024):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, stored_at, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            now = time.time()
+            expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+            for key in expired:
+                del self._entries[key]
+            return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    A cache backend stored in an SQLite database on disk.
+
+    Many processes on the same host can share one database file, so worker processes
+    don't each warm their own cache. The database uses WAL mode so that readers and
+    writers don't block each other.
+
+    Values are serialized as JSON. Data classes returned by the client (such as
+    `Weather`, `CountryCovidData`, `Joke` or `Waifu`), image URLs and `bytes` are
+    supported.
+
+    Parameters
+    ----------
+      path : str
+        The path of database file. It is created if it doesn't exist.
+
+      max_entries : Optional[int]
+        Maximum number of entries. The oldest entries are evicted when exceeded.
+
+      max_bytes : Optional[int]
+        Maximum total size of serialized values. `None` means no limit.
+
+      timeout : Optional[float]
+        Seconds to wait for a lock held by another process.
+
+    Size limits are enforced every few writes, so the database can briefly exceed them.
+    Call `evict` to enforce them right away.
+
+    Example
+    -------
+
+    cache = randomstuff.ResponseCache(backend=randomstuff.SQLiteCache("/tmp/randomstuff.db"))
+    """
+
+    _EVICT_EVERY = 32
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_entries: Optional[int] = 10000,
+        max_bytes: Optional[int] = None,
+        timeout: Optional[float] = 5.0,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads or forked processes.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value, stored_at FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return _decode_value(json.loads(row[0])), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float) -> None:
+        data = json.dumps(_encode_value(value), separators=(",", ":"))
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, stored_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, data, len(data), stored_at, expires_at),
+        )
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self._EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes expired entries and the oldest entries over the size limits."""
+        conn = self._connection()
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+            "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        if self.max_bytes is not None:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY stored_at"
+            ).fetchall()
+            excess = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                excess.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", excess)
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        """Closes the database connection of the current thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM entries WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+    # Queries may wait up to `timeout` for the lock of another process, so the async
+    # variants run them in the event loop's executor. Its threads get their own
+    # connections.
+
+    async def get_async(self, key: str) -> Optional[Tuple[Any, float]]:
+        return await _in_executor(self.get, key)
+
+    async def set_async(
+        self, key: str, value: Any, stored_at: float, expires_at: float
+    ) -> None:
+        await _in_executor(self.set, key, value, stored_at, expires_at)
+
+    async def len_async(self) -> int:
+        return await _in_executor(self.__len__)
+
+
+def _in_executor(function: Callable, *args) -> Awaitable:
+    return asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+_SERIALIZABLE = {
+    cls.__name__: cls
+    for cls in [
+        AIResponse,
+        Cases,
+        ClosedCases,
+        ClosedCasesPercentage,
+        Country,
+        CountryCovidData,
+        CovidCondition,
+        CurrentWeather,
+        GlobalCovidData,
+        Joke,
+        JokeFlags,
+        Waifu,
+        Weather,
+        WeatherForecast,
+        WeatherLocation,
+    ]
+}
+
+
+def _encode_value(value: Any) -> Any:
+    if is_dataclass(value):
+        return {
+            "__dataclass__": type(value).__name__,
+            "fields": {
+                field.name: _encode_value(getattr(value, field.name))
+                for field in fields(value)
+            },
+        }
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {"__dict__": {key: _encode_value(item) for key, item in value.items()}}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__dataclass__" in value:
+        cls = _SERIALIZABLE[value["__dataclass__"]]
+        return cls(
+            **{key: _decode_value(item) for key, item in value["fields"].items()}
+        )
+    if "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    return {key: _decode_value(item) for key, item in value["__dict__"].items()}
+
+
+class _Flight:
+    """A fetch in progress of `ResponseCache.get_or_fetch`, shared by its waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Caches the objects returned by `get_weather` and `get_covid_data`.
+
+    Entries are the already built `Weather`, `CountryCovidData` or `GlobalCovidData`
+    objects so cache hits skip both the request and parsing. When many callers miss the
+    same key at once, only one of them requests the API and the others wait for it,
+    and raise its error if it fails.
+
+    Pass an instance to `Client` or `AsyncClient` through the `cache` parameter. A cache
+    can be shared by several clients.
+
+    Parameters
+    ----------
+      ttls : Optional[Dict[str, float]]
+        Seconds entries of each endpoint are kept for. Endpoints without a TTL are not
+        cached. Defaults to `CACHE_TTLS`.
+
+      refresh_after : Optional[Dict[str, float]]
+        Seconds after which an entry of an endpoint is stale. Stale entries are still
+        returned but `AsyncClient` refreshes them in the background, so only callers
+        after the TTL has passed wait for the API. Must be lower than the endpoint's
+        TTL. `Client` ignores this and uses entries until their TTL passes.
+
+      max_size : Optional[int]
+        Maximum number of entries of the default `MemoryCache` backend.
+
+      backend : Optional[CacheBackend]
+        Where entries are stored. Defaults to a `MemoryCache`.
+
+    Example
+    -------
+
+    cache = randomstuff.ResponseCache(ttls={"weather": 300}, max_size=500)
+    client = randomstuff.Client(api_key="key", cache=cache)
+
+    # Serve hot keys without waiting: stale after 60s, expired after 300s
+    cache = randomstuff.ResponseCache(
+        ttls={"weather": 300}, refresh_after={"weather": 60}
+    )
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        *,
+        refresh_after: Optional[Dict[str, float]] = None,
+        max_size: Optional[int] = 1024,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.refresh_after = dict(refresh_after or {})
+        for endpoint, soft_ttl in self.refresh_after.items():
+            if soft_ttl >= self.ttls.get(endpoint, 0):
+                raise ValueError(
+                    f"refresh_after of {endpoint!r} must be lower than its TTL"
+                )
+        self.backend = backend if backend is not None else MemoryCache(max_size)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._inflight_async: Dict[str, asyncio.Future] = {}
+        self._refreshing = set()
+        self._hits = 0
+        self._stale = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._refresh_errors = 0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _lookup(self, key: str, count: bool = True):
+        entry = self.backend.get(key)
+        if entry is not None and count:
+            self._count("_hits")
+        return entry
+
+    def _store(self, endpoint: str, key: str, value: Any) -> None:
+        now = time.time()
+        self.backend.set(key, value, now, now + self.ttls[endpoint])
+
+    async def _lookup_async(self, key: str):
+        return await self.backend.get_async(key)
+
+    async def _store_async(self, endpoint: str, key: str, value: Any) -> None:
+        now = time.time()
+        await self.backend.set_async(key, value, now, now + self.ttls[endpoint])
+
+    def get_or_fetch(self, endpoint: str, key: str, fetch: Callable[[], Any]) -> Any:
+        """Returns the cached value of a key or stores the value returned by `fetch`."""
+        if not endpoint in self.ttls:
+            return fetch()
+
+        waited = False
+        while True:
+            entry = self._lookup(key, count=not waited)
+            if entry is not None:
+                return entry[0]
+
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = _Flight()
+
+            if not leader:
+                # Another thread is fetching this key. Its error is raised here too
+                # rather than every waiter retrying the request one after another.
+                self._count("_coalesced")
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                waited = True
+                continue
+
+            self._count("_misses")
+            try:
+                value = fetch()
+                self._store(endpoint, key, value)
+                return value
+            except Exception as exc:
+                flight.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                flight.done.set()
+
+    async def get_or_fetch_async(
+        self, endpoint: str, key: str, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Equivalent to `get_or_fetch` but `fetch` returns an awaitable.
+
+        Entries older than the endpoint's `refresh_after` are returned right away
+        while a single background task fetches a fresh value.
+        """
+        if not endpoint in self.ttls:
+            return await fetch()
+
+        while True:
+            entry = await self._lookup_async(key)
+            if entry is not None:
+                value, stored_at = entry
+                soft_ttl = self.refresh_after.get(endpoint)
+                if soft_ttl is not None and time.time() - stored_at >= soft_ttl:
+                    self._count("_stale")
+                    self._revalidate(endpoint, key, fetch)
+                else:
+                    self._count("_hits")
+                return value
+
+            future = self._inflight_async.get(key)
+            if future is None:
+                break
+
+            self._count("_coalesced")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The fetching task was cancelled, elect a new one unless this
+                # task is the one being cancelled.
+                if not future.cancelled():
+                    raise
+
+        self._count("_misses")
+        return await self._fetch_async(endpoint, key, fetch)
+
+    async def _fetch_async(
+        self,
+        endpoint: str,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        future: Optional[asyncio.Future] = None,
+    ) -> Any:
+        if future is None:
+            future = self._inflight_async[key] = (
+                asyncio.get_running_loop().create_future()
+            )
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved in case nobody was waiting for it.
+            future.exception()
+            raise
+        else:
+            try:
+                await self._store_async(endpoint, key, value)
+            finally:
+                # Waiters get the value even if it couldn't be stored.
+                future.set_result(value)
+            return value
+        finally:
+            del self._inflight_async[key]
+
+    def _revalidate(
+        self, endpoint: str, key: str, fetch: Callable[[], Awaitable[Any]]
+    ) -> None:
+        if key in self._inflight_async:
+            return
+
+        # Registered before the task starts so that other stale lookups in the
+        # meantime don't start another refresh.
+        future = self._inflight_async[key] = (
+            asyncio.get_running_loop().create_future()
+        )
+
+        async def refresh():
+            _background()
+            try:
+                await self._fetch_async(endpoint, key, fetch, future)
+            except Exception:
+                # The stale entry is kept until its TTL expires.
+                self._count("_refresh_errors")
+
+        task = asyncio.ensure_future(refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    def invalidate(self, key: str) -> None:
+        """Removes a key from the cache."""
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        """Removes all entries from the cache."""
+        self.backend.clear()
+
+    def stats(self) -> CacheStats:
+        """Returns the counters of this cache."""
+        return self._stats(len(self.backend))
+
+    async def stats_async(self) -> CacheStats:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Equivalent to `stats` but counts the entries without blocking the event loop.
+        """
+        return self._stats(await self.backend.len_async())
+
+    def _stats(self, size: int) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                stale=self._stale,
+                misses=self._misses,
+                coalesced=self._coalesced,
+                refresh_errors=self._refresh_errors,
+                size=size,
+            )
@@ -0,0 +1,767 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Tuple
+import asyncio
+import binascii
+import inspect
+import io
+import mmap
+import os
+import re
+import tempfile
+import threading
+
+from .errors import UnsupportedOperation
+from ._helper import _canvas_query
+
+
+# Bytes of the response body read at once when streaming a canvas image.
+_CHUNK_SIZE = 64 * 1024
+
+
+class _Base64Stream:
+    """Decodes the `base64` string of a canvas response body fed in chunks.
+
+    The body is `[{"base64": "..."}]`. Only the undecoded tail of a chunk is kept
+    between chunks, so memory doesn't grow with the size of the image.
+    """
+
+    _KEY = b'"base64"'
+
+    def __init__(self):
+        self._state = "key"
+        self._pending = b""
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Returns the image bytes decoded from `chunk`."""
+        data = self._pending + chunk
+        self._pending = b""
+
+        if self._state == "key":
+            index = data.find(self._KEY)
+            if index == -1:
+                # The key may be split across chunks.
+                self._pending = data[1 - len(self._KEY) :]
+                return b""
+            data = data[index + len(self._KEY) :]
+            self._state = "colon"
+
+        if self._state == "colon":
+            data = data.lstrip(b" \t\r\n:")
+            if not data:
+                return b""
+            if data[:1] != b'"':
+                raise ValueError("The canvas response has no base64 string.")
+            data = data[1:]
+            self._state = "value"
+
+        if self._state != "value":
+            return b""
+
+        end = data.find(b'"')
+        if end != -1:
+            data = data[:end]
+            self._state = "done"
+        elif data.endswith(b"\\"):
+            # Keep an escape split across chunks for the next one.
+            self._pending = b"\\"
+            data = data[:-1]
+
+        # JSON may escape the slashes of base64 and break it into lines.
+        if b"\\" in data:
+            data = data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+
+        if self._state == "value":
+            usable = len(data) - len(data) % 4
+            self._pending = data[usable:] + self._pending
+            data = data[:usable]
+        return binascii.a2b_base64(data)
+
+    def close(self) -> None:
+        """Raises `ValueError` if the body ended before the base64 string did."""
+        if self._state != "done":
+            raise ValueError("The canvas response ended before its base64 string.")
+
+
+def _open_target(target):
+    """Returns the file to write to and whether it was opened here."""
+    if isinstance(target, (str, os.PathLike)):
+        return open(target, "wb"), True
+    return target, False
+
+
+def _write_canvas(chunks: Iterable[bytes], target) -> int:
+    """Decodes a canvas response body into `target`, returns the bytes written."""
+    stream = _Base64Stream()
+    file, owned = _open_target(target)
+    written = 0
+    try:
+        for chunk in chunks:
+            data = stream.feed(chunk)
+            if data:
+                file.write(data)
+                written += len(data)
+        stream.close()
+    finally:
+        if owned:
+            file.close()
+    return written
+
+
+async def _write_canvas_async(chunks: AsyncIterable[bytes], target) -> int:
+    """Equivalent to `_write_canvas`, `target` may also be an async writer.
+
+    Async writers either have a coroutine `write`, like aiofiles, or a `drain`
+    coroutine, like `asyncio.StreamWriter`.
+    """
+    stream = _Base64Stream()
+    file, owned = _open_target(target)
+    written = 0
+    try:
+        async for chunk in chunks:
+            data = stream.feed(chunk)
+            if data:
+                await _write_async(file, data)
+                written += len(data)
+        stream.close()
+    finally:
+        if owned:
+            file.close()
+    return written
+
+
+async def _write_async(file, data: bytes) -> None:
+    result = file.write(data)
+    if inspect.isawaitable(result):
+        await result
+    elif hasattr(file, "drain"):
+        await file.drain()
+
+
+def _write_image(data: bytes, target) -> int:
+    """Writes a decoded image to `target` like `_write_canvas`."""
+    file, owned = _open_target(target)
+    try:
+        file.write(data)
+    finally:
+        if owned:
+            file.close()
+    return len(data)
+
+
+async def _write_image_async(data: bytes, target) -> int:
+    """Writes a decoded image to `target` like `_write_canvas_async`."""
+    file, owned = _open_target(target)
+    try:
+        await _write_async(file, data)
+    finally:
+        if owned:
+            file.close()
+    return len(data)
+
+
+def _canvas_target(save_to):
+    """Returns a function giving where to write a canvas image on every attempt.
+
+    Requests may be retried after part of the image was written. Without `save_to`
+    every attempt gets a new `BytesIO`, paths are reopened by `_open_target` and
+    seekable files are rewound to where they were before the first attempt. Other
+    writers can't be rewound, so a retry raises `UnsupportedOperation` instead of
+    appending a second copy of the image.
+    """
+    if save_to is None:
+        return io.BytesIO
+    if isinstance(save_to, (str, os.PathLike)):
+        return lambda: save_to
+    if not (isinstance(save_to, io.IOBase) and save_to.seekable()):
+        attempts = []
+
+        def once():
+            if attempts:
+                raise UnsupportedOperation(
+                    "The canvas download was retried after writing to a `save_to` "
+                    "which can't be rewound. Pass a path or a seekable file instead."
+                )
+            attempts.append(save_to)
+            return save_to
+
+        return once
+
+    start = save_to.tell()
+
+    def rewind():
+        save_to.seek(start)
+        save_to.truncate()
+        return save_to
+
+    return rewind
+
+
+CANVAS_EXECUTORS = ["thread", "process"]
+
+# Decoded images larger than this are spooled to a memory-mapped temporary file by
+# default.
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+
+_IMAGE_TYPES = [
+    (b"GIF8", "image/gif", "gif"),
+    (b"\x89PNG", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"RIFF", "image/webp", "webp"),
+]
+
+
+def _sniff(data) -> Tuple[str, str]:
+    """Returns the MIME type and file extension of an image from its first bytes."""
+    for magic, content_type, extension in _IMAGE_TYPES:
+        if data[: len(magic)] == magic:
+            return content_type, extension
+    return "application/octet-stream", "bin"
+
+
+class _Spool:
+    """A writable buffer kept in memory until it outgrows `threshold` bytes."""
+
+    def __init__(self, threshold: Optional[int]):
+        self.threshold = threshold
+        self.size = 0
+        self._file = io.BytesIO()
+        self._spooled = False
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if (
+            not self._spooled
+            and self.threshold is not None
+            and self.size > self.threshold
+        ):
+            file = tempfile.TemporaryFile()
+            file.write(self._file.getbuffer())
+            self._file = file
+            self._spooled = True
+        self._file.write(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def view(self) -> Tuple[memoryview, tuple]:
+        """Returns a read-only view of the data and the objects to close with it."""
+        if not self._spooled:
+            return self._file.getbuffer().toreadonly(), (self._file,)
+        self._file.flush()
+        mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped), (mapped, self._file)
+
+
+class CanvasImage:
+    """
+    Represents an image generated with a canvas method.
+
+    The image isn't copied out of the buffer it was decoded into: `data` is a read-only
+    `memoryview` of it, either of memory or, for images larger than the client's
+    `spool_threshold`, of a memory-mapped temporary file. It can be passed as is to
+    multipart uploads:
+
+        form = aiohttp.FormData()
+        form.add_field("file", image.data, filename=image.filename, content_type=image.content_type)
+
+        requests.post(url, files={"file": image.upload()})
+
+    Close the image, or use it as a context manager, to free its buffer. Views of
+    `data` must be released first.
+
+    Attributes
+    ----------
+
+      method : str
+        The canvas method which generated the image.
+
+      size : int
+        Size of the image in bytes.
+
+      latency : float
+        Seconds the request took, including downloading and decoding the image.
+
+      content_type : str
+        MIME type of the image, `application/octet-stream` if it is not recognised.
+
+      mapped : bool
+        Whether the image is backed by a memory-mapped temporary file.
+    """
+
+    def __init__(self, method: str, spool: _Spool, latency: float):
+        self.method = method
+        self.size = spool.size
+        self.latency = latency
+        self.mapped = spool._spooled and spool.size > 0
+        if spool.size:
+            self._data, self._owners = spool.view()
+        else:
+            # An empty file can't be memory-mapped.
+            spool.close()
+            self._data, self._owners = memoryview(b""), ()
+
+        self.content_type, self._extension = _sniff(self._data)
+
+    def __repr__(self) -> str:
+        return (
+            f"<CanvasImage method={self.method!r} size={self.size} "
+            f"content_type={self.content_type!r} latency={self.latency:.3f}>"
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bytes__(self) -> bytes:
+        return self._data.tobytes()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    @property
+    def data(self) -> memoryview:
+        """The image as a read-only `memoryview`, without copying it."""
+        return self._data
+
+    @property
+    def filename(self) -> str:
+        """A file name for uploads, like `trigger.gif`."""
+        return f"{self.method}.{self._extension}"
+
+    def upload(self) -> Tuple[str, memoryview, str]:
+        """Returns the `(filename, data, content_type)` tuple `requests` takes in `files`."""
+        return self.filename, self._data, self.content_type
+
+    def save(self, path) -> int:
+        """Writes the image to `path`, returns the number of bytes written."""
+        with open(path, "wb") as file:
+            return file.write(self._data)
+
+    def close(self) -> None:
+        """Frees the buffer of the image.
+
+        Raises `BufferError` if slices of `data` are still alive. Whatever could be
+        closed is closed anyway, call this again once they are released.
+        """
+        self._data.release()
+        owners, self._owners = self._owners, ()
+        error = None
+        for owner in owners:
+            try:
+                owner.close()
+            except BufferError as exc:
+                error = exc
+                self._owners += (owner,)
+        if error is not None:
+            raise error
+
+
+# Response bodies of `AsyncClient.canvas_many` at least this large are decoded in the
+# executor instead of the event loop by default.
+OFFLOAD_THRESHOLD = 256 * 1024
+
+
+def _is_file_name(name: str) -> bool:
+    """Determines if a name is a plain file name, which can't point outside a directory."""
+    return (
+        bool(name)
+        and not name in [".", ".."]
+        and not any(separator in name for separator in ["/", "\\", "\0"])
+        and not os.path.splitdrive(name)[0]
+        and not os.path.isabs(name)
+    )
+
+
+@dataclass(frozen=True)
+class CanvasJob:
+    """
+    Represents a single image of `AsyncClient.canvas_many`.
+
+    Attributes
+    ----------
+
+      method : str
+        The canvas method, one of `ALL_METHODS`.
+
+      img1, img2, img3 : Optional[str]
+        URLs of the images the method needs.
+
+      txt : Optional[str]
+        The text of text methods.
+
+      name : Optional[str]
+        The file name of the image in the output directory, without extension. It
+        can't be a path. Defaults to the index of the job and the method, like
+        `000042-trigger`.
+    """
+
+    method: str = None
+    img1: Optional[str] = None
+    img2: Optional[str] = None
+    img3: Optional[str] = None
+    txt: Optional[str] = None
+    name: Optional[str] = None
+
+    def __post_init__(self):
+        if self.name is not None and not _is_file_name(self.name):
+            raise ValueError(f"Invalid job name {self.name!r}, it must be a file name.")
+
+    @classmethod
+    def from_job(cls, job) -> "CanvasJob":
+        """Builds a `CanvasJob` from a job, a `dict` of its attributes or a method name."""
+        if isinstance(job, cls):
+            return job
+        if isinstance(job, str):
+            return cls(method=job)
+        if isinstance(job, dict):
+            return cls(**job)
+        raise TypeError(f"Cannot build a canvas job from {job!r}")
+
+    def _query(self) -> Dict[str, str]:
+        return _canvas_query(
+            self.method, img1=self.img1, img2=self.img2, img3=self.img3, txt=self.txt
+        )
+
+
+@dataclass(frozen=True)
+class CanvasResult:
+    """
+    Represents the outcome of a single job of `AsyncClient.canvas_many`.
+
+    Attributes
+    ----------
+
+      job : CanvasJob
+        The job this result belongs to.
+
+      index : int
+        The position of the job in the jobs passed.
+
+      path : Optional[str]
+        Where the image was written, `None` without an output directory.
+
+      data : Optional[bytes]
+        The image, only without an output directory.
+
+      size : int
+        Size of the image in bytes.
+
+      content_type : Optional[str]
+        MIME type of the image.
+
+      latency : float
+        Seconds from sending the request until the image was decoded and written.
+
+      error : Optional[Exception]
+        The exception raised for the job. This is `None` if it succeeded.
+    """
+
+    job: CanvasJob = None
+    index: int = 0
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    size: int = 0
+    content_type: Optional[str] = None
+    latency: float = 0.0
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Determines if the job succeeded or not."""
+        return self.error is None
+
+    def _manifest_entry(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "method": self.job.method,
+            "img1": self.job.img1,
+            "img2": self.job.img2,
+            "img3": self.job.img3,
+            "txt": self.job.txt,
+            "file": None if self.path is None else os.path.basename(self.path),
+            "size": self.size,
+            "content_type": self.content_type,
+            "latency": round(self.latency, 6),
+            "error": None if self.error is None else repr(self.error),
+        }
+
+
+def _decode_canvas(
+    body: bytes, path: Optional[str], keep: bool = False
+) -> Tuple[Optional[bytes], int, str, Optional[str]]:
+    """Decodes a canvas response body and writes the image to `path` plus extension.
+
+    Returns the image if `path` is `None` or `keep` is set, its size, MIME type and the
+    path written.
+    This runs in executors, including process pools, so it must stay a module-level
+    function of picklable arguments.
+    """
+    stream = _Base64Stream()
+    data = stream.feed(body)
+    stream.close()
+    return _save_image(data, path, keep)
+
+
+def _save_image(
+    data: bytes, path: Optional[str], keep: bool = False
+) -> Tuple[Optional[bytes], int, str, Optional[str]]:
+    """Writes an image to `path` plus extension, see `_decode_canvas`."""
+    content_type, extension = _sniff(data)
+    if path is not None:
+        path = f"{path}.{extension}"
+        with open(path, "wb") as file:
+            file.write(data)
+    return data if keep or path is None else None, len(data), content_type, path
+
+
+# Cache keys are SHA-256 hex digests, see `BaseClient._canvas_key`.
+_CACHE_KEY = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass(frozen=True)
+class CanvasCacheStats:
+    """
+    Represents the counters and size of a `CanvasCache`.
+
+    Attributes
+    ----------
+
+      hits : int
+        Lookups answered from memory.
+
+      disk_hits : int
+        Lookups answered from the disk tier.
+
+      misses : int
+        Lookups which had to request the API.
+
+      entries : int
+        Images held in memory.
+
+      bytes : int
+        Bytes of the images held in memory.
+
+      disk_entries : int
+        Images stored on disk.
+
+      disk_bytes : int
+        Bytes of the images stored on disk.
+    """
+
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    entries: int = 0
+    bytes: int = 0
+    disk_entries: int = 0
+    disk_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups answered without requesting the API."""
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+
+class CanvasCache:
+    """
+    Caches the images generated by canvas methods, which are the same for the same
+    inputs.
+
+    Pass an instance to `Client` or `AsyncClient` through the `canvas_cache` parameter.
+    `canvas`, `canvas_image` and `canvas_many` then only request images they haven't
+    generated before. Images are keyed by a hash of the method, its inputs and the API
+    version. A cache can be shared by several clients.
+
+    Images are kept in memory up to `max_bytes`, evicting the least recently used
+    ones. With a `directory`, images are also stored there as raw files, which
+    survive restarts and are read back on a memory miss.
+
+    Parameters
+    ----------
+      max_bytes : Optional[int]
+        Bytes of images kept in memory. Larger images are only stored on disk. `None`
+        doesn't limit it.
+
+      directory : Optional[str]
+        Where to store images on disk. `None` keeps them in memory only. Only files
+        named like cache keys are treated as images, others are left alone.
+
+      max_disk_bytes : Optional[int]
+        Bytes of images stored in `directory`, evicting the least recently used ones.
+        `None` doesn't limit it.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        *,
+        directory: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        if directory is not None:
+            self._load_directory()
+
+    def _load_directory(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and _CACHE_KEY.fullmatch(entry.name):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the image stored for a key or `None`."""
+        data, on_disk = self._lookup(key)
+        return self._read(key) if on_disk else data
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """Equivalent to `get`, the disk tier is read in the event loop's executor."""
+        data, on_disk = self._lookup(key)
+        if not on_disk:
+            return data
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, key)
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores the image of a key."""
+        if self._store(key, data):
+            self._write(key, data)
+
+    async def put_async(self, key: str, data: bytes) -> None:
+        """Equivalent to `put`, the disk tier is written in the event loop's executor."""
+        if self._store(key, data):
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, key, data
+            )
+
+    def _lookup(self, key: str) -> Tuple[Optional[bytes], bool]:
+        """Returns the image in memory for a key and whether it must be read from disk."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return data, False
+            if key in self._disk:
+                return None, True
+            self._misses += 1
+            return None, False
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as file:
+                data = file.read()
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Removed by someone else, like another process sharing the directory.
+            with self._lock:
+                self._forget_file(key)
+                self._misses += 1
+            return None
+
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def _store(self, key: str, data: bytes) -> bool:
+        """Keeps an image in memory, returns whether it must be written to disk too."""
+        with self._lock:
+            self._remember(key, data)
+            return self.directory is not None and not key in self._disk
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+        with self._lock:
+            if not key in self._disk:
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+            evicted = []
+            while (
+                self.max_disk_bytes is not None
+                and self._disk_bytes > self.max_disk_bytes
+                and self._disk
+            ):
+                old, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key: str, data: bytes) -> None:
+        limit = self.max_bytes
+        if limit is not None and len(data) > limit:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while limit is not None and self._bytes > limit:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _forget_file(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def clear(self) -> None:
+        """Removes all images, from disk too."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            keys = list(self._disk)
+            self._disk.clear()
+            self._disk_bytes = 0
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> CanvasCacheStats:
+        """Returns the current `CanvasCacheStats`."""
+        with self._lock:
+            return CanvasCacheStats(
+                hits=self._hits,
+                disk_hits=self._disk_hits,
+                misses=self._misses,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_bytes,
+            )
@@ -5,21 +5,65 @@ from .ai_response import *
 from .joke import *
 from .waifu import *
 from .weather import *
+from .batch import *
+from .transport import *
+from .transport import _requests_pool_stats, _connector_pool_stats
+from .ratelimit import *
+from .retry import *
+from .metrics import *
+from .servers import *
+from .hedging import *
+from .cache import *
+from .prefetch import *
+from .prefetch import _PrefetchPool
+from .decoders import *
+from .persona import *
+from .persona import _EncodedURL
+from .keys import *
+from .breaker import *
+from .timeouts import *
+from .timeouts import (
+    _remaining,
+    _resolve_timeout,
+    _wait_within_deadline,
+)
+from .concurrency import *
+from .scheduler import *
+from .scheduler import _background, _scheduled
+from .canvas import *
+from .canvas import (
+    _CHUNK_SIZE,
+    _Spool,
+    _canvas_target,
+    _decode_canvas,
+    _save_image,
+    _write_image,
+    _write_image_async,
+    _write_canvas,
+    _write_canvas_async,
+)
+from ._endpoints import ENDPOINTS
 from ._helper import (
     _check_coro,
     _check_status,
     _warn,
-    _validate_method_image,
-    _get_method_images,
-    _image_query_params,
+    _canvas_query,
 )
 from . import utils
-from typing import Optional
+from typing import AsyncIterator, Iterable, List, Optional, Union
+from urllib.parse import urlencode
 import aiohttp
 import requests
+import yarl
 import random
-import base64
+import asyncio
+import concurrent.futures
+import hashlib
 import io
+import json
+import os
+import threading
+import time
 
 
 class BaseClient:
@@ -46,7 +90,13 @@ class BaseClient:
         self.version = version
         self.api_key = api_key
         self.suppress_warnings = suppress_warnings
+        self._warned_async = False
         self._base_url = f"{BASE_URL}/v{self.version}"
+        self._endpoints = ENDPOINTS[self.version]
+        # Sent with every request rather than set on the session so that sessions can be
+        # shared by clients of different API keys.
+        self._auth_header = "Authorization" if self.version == "5" else "x-api-key"
+        self._auth_headers = {self._auth_header: self.api_key}
         self._randomised_uid = utils.generate_uid()
 
         if self.version != VERSIONS[-1]:
@@ -55,82 +105,70 @@ class BaseClient:
                 f"Latest version of API is v{VERSIONS[-1]} but you are using v{self.version}.\n",
             )
 
+    def _check_supported(self, endpoint: str) -> None:
+        if not endpoint in self._endpoints:
+            raise InvalidVersionError(
+                f"Version {self.version} does not support this method."
+            )
+
+    def _circuit(self, endpoint: str, kwargs: dict) -> str:
+        # AI servers fail independently so each one gets its own circuit.
+        server = (kwargs.get("params") or {}).get("server")
+        if endpoint == "ai" and server is not None:
+            return f"ai/{server}"
+        return endpoint
+
+    def _requested_server(self, kwargs: dict) -> str:
+        persona = kwargs.get("persona")
+        if persona is not None and persona.server is not None:
+            return kwargs.get("server", persona.server)
+        return kwargs.get("server", "auto")
+
+    def _resolve_persona_params(self, message: str, plan: str = "", **kwargs):
+        persona = kwargs["persona"]
+        if self.version != "5":
+            raise InvalidVersionError("Personas are only supported on version 5.")
+        if plan and plan != persona.plan:
+            raise InvalidPlanError("The plan of a persona cannot be overridden.")
+
+        server = kwargs.get("server", persona.server or "main")
+        if not server in SERVERS_V5:
+            raise InvalidServerError(f"Invalid server type. Choose from {SERVERS_V5}.")
+
+        params = {
+            "message": message,
+            "server": server,
+            "uid": kwargs.get("uid", self._randomised_uid),
+        }
+        return params, persona.url(self._base_url, params)
+
     def _resolve_ai_params(self, message: str, plan: str = "", **kwargs):
+        if kwargs.get("persona") is not None:
+            return self._resolve_persona_params(message, plan, **kwargs)
+
         if not plan in PLANS:
             raise InvalidPlanError(f"Invalid Plan. Choose from {PLANS}")
 
-        if self.version == "4":
-            if not kwargs.get("server", "primary") in SERVERS_V4:
-                raise InvalidServerError(
-                    f"Invalid server type Must be one from {SERVERS_V4}."
-                )
+        servers = AI_SERVERS.get(self.version)
+        if servers is not None and not kwargs.get("server", servers[0]) in servers:
+            raise InvalidServerError(f"Invalid server type. Choose from {servers}.")
 
-        if self.version == "5":
-            if not kwargs.get("server", "main") in SERVERS_V5:
-                raise InvalidServerError(
-                    f"Invalid server type choose from {SERVERS_V4}."
-                )
+        url, params = self._endpoints["ai"].build(
+            self._base_url,
+            {**kwargs, "message": message, "plan": plan},
+            uid=self._randomised_uid,
+        )
+        return params, url
 
-        if self.version == "3":
-            params = {
-                "message": message,
-                "lang": kwargs.get("lang", "en"),
-                "type": kwargs.get("type", "stable"),
-                "bot_name": kwargs.get("bot_name", "RSA"),
-                "dev_name": kwargs.get("dev_name", "PGamerX"),
-                "unique_id": kwargs.get("unique_id", self._randomised_uid),
-            }
-
-        elif self.version == "4":
-            params = {
-                "message": message,
-                "server": kwargs.get("server", "primary"),
-                "master": kwargs.get("master", "PGamerX"),
-                "bot": kwargs.get("bot", "RSA"),
-                "uid": kwargs.get("uid", self._randomised_uid),
-                "language": kwargs.get("language", "en"),
-            }
-
-        elif self.version == "5":
-            params = {
-                "message": message,
-                "server": kwargs.get("server", "main"),
-                "uid": kwargs.get("uid", self._randomised_uid),
-                "bot_name": kwargs.get("name", "Random Stuff API"),
-                "bot_master": kwargs.get("master", "PGamerX"),
-                "bot_gender": kwargs.get("gender", "Male"),
-                "bot_age": kwargs.get("age", "19"),
-                "bot_company": kwargs.get("company", "PGamerX Studio"),
-                "bot_location": kwargs.get("location", "India"),
-                "bot_email": kwargs.get("email", "admin@pgamerx.com"),
-                "bot_build": kwargs.get("build", "Public"),
-                "bot_birth_year": kwargs.get("birth_year", "2002"),
-                "bot_birth_date": kwargs.get("birth_date", "1st January 2002"),
-                "bot_birth_place": kwargs.get("birth_place", "India"),
-                "bot_favorite_color": kwargs.get("favorite_color", "Blue"),
-                "bot_favorite_book": kwargs.get(
-                    "favorite_book", "Harry Potter"
-                ),
-                "bot_favorite_band": kwargs.get(
-                    "favorite_band", "Imagine Doggos"
-                ),
-                "bot_favorite_artist": kwargs.get("favorite_artist", "Eminem"),
-                "bot_favorite_actress": kwargs.get(
-                    "favorite_actress", "Emma Watson"
-                ),
-                "bot_favorite_actor": kwargs.get(
-                    "favorite_actor", "Jim Carrey"
-                ),
-            }
-
-        if self.version == "3":
-            url = f"{self._base_url}/{plan+'/' if plan else ''}ai/response"
-        elif self.version == "4":
-            url = f"{self._base_url}/{plan+'/' if plan else ''}/ai"
-        elif self.version == "5":
-            url = f"{self._base_url}/{'premium/'+plan+'/' if plan else ''}/ai"
+    def _cache_key(self, endpoint: str, **params) -> str:
+        query = urlencode(
+            sorted((key, value) for key, value in params.items() if value is not None)
+        )
+        return f"v{self.version}/{endpoint}?{query}"
 
-        return params, url
+    def _canvas_key(self, query: dict) -> str:
+        key = self._cache_key("canvas", **query)
+        return hashlib.sha256(key.encode()).hexdigest()
 
 
 class Client(BaseClient):
@@ -138,8 +176,8 @@ class Client(BaseClient):
 
     Parameters
     ----------
-      api_key : str
-        Your API authentication key.
+      api_key : Optional[str]
+        Your API authentication key. Required unless `key_pool` is passed.
 
       version : Optional[str]
         The version number of API. It is 4 by default. Set it to 3 if you want to use v3.
@@ -150,6 +188,45 @@ class Client(BaseClient):
       suppress_warnings Optional[bool]:
         If this is set to True, You won't get any console warnings. This does not suppress errors.
 
+      transport : Optional[TransportConfig]
+        The connection pooling options. Defaults to `TransportConfig()`.
+
+      rate_limiter : Optional[RateLimiter]
+        The client-side rate limiter that requests must pass before being sent.
+
+      retry_policy : Optional[RetryPolicy]
+        How failed requests are retried. Requests are not retried by default.
+
+      server_selector : Optional[ServerSelector]
+        Picks the AI server from observed latency and errors and fails over to another
+        server automatically. Used when `server` isn't passed to `get_ai_response`.
+
+      cache : Optional[ResponseCache]
+        Caches the results of `get_weather` and `get_covid_data`.
+
+      json_decoder : Optional[Union[str, Callable[[bytes], Any]]]
+        Decodes response bodies from their raw bytes. `auto` (default) uses `orjson` or
+        `ujson` when installed and the standard library's `json` otherwise. See
+        `get_json_decoder`.
+
+      session : Optional[requests.Session]
+        An existing session to send requests with, which can be shared by clients of
+        different API keys. The client doesn't close it and `transport` is ignored.
+
+      key_pool : Optional[KeyPool]
+        Spreads requests across several API keys instead of using `api_key`.
+
+      circuit_breaker : Optional[CircuitBreaker]
+        Fails requests fast while the API keeps failing for an endpoint or AI server.
+
+      timeout : Optional[TimeoutConfig]
+        The connect, read and total timeouts of requests. Defaults to `TimeoutConfig()`.
+        Use `request_timeout` and `deadline` to change them for some calls.
+
+      canvas_cache : Optional[CanvasCache]
+        Caches the images of canvas methods so that repeated inputs aren't requested
+        again.
+
     Basic Example
     -------------
 
@@ -163,34 +240,235 @@ class Client(BaseClient):
 
     def __init__(
         self,
-        api_key: str,
+        api_key: Optional[str] = None,
         version: Optional[str] = "5",
         plan: Optional[str] = None,
         suppress_warnings: Optional[bool] = False,
+        transport: Optional[TransportConfig] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        server_selector: Optional[ServerSelector] = None,
+        cache: Optional[ResponseCache] = None,
+        json_decoder: Optional[Union[str, JSONDecoder]] = "auto",
+        session: Optional[requests.Session] = None,
+        key_pool: Optional[KeyPool] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        timeout: Optional[TimeoutConfig] = None,
+        canvas_cache: Optional[CanvasCache] = None,
     ):
+        if (api_key is None) == (key_pool is None):
+            raise ValueError("Either api_key or key_pool must be passed.")
+
         super().__init__(
             api_key=api_key,
             version=version,
             suppress_warnings=suppress_warnings,
         )
-        self._session = requests.Session()
-
-        if self.version == "5":
-            self._session.headers.update({"Authorization": self.api_key})
-        else:
-            self._session.headers.update({"x-api-key": self.api_key})
+        self.transport = transport or TransportConfig()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.server_selector = server_selector
+        self.cache = cache
+        self.json_decoder = get_json_decoder(json_decoder)
+        self.key_pool = key_pool
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout or TimeoutConfig()
+        self.canvas_cache = canvas_cache
+        self.metrics = ClientMetrics()
+        self._probe = None
+
+        if server_selector is not None:
+            server_selector._bind(self.version)
+        self._owns_session = session is None
+        self._session = self._create_session() if session is None else session
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_value, tb):
-        self._session.close()
+        self.close()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, tb):
-        self._session.close()
+        self.close()
+
+    def _request(self, method: str, endpoint: str, url: str, **kwargs):
+        """Sends a request to an endpoint and returns the decoded JSON body.
+
+        Every endpoint method goes through this so client-wide behaviour like rate
+        limiting and retries applies uniformly.
+        """
+        if self.retry_policy is None:
+            return self._send(method, endpoint, url, **kwargs)
+
+        retry = self.retry_policy._start()
+        while True:
+            try:
+                return self._send(method, endpoint, url, **kwargs)
+            except Exception as exc:
+                if not retry.retryable(exc):
+                    raise
+                delay = retry.next_delay(exc)
+                if delay is None:
+                    self.metrics.increment("retries_exhausted", endpoint)
+                    raise
+                self.metrics.increment("retries", endpoint)
+                time.sleep(delay)
+
+    def _send(self, method: str, endpoint: str, url: str, **kwargs):
+        if self.circuit_breaker is None:
+            return self._send_pooled(method, endpoint, url, **kwargs)
+
+        with self.circuit_breaker._guard(
+            self._circuit(endpoint, kwargs), self._SERVER_ERRORS
+        ):
+            return self._send_pooled(method, endpoint, url, **kwargs)
+
+    def _send_pooled(self, method: str, endpoint: str, url: str, **kwargs):
+        if self.key_pool is None:
+            return self._send_with_key(None, method, endpoint, url, **kwargs)
+
+        for _ in range(len(self.key_pool)):
+            key = self.key_pool.acquire()
+            try:
+                return self._send_with_key(key, method, endpoint, url, **kwargs)
+            except RateLimitExceeded:
+                raise
+            except RateLimited as exc:
+                # The key is cooling down now, send the request with another one.
+                error = exc
+                self.metrics.increment("key_rotations", endpoint)
+        raise error
+
+    def _send_with_key(
+        self, key: Optional[str], method: str, endpoint: str, url: str, **kwargs
+    ):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(endpoint)
+
+        reader = kwargs.pop("reader", None)
+        if isinstance(url, _EncodedURL):
+            # The query of a persona call is already in the URL.
+            kwargs.pop("params", None)
+        timeout = _resolve_timeout(self.timeout)._requests_timeout()
+        headers = self._auth_headers if key is None else {self._auth_header: key}
+        response = self._session.request(
+            method,
+            url,
+            headers=headers,
+            timeout=timeout,
+            stream=reader is not None,
+            **kwargs,
+        )
+
+        if key is not None:
+            self.key_pool.update(key, response.headers, response.status_code)
+        # A 429 of a pooled key only limits that key, not the client.
+        if self.rate_limiter is not None and not (
+            key is not None and response.status_code == 429
+        ):
+            self.rate_limiter.update(
+                endpoint, response.headers, response.status_code
+            )
+
+        if reader is not None:
+            with response:
+                _check_status(response)
+                return reader(response)
+
+        _check_status(response)
+        return self.json_decoder(response.content)
+
+    def _call(self, endpoint: str, **values):
+        """Requests an endpoint of the client's API version and parses the response.
+
+        The URL, query and parser come from the endpoint registry so endpoint methods
+        don't need to branch on the version.
+        """
+        endpoint = self._endpoints[endpoint]
+        url, params = endpoint.build(self._base_url, values, self._randomised_uid)
+        response = self._request(endpoint.method, endpoint.name, url, params=params)
+        return endpoint.parse(response, params)
+
+    def _stream(self, endpoint: str, reader, **values):
+        """Like `_call` but hands the raw response to `reader` instead of parsing it.
+
+        The body isn't read beforehand, so `reader` can consume it in chunks.
+        """
+        endpoint = self._endpoints[endpoint]
+        url, params = endpoint.build(self._base_url, values, self._randomised_uid)
+        return self._request(
+            endpoint.method, endpoint.name, url, params=params, reader=reader
+        )
+
+    _SERVER_ERRORS = (HTTPError, requests.RequestException)
+
+    def _auto_server(self, kwargs: dict) -> bool:
+        return (
+            self.server_selector is not None
+            and self._requested_server(kwargs) == "auto"
+        )
+
+    def _request_ai_failover(self, message: str, plan: str = "", **kwargs):
+        self._start_probe()
+        servers = self.server_selector.ranked()
+        for index, server in enumerate(servers):
+            kwargs["server"] = server
+            params, url = self._resolve_ai_params(message, plan, **kwargs)
+            started = time.monotonic()
+            try:
+                response = self._request("GET", "ai", url, params=params)
+            except self._SERVER_ERRORS:
+                self.server_selector.record_failure(server)
+                if index == len(servers) - 1:
+                    raise
+                self.metrics.increment("failovers", "ai")
+            else:
+                self.server_selector.record_success(
+                    server, time.monotonic() - started
+                )
+                return params, response
+
+    def _probe_server(self, server: str) -> None:
+        params, url = self._resolve_ai_params("ping", server=server)
+        started = time.monotonic()
+        try:
+            self._send("GET", "ai", url, params=params)
+        except self._SERVER_ERRORS:
+            self.server_selector.record_failure(server)
+        except Exception:
+            # Errors like rate limits say nothing about the server's health.
+            return
+        else:
+            self.server_selector.record_success(server, time.monotonic() - started)
+        self.metrics.increment("probes", "ai")
+
+    def _probe_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(self.server_selector.probe_interval):
+            for server in self.server_selector.due_for_probe():
+                if stop.is_set():
+                    return
+                self._probe_server(server)
+
+    def _start_probe(self) -> None:
+        if self._probe is not None or self.server_selector.probe_interval is None:
+            return
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._probe_loop,
+            args=(stop,),
+            name="randomstuff-server-probe",
+            daemon=True,
+        )
+        self._probe = (thread, stop)
+        thread.start()
+
+    def _stop_probe(self) -> None:
+        if self._probe is not None:
+            self._probe[1].set()
+            self._probe = None
 
     def get_ai_response(
         self, message: str, plan: str = "", **kwargs
@@ -252,39 +530,20 @@ class Client(BaseClient):
                 all optional and their default values can be found at:
                 https://docs.pgamerx.com/endpoints/ai#customisation
 
+            persona: A `BotPersona` with the plan, server and customisation parameters
+                     encoded up front. The customisation parameters above are ignored
+                     when it is passed.
+
         Returns: Response as an AIResponse object.
         """
         _check_coro(self)
-        params, url = self._resolve_ai_params(message, plan, **kwargs)
+        if self._auto_server(kwargs):
+            params, response = self._request_ai_failover(message, plan, **kwargs)
+        else:
+            params, url = self._resolve_ai_params(message, plan, **kwargs)
+            response = self._request("GET", "ai", url, params=params)
 
-        response = self._session.get(url, params=params)
-        _check_status(response)
-        response = response.json()
-
-        if self.version == "3":
-            return AIResponse(
-                message=response[0].get("message"),
-                response=response[0].get("message"),
-                api_key=response[0].get("api_key"),
-                success=response[0].get("success"),
-            )
-        elif self.version == "4":
-            return AIResponse(
-                message=response[0].get("message"),
-                response=response[0].get("message"),
-                response_time=response[1].get("response_time"),
-                success=True,
-                uid=params.get("uid"),
-                server=params.get("server"),
-            )
-        elif self.version == "5":
-            return AIResponse(
-                message=response[0].get("response"),
-                response=response[0].get("response"),
-                success=True,
-                uid=params.get("uid"),
-                server=params.get("server"),
-            )
+        return self._endpoints["ai"].parse(response, params)
 
     def get_image(self, type: str = "any") -> str:
         """Gets an image
@@ -303,18 +562,7 @@ class Client(BaseClient):
             return
 
         _check_coro(self)
-
-        if self.version == "3":
-            response = self._session.get(f"{self._base_url}/image/{type}")
-
-        elif self.version in ["4", "5"]:
-            response = self._session.get(
-                f"{self._base_url}/image", params={"type": type}
-            )
-
-        _check_status(response)
-
-        return response.json()[0]
+        return self._call("image", type=type)
 
     def get_joke(self, type: str = "any", blacklist: list = []) -> Joke:
         """Gets a joke
@@ -341,43 +589,7 @@ class Client(BaseClient):
             )
 
         _check_coro(self)
-
-        if self.version == "4":
-            response = self._session.get(
-                f"{self._base_url}/joke", params={"type": type}
-            )
-
-        elif self.version == "3":
-            response = self._session.get(f"{self._base_url}/joke/{type}")
-
-        elif self.version == "5":
-            blist = ""
-            if blacklist:
-                blist = ",".join(blacklist)
-
-            response = self._session.get(
-                f"{self._base_url}/premium/joke",
-                params={"type": type, "blacklist": blist},
-            )
-
-        _check_status(response)
-
-        response = response.json()
-
-        return Joke(
-            category=response.get("category"),
-            type=response.get("type"),
-            joke=response.get("joke")
-            if response.get("joke")
-            else {
-                "setup": response.get("setup"),
-                "delivery": response.get("delivery"),
-            },
-            flags=JokeFlags(**response.get("flags")),
-            id=response.get("id"),
-            safe=response.get("safe"),
-            lang=response.get("lang"),
-        )
+        return self._call("joke", type=type, blacklist=",".join(blacklist))
 
     def get_waifu(self, plan: str, type: str = "any") -> Waifu:
         """Gets a random waifu pic (SFW)
@@ -409,10 +621,7 @@ class Client(BaseClient):
         if type == "any":
             type = random.choice(WAIFU_TYPES)
 
-        if self.version == "3":
-            raise InvalidVersionError(
-                "Version 3 does not support this method."
-            )
+        self._check_supported("waifu")
 
         if not type in WAIFU_TYPES:
             raise InvalidType("Invalid waifu type provided")
@@ -421,19 +630,7 @@ class Client(BaseClient):
             raise InvalidPlanError("The plan provided is invalid.")
 
         _check_coro(self)
-
-        if self.version == "4":
-            response = self._session.get(
-                f"{self._base_url}/{plan}/waifu", params={"type": type}
-            )
-        elif self.version == "5":
-            response = self._session.get(
-                f"{self._base_url}/premium/{plan}/waifu", params={"type": type}
-            )
-
-        _check_status(response)
-
-        return Waifu(url=response.json()[0]["url"])
+        return self._call("waifu", plan=plan, type=type)
 
     def get_weather(self, city: str) -> Weather:
         """
@@ -453,30 +650,15 @@ class Client(BaseClient):
         Raises:
           InvalidCityError : The city provided is invalid or not found.
         """
-        if self.version == "3":
-            raise InvalidVersionError(
-                "Version 3 does not support this method."
-            )
-            return
-
-        response = self._session.get(
-            f"{self._base_url}/weather", params={"city": city}
-        )
+        self._check_supported("weather")
 
-        _check_status(response)
-        response = response.json()
-
-        if response[0].get("error") is True:
-            raise InvalidCityError(response[0].get("message"))
-
-        return Weather(
-            location=WeatherLocation(**response[0].get("location", {})),
-            current=CurrentWeather(**response[0].get("current", {})),
-            forecast=[
-                WeatherForecast(**forecast)
-                for forecast in response[0].get("forecast")
-            ],
-        )
+        if self.cache is not None:
+            return self.cache.get_or_fetch(
+                "weather",
+                self._cache_key("weather", city=city),
+                lambda: self._call("weather", city=city),
+            )
+        return self._call("weather", city=city)
 
     def get_covid_data(self, country: str = None):
         """Get covid-19 data of provided country or entire world.
@@ -494,51 +676,15 @@ class Client(BaseClient):
             Also in global data, all cases attributes are ``str`` instead of being Cases object like
             country data.
         """
-        if self.version in ["4", "3"]:
-            raise InvalidVersionError(
-                f"Version {self.version} does not support this method."
-            )
-            return
+        self._check_supported("covid")
 
-        response = self._session.get(
-            f"{self._base_url}/covid", params={"country": country}
-        )
-        _check_status(response)
-        response = response.json()
-
-        if country is None:
-            return GlobalCovidData(
-                total_cases=response.get("totalCases"),
-                total_deaths=response.get("totalDeaths"),
-                total_recovered=response.get("totalRecovered"),
-                active_cases=response.get("activeCases"),
-                closed_cases=response.get("closedCases"),
-                condition=CovidCondition(
-                    mild=response.get("condition")["mild"],
-                    critical=response.get("condition")["critical"],
-                ),
+        if self.cache is not None:
+            return self.cache.get_or_fetch(
+                "covid",
+                self._cache_key("covid", country=country),
+                lambda: self._call("covid", country=country),
             )
-
-        return CountryCovidData(
-            country=Country(
-                name=response.get("country")["name"],
-                flag_img=response.get("country")["flagImg"],
-            ),
-            cases=Cases(
-                total=response.get("cases")["total"],
-                recovered=response.get("cases")["recovered"],
-                deaths=response.get("cases")["deaths"],
-            ),
-            closed_cases=ClosedCases(
-                total=response.get("closedCases")["total"],
-                percentage=ClosedCasesPercentage(
-                    death=response.get("closedCases")["percentage"]["death"],
-                    discharge=response.get("closedCases")["percentage"][
-                        "discharge"
-                    ],
-                ),
-            ),
-        )
+        return self._call("covid", country=country)
 
     def canvas(
         self,
@@ -550,25 +696,128 @@ class Client(BaseClient):
         txt: str = None,
         save_to: str = None,
     ):
-        _validate_method_image(
-            method.lower(), img1=img1, img2=img2, img3=img3, txt=txt
-        )
-        query = _image_query_params(
-            method.lower(), img1=img1, img2=img2, img3=img3, txt=txt
-        )
-        response = self._session.post(f"{self._base_url}/canvas", params=query)
-        _check_status(response)
-        json = response.json()[0]
-        base = json["base64"]
-        b64 = base64.b64decode(base)
-        if file := save_to:
-            return open(file, "wb").write(b64)
+        """
+        Generates an image with a canvas method.
+
+        The response is read in chunks and its base64 is decoded as it arrives, so
+        memory use doesn't grow with the size of the image when saving it.
+
+        Parameters:
+
+          method : str
+            One of `ALL_METHODS`.
+
+          img1, img2, img3 : str
+            URLs of the images the method needs.
+
+          txt : str
+            The text of text methods.
+
+          save_to : Optional[Union[str, os.PathLike, BinaryIO]]
+            A path or binary file object to write the image to. A retried download
+            rewrites a path and rewinds a seekable file. Other files, like pipes or
+            sockets, can't be rewound, so the retry raises `UnsupportedOperation`.
+
+        Returns:
+          The number of bytes written with `save_to`, else the image.
+
+        Return Type:
+          Union[int, io.BytesIO]
+        """
+        query = _canvas_query(method, img1=img1, img2=img2, img3=img3, txt=txt)
+        if self.canvas_cache is not None:
+            data = self._fetch_canvas(query)
+            return io.BytesIO(data) if save_to is None else _write_image(data, save_to)
+
+        target = _canvas_target(save_to)
+
+        def read(response):
+            file = target()
+            written = _write_canvas(response.iter_content(_CHUNK_SIZE), file)
+            return file if save_to is None else written
+
+        result = self._stream("canvas", read, **query)
+        if save_to is None:
+            result.seek(0)
+        return result
+
+    def canvas_image(
+        self,
+        method: str,
+        *,
+        img1: str = None,
+        img2: str = None,
+        img3: str = None,
+        txt: str = None,
+        spool_threshold: Optional[int] = SPOOL_THRESHOLD,
+    ) -> CanvasImage:
+        """
+        Generates an image with a canvas method without copying it around.
+
+        Parameters:
+
+          method, img1, img2, img3, txt :
+            Same as for `canvas`.
+
+          spool_threshold : Optional[int]
+            Images larger than this many bytes are decoded into a memory-mapped
+            temporary file instead of memory. `None` keeps every image in memory.
+
+        Returns:
+          The image, whose `data` is a `memoryview` of the buffer it was decoded into.
+
+        Return Type:
+          CanvasImage
+        """
+        query = _canvas_query(method, img1=img1, img2=img2, img3=img3, txt=txt)
+
+        def read(response) -> _Spool:
+            spool = _Spool(spool_threshold)
+            try:
+                _write_canvas(response.iter_content(_CHUNK_SIZE), spool)
+            except BaseException:
+                spool.close()
+                raise
+            return spool
+
+        started = time.monotonic()
+        if self.canvas_cache is not None:
+            spool = _Spool(spool_threshold)
+            spool.write(self._fetch_canvas(query))
         else:
-            return io.BytesIO(b64)
+            spool = self._stream("canvas", read, **query)
+        return CanvasImage(query["method"], spool, time.monotonic() - started)
+
+    def _fetch_canvas(self, query: dict) -> bytes:
+        """Returns the image of a canvas query from `canvas_cache` or the API."""
+        key = self._canvas_key(query)
+        data = self.canvas_cache.get(key)
+        if data is None:
+
+            def read(response) -> bytes:
+                buffer = io.BytesIO()
+                _write_canvas(response.iter_content(_CHUNK_SIZE), buffer)
+                return buffer.getvalue()
+
+            data = self._stream("canvas", read, **query)
+            self.canvas_cache.put(key, data)
+        return data
+
+    def _create_session(self) -> requests.Session:
+        return self.transport.create_requests_session()
+
+    def pool_stats(self) -> PoolStats:
+        """Returns a snapshot of the connection pool.
+
+        This is useful to size `TransportConfig.pool_size` and `TransportConfig.per_host`.
+        """
+        return _requests_pool_stats(self._session, self.transport)
 
     def close(self):
-        """Closes the _session"""
-        self._session.close()
+        """Closes the _session, unless it was passed to the client"""
+        self._stop_probe()
+        if self._owns_session:
+            self._session.close()
 
 
 class AsyncClient(Client):
@@ -576,9 +825,24 @@ class AsyncClient(Client):
 
     Parameters
     ----------
-    api_key (str): Your API authentication key.
+    api_key (str) (optional): Your API authentication key. Required unless `key_pool` is passed.
     version (str) (optional): The version number of API. It is 3 by default set it to 2 if you want to use v2.
     suppress_warnings (bool) (optional): If this is set to True, You won't get any console warnings. This does not suppress errors.
+    transport (TransportConfig) (optional): The connection pooling options. This must be created inside a running event loop.
+    rate_limiter (RateLimiter) (optional): The client-side rate limiter that requests must pass before being sent.
+    retry_policy (RetryPolicy) (optional): How failed requests are retried. Requests are not retried by default.
+    server_selector (ServerSelector) (optional): Picks the AI server from observed latency and errors.
+    hedge_policy (HedgePolicy) (optional): Sends slow AI requests to the alternate server as well and uses the first answer.
+    cache (ResponseCache) (optional): Caches the results of `get_weather` and `get_covid_data`.
+    prefetch (PrefetchConfig) (optional): Keeps pools of prefetched jokes, images and waifus.
+    json_decoder (str or callable) (optional): Decodes response bodies from their raw bytes, `auto` by default.
+    session (aiohttp.ClientSession) (optional): An existing session to send requests with, like `shared_session()`. It isn't closed by the client.
+    key_pool (KeyPool) (optional): Spreads requests across several API keys instead of using `api_key`.
+    circuit_breaker (CircuitBreaker) (optional): Fails requests fast while the API keeps failing for an endpoint or AI server.
+    timeout (TimeoutConfig) (optional): The connect, read and total timeouts of requests.
+    concurrency_limiter (ConcurrencyLimiter) (optional): Adapts the number of requests in flight to the latency and errors of the API.
+    scheduler (RequestScheduler) (optional): Orders queued requests by priority and shares them fairly between tenants.
+    canvas_cache (CanvasCache) (optional): Caches the images of canvas methods so that repeated inputs aren't requested again.
 
 
     Methods
@@ -587,34 +851,65 @@ class AsyncClient(Client):
     async get_ai_response(message: str, plan: str = '', **kwargs): Get random AI response.
     async get_image(type: str = 'any'): Get random image.
     async get_joke(type: str = 'any'): Get random joke.
+    async prefill(method: str, *args, **kwargs): Fill the prefetch pool of a method.
+    async fetch_many(calls, concurrency: int = 10): Run many calls concurrently.
+    async canvas_many(jobs, output_dir: str = None, **kwargs): Generate many canvas images, yielding them as they finish.
+    async gather_ai_responses(messages, plan: str = '', **kwargs): Get AI responses for many messages.
     async close(): Closes the _session.
 
     """
 
     def __init__(
         self,
-        api_key: str,
+        api_key: Optional[str] = None,
         version: Optional[str] = "5",
         plan: Optional[str] = None,
         suppress_warnings: Optional[bool] = False,
+        transport: Optional[TransportConfig] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        server_selector: Optional[ServerSelector] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        cache: Optional[ResponseCache] = None,
+        prefetch: Optional[PrefetchConfig] = None,
+        json_decoder: Optional[Union[str, JSONDecoder]] = "auto",
+        session: Optional[aiohttp.ClientSession] = None,
+        key_pool: Optional[KeyPool] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        timeout: Optional[TimeoutConfig] = None,
+        concurrency_limiter: Optional[ConcurrencyLimiter] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        canvas_cache: Optional[CanvasCache] = None,
     ):
         super().__init__(
             api_key=api_key,
             version=version,
             suppress_warnings=suppress_warnings,
+            transport=transport,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            server_selector=server_selector,
+            cache=cache,
+            json_decoder=json_decoder,
+            session=session,
+            key_pool=key_pool,
+            circuit_breaker=circuit_breaker,
+            timeout=timeout,
+            canvas_cache=canvas_cache,
         )
-        self._session = aiohttp.ClientSession()
-
-        if self.version == "5":
-            self._session.headers.update({"Authorization": self.api_key})
-        else:
-            self._session.headers.update({"x-api-key": self.api_key})
+        if hedge_policy is not None and self.version == "3":
+            raise InvalidVersionError("Version 3 does not support hedging.")
+        self.hedge_policy = hedge_policy
+        self.prefetch = prefetch
+        self.concurrency_limiter = concurrency_limiter
+        self.scheduler = scheduler
+        self._prefetch_pools = {}
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_value, tb):
-        await self._session.close()
+        await self.close()
 
     def __enter__(self):
         return self
@@ -624,6 +919,261 @@ class AsyncClient(Client):
             'Could not close the client session. Please use "async with" instead\n'
         )
 
+    async def _request(self, method: str, endpoint: str, url: str, **kwargs):
+        """Equivalent to `Client._request`"""
+        if self.retry_policy is None:
+            return await self._send(method, endpoint, url, **kwargs)
+
+        retry = self.retry_policy._start()
+        while True:
+            try:
+                return await self._send(method, endpoint, url, **kwargs)
+            except Exception as exc:
+                if not retry.retryable(exc):
+                    raise
+                delay = retry.next_delay(exc)
+                if delay is None:
+                    self.metrics.increment("retries_exhausted", endpoint)
+                    raise
+                self.metrics.increment("retries", endpoint)
+                await asyncio.sleep(delay)
+
+    async def _send(self, method: str, endpoint: str, url: str, **kwargs):
+        if self.scheduler is None:
+            return await self._send_guarded(method, endpoint, url, **kwargs)
+
+        await _wait_within_deadline(
+            self.scheduler._acquire(*_scheduled(kwargs.get("params"))),
+            "the request scheduler",
+        )
+        try:
+            return await self._send_guarded(method, endpoint, url, **kwargs)
+        finally:
+            self.scheduler._release()
+
+    async def _send_guarded(self, method: str, endpoint: str, url: str, **kwargs):
+        if self.circuit_breaker is None:
+            return await self._send_pooled(method, endpoint, url, **kwargs)
+
+        with self.circuit_breaker._guard(
+            self._circuit(endpoint, kwargs), self._SERVER_ERRORS
+        ):
+            return await self._send_pooled(method, endpoint, url, **kwargs)
+
+    async def _send_pooled(self, method: str, endpoint: str, url: str, **kwargs):
+        if self.key_pool is None:
+            return await self._send_with_key(None, method, endpoint, url, **kwargs)
+
+        for _ in range(len(self.key_pool)):
+            key = self.key_pool.acquire()
+            try:
+                return await self._send_with_key(key, method, endpoint, url, **kwargs)
+            except RateLimitExceeded:
+                raise
+            except RateLimited as exc:
+                error = exc
+                self.metrics.increment("key_rotations", endpoint)
+        raise error
+
+    async def _send_with_key(
+        self, key: Optional[str], method: str, endpoint: str, url: str, **kwargs
+    ):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(endpoint)
+
+        limiter = self.concurrency_limiter
+        if limiter is None:
+            return await self._send_request(key, method, endpoint, url, **kwargs)
+
+        await _wait_within_deadline(limiter._acquire(), "the concurrency limiter")
+
+        started = time.monotonic()
+        overloaded = None
+        try:
+            response = await self._send_request(key, method, endpoint, url, **kwargs)
+            overloaded = False
+            return response
+        except (HTTPError, RateLimited, aiohttp.ClientError, asyncio.TimeoutError):
+            overloaded = True
+            raise
+        finally:
+            limiter._release(time.monotonic() - started, overloaded)
+
+    async def _send_request(
+        self, key: Optional[str], method: str, endpoint: str, url: str, **kwargs
+    ):
+        reader = kwargs.pop("reader", None)
+        if isinstance(url, _EncodedURL):
+            # The query of a persona call is already in the URL, keep yarl from
+            # parsing and quoting it again.
+            kwargs.pop("params", None)
+            url = yarl.URL(url, encoded=True)
+        timeout = _resolve_timeout(self.timeout)._aiohttp_timeout()
+        headers = self._auth_headers if key is None else {self._auth_header: key}
+        async with self._session.request(
+            method, url, headers=headers, timeout=timeout, **kwargs
+        ) as response:
+            if key is not None:
+                self.key_pool.update(key, response.headers, response.status)
+            if self.rate_limiter is not None and not (
+                key is not None and response.status == 429
+            ):
+                self.rate_limiter.update(
+                    endpoint, response.headers, response.status
+                )
+
+            _check_status(response)
+            if reader is not None:
+                return await reader(response)
+            return self.json_decoder(await response.read())
+
+    async def _call(self, endpoint: str, **values):
+        """Equivalent to `Client._call`"""
+        endpoint = self._endpoints[endpoint]
+        url, params = endpoint.build(self._base_url, values, self._randomised_uid)
+        response = await self._request(
+            endpoint.method, endpoint.name, url, params=params
+        )
+        return endpoint.parse(response, params)
+
+    async def _stream(self, endpoint: str, reader, **values):
+        """Equivalent to `Client._stream`, `reader` is a coroutine function."""
+        endpoint = self._endpoints[endpoint]
+        url, params = endpoint.build(self._base_url, values, self._randomised_uid)
+        return await self._request(
+            endpoint.method, endpoint.name, url, params=params, reader=reader
+        )
+
+    _SERVER_ERRORS = (HTTPError, aiohttp.ClientError, asyncio.TimeoutError)
+
+    async def _request_ai_failover(self, message: str, plan: str = "", **kwargs):
+        self._start_probe()
+        servers = self.server_selector.ranked()
+        for index, server in enumerate(servers):
+            kwargs["server"] = server
+            params, url = self._resolve_ai_params(message, plan, **kwargs)
+            started = time.monotonic()
+            try:
+                response = await self._request("GET", "ai", url, params=params)
+            except self._SERVER_ERRORS:
+                self.server_selector.record_failure(server)
+                if index == len(servers) - 1:
+                    raise
+                self.metrics.increment("failovers", "ai")
+            else:
+                self.server_selector.record_success(
+                    server, time.monotonic() - started
+                )
+                return params, response
+
+    def _hedge_servers(self):
+        if self.server_selector is not None:
+            servers = self.server_selector.ranked()
+        else:
+            servers = list(SERVERS_V5 if self.version == "5" else SERVERS_V4[:2])
+        return servers[0], (servers[1] if len(servers) > 1 else None)
+
+    async def _request_ai_hedged(self, message: str, plan: str = "", **kwargs):
+        policy = self.hedge_policy
+        selector = self.server_selector
+        if selector is not None:
+            self._start_probe()
+
+        async def attempt(server):
+            params, url = self._resolve_ai_params(
+                message, plan, **{**kwargs, "server": server}
+            )
+            started = time.monotonic()
+            try:
+                response = await self._request("GET", "ai", url, params=params)
+            except self._SERVER_ERRORS:
+                if selector is not None:
+                    selector.record_failure(server)
+                raise
+            latency = time.monotonic() - started
+            policy.observe(latency)
+            if selector is not None:
+                selector.record_success(server, latency)
+            return params, response
+
+        primary, alternate = self._hedge_servers()
+        policy._earn()
+        first = asyncio.ensure_future(attempt(primary))
+        tasks = [first]
+        try:
+            delay = policy.delay()
+            remaining = _remaining()
+            # A hedge couldn't start before the deadline of the call.
+            hedging = alternate is not None and (remaining is None or remaining > delay)
+            if hedging:
+                await asyncio.wait(tasks, timeout=delay)
+                hedging = not first.done() and policy._spend()
+
+            if not hedging:
+                try:
+                    return await first
+                except self._SERVER_ERRORS:
+                    if alternate is None:
+                        raise
+                # The primary server failed before a hedge was sent, fail over.
+                self.metrics.increment("failovers", "ai")
+                return await attempt(alternate)
+
+            self.metrics.increment("hedges", "ai")
+            hedge = asyncio.ensure_future(attempt(alternate))
+            tasks.append(hedge)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.cancelled():
+                        error = error or asyncio.CancelledError()
+                    elif task.exception() is None:
+                        if task is hedge:
+                            self.metrics.increment("hedge_wins", "ai")
+                        return task.result()
+                    else:
+                        error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _probe_server(self, server: str) -> None:
+        params, url = self._resolve_ai_params("ping", server=server)
+        started = time.monotonic()
+        try:
+            await self._send("GET", "ai", url, params=params)
+        except self._SERVER_ERRORS:
+            self.server_selector.record_failure(server)
+        except Exception:
+            # Errors like rate limits say nothing about the server's health.
+            return
+        else:
+            self.server_selector.record_success(server, time.monotonic() - started)
+        self.metrics.increment("probes", "ai")
+
+    async def _probe_loop(self) -> None:
+        _background()
+        while True:
+            await asyncio.sleep(self.server_selector.probe_interval)
+            for server in self.server_selector.due_for_probe():
+                await self._probe_server(server)
+
+    def _start_probe(self) -> None:
+        if self._probe is not None or self.server_selector.probe_interval is None:
+            return
+        self._probe = asyncio.ensure_future(self._probe_loop())
+
+    def _stop_probe(self) -> None:
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+
     async def get_ai_response(
         self, message: str, plan: str = "", **kwargs
     ) -> AIResponse:
@@ -634,122 +1184,137 @@ class AsyncClient(Client):
         Equivalent to `Client.get_ai_response`
         """
 
-        _check_coro(self)
-        params, url = self._resolve_ai_params(message, plan, **kwargs)
-
-        response = await self._session.get(url, params=params)
-        _check_status(response)
-        response = await response.json()
-
-        if self.version == "3":
-            obj = AIResponse(
-                message=response[0].get("message"),
-                response=response[0].get("message"),
-                api_key=response[0].get("api_key"),
-                success=response[0].get("success"),
-            )
-        elif self.version == "4":
-            obj = AIResponse(
-                message=response[0].get("message"),
-                response=response[0].get("message"),
-                response_time=response[1].get("response_time"),
-                success=True,
-                uid=params.get("uid"),
-                server=params.get("server"),
+        # A server passed by the caller is kept, so only automatic choices are hedged.
+        if self.hedge_policy is not None and self._requested_server(kwargs) == "auto":
+            params, response = await self._request_ai_hedged(
+                message, plan, **kwargs
             )
-        elif self.version == "5":
-            obj = AIResponse(
-                message=response[0].get("response"),
-                response=response[0].get("response"),
-                success=True,
-                uid=params.get("uid"),
-                server=params.get("server"),
+        elif self._auto_server(kwargs):
+            params, response = await self._request_ai_failover(
+                message, plan, **kwargs
             )
+        else:
+            params, url = self._resolve_ai_params(message, plan, **kwargs)
+            response = await self._request("GET", "ai", url, params=params)
 
-        return obj
+        return self._endpoints["ai"].parse(response, params)
 
-    async def get_joke(self, type: str = "any", blacklist: list = []) -> Joke:
+    def _prefetch_pool(self, key: tuple, fetch) -> _PrefetchPool:
+        pool = self._prefetch_pools.get(key)
+        if pool is None:
+            pool = self._prefetch_pools[key] = _PrefetchPool(fetch, self.prefetch)
+        return pool
+
+    async def _prefetched(self, key: tuple, fetch):
+        item = self._prefetch_pool(key, fetch).pop()
+        if item is _PrefetchPool._EMPTY:
+            return await fetch()
+        return item
+
+    async def prefill(self, method: str, *args, **kwargs) -> None:
         """
         This function is a coroutine
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        Equivalent to `Client.get_joke`
+        Fills the prefetch pool of a method and waits until it is full.
+
+        Pools are otherwise created on the first call of a method so this is useful to
+        warm them up on startup. The arguments are the same as the method's. If a
+        request fails, the refill stops and its error is raised.
+
+        Example:
+            await client.prefill("get_joke", type="dev")
+            await client.prefill("get_waifu", "pro", type="neko")
         """
+        if self.prefetch is None:
+            raise UnsupportedOperation("Prefetching is not enabled on this client.")
+        calls = {
+            "get_joke": self._joke_call,
+            "get_image": self._image_call,
+            "get_waifu": self._waifu_call,
+        }
+        if not method in calls:
+            raise ValueError(f"Method {method!r} cannot be prefetched.")
+
+        task = self._prefetch_pool(*calls[method](*args, **kwargs)).refill(force=True)
+        if task is not None:
+            error = await asyncio.shield(task)
+            if error is not None:
+                raise error
+
+    def prefetch_stats(self) -> dict:
+        """Returns the `PrefetchStats` of every pool keyed by `(endpoint, *params)`."""
+        return {key: pool.stats() for key, pool in self._prefetch_pools.items()}
+
+    # The pool key and the fetch function of the methods which can be prefetched,
+    # after validating their arguments.
+
+    def _joke_call(self, type: str = "any", blacklist: list = []):
         if not type in JOKE_TYPES:
             raise InvalidType("Invalid Joke type provided.")
-            return
 
         if self.version in ["3", "4"] and blacklist:
             raise InvalidVersionError(
                 "blacklisting of flags is only supported on version 5."
             )
 
-        _check_coro(self)
+        blacklist = ",".join(blacklist)
+        return (
+            ("joke", type, blacklist),
+            lambda: self._call("joke", type=type, blacklist=blacklist),
+        )
 
-        if self.version == "4":
-            response = await self._session.get(
-                f"{self._base_url}/joke", params={"type": type}
-            )
+    def _image_call(self, type: str = "any"):
+        if type != "any" and not type in IMAGE_TYPES:
+            raise InvalidType("Invalid image type provided.")
 
-        elif self.version == "3":
-            response = await self._session.get(f"{self._base_url}/joke/{type}")
+        return (
+            ("image", type),
+            lambda: self._call(
+                "image", type=random.choice(IMAGE_TYPES) if type == "any" else type
+            ),
+        )
 
-        elif self.version == "5":
-            blist = ""
-            if blacklist:
-                blist = ",".join(blacklist)
+    def _waifu_call(self, plan: str, type: str = "any"):
+        self._check_supported("waifu")
 
-            response = await self._session.get(
-                f"{self._base_url}/premium/joke",
-                params={"type": type, "blacklist": blist},
-            )
+        if type != "any" and not type in WAIFU_TYPES:
+            raise InvalidType("Invalid waifu type provided")
 
-        _check_status(response)
+        if not plan in PLANS:
+            raise InvalidPlanError("The plan provided is invalid.")
 
-        response = await response.json()
-
-        return Joke(
-            category=response.get("category"),
-            type=response.get("type"),
-            joke=response.get("joke")
-            if response.get("joke")
-            else {
-                "setup": response.get("setup"),
-                "delivery": response.get("delivery"),
-            },
-            flags=JokeFlags(**response.get("flags")),
-            id=response.get("id"),
-            safe=response.get("safe"),
-            lang=response.get("lang"),
+        return (
+            ("waifu", plan, type),
+            lambda: self._call(
+                "waifu",
+                plan=plan,
+                type=random.choice(WAIFU_TYPES) if type == "any" else type,
+            ),
         )
 
+    async def get_joke(self, type: str = "any", blacklist: list = []) -> Joke:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Equivalent to `Client.get_joke`
+        """
+        key, fetch = self._joke_call(type, blacklist)
+        if self.prefetch is not None:
+            return await self._prefetched(key, fetch)
+        return await fetch()
+
     async def get_image(self, type: str = "any") -> str:
         """This function is a coroutine
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
         Equivalent to `Client.get_image`
         """
-        if type == "any":
-            type = random.choice(IMAGE_TYPES)
-
-        if not type in IMAGE_TYPES:
-            raise InvalidType("Invalid image type provided.")
-
-        _check_coro(self)
-
-        if self.version == "3":
-            response = await self._session.get(
-                f"{self._base_url}/image/{type}"
-            )
-
-        elif self.version in ["4", "5"]:
-            response = await self._session.get(
-                f"{self._base_url}/image", params={"type": type}
-            )
-
-        _check_status(response)
-
-        return (await response.json())[0]
+        key, fetch = self._image_call(type)
+        if self.prefetch is not None:
+            return await self._prefetched(key, fetch)
+        return await fetch()
 
     async def get_waifu(self, plan: str, type: str = "any") -> Waifu:
         """
@@ -758,34 +1323,10 @@ class AsyncClient(Client):
 
         Equivalent to `Client.get_waifu`
         """
-        if type == "any":
-            type = random.choice(WAIFU_TYPES)
-
-        if self.version == "3":
-            raise InvalidVersionError(
-                "Version 3 does not support this method."
-            )
-
-        if not type in WAIFU_TYPES:
-            raise InvalidType("Invalid waifu type provided")
-
-        if not plan in PLANS:
-            raise InvalidPlanError("The plan provided is invalid.")
-
-        _check_coro(self)
-
-        if self.version == "4":
-            response = await self._session.get(
-                f"{self._base_url}/{plan}/waifu", params={"type": type}
-            )
-        elif self.version == "5":
-            response = await self._session.get(
-                f"{self._base_url}/premium/{plan}/waifu", params={"type": type}
-            )
-
-        _check_status(response)
-
-        return Waifu(url=(await response.json())[0]["url"])
+        key, fetch = self._waifu_call(plan, type)
+        if self.prefetch is not None:
+            return await self._prefetched(key, fetch)
+        return await fetch()
 
     async def get_weather(self, city: str) -> Weather:
         """
@@ -795,29 +1336,15 @@ class AsyncClient(Client):
         Equivalent to `Client.get_weather`
         """
 
-        if self.version == "3":
-            raise InvalidVersionError(
-                "Version 3 does not support this method."
-            )
-
-        response = await self._session.get(
-            f"{self._base_url}/weather", params={"city": city}
-        )
+        self._check_supported("weather")
 
-        _check_status(response)
-        response = await response.json()
-
-        if response[0].get("error") is True:
-            raise InvalidCityError(response[0].get("message"))
-
-        return Weather(
-            location=WeatherLocation(**response[0].get("location", {})),
-            current=CurrentWeather(**response[0].get("current", {})),
-            forecast=[
-                WeatherForecast(**forecast)
-                for forecast in response[0].get("forecast")
-            ],
-        )
+        if self.cache is not None:
+            return await self.cache.get_or_fetch_async(
+                "weather",
+                self._cache_key("weather", city=city),
+                lambda: self._call("weather", city=city),
+            )
+        return await self._call("weather", city=city)
 
     async def get_covid_data(self, country: str = None):
         """This function is a coroutine
@@ -825,51 +1352,15 @@ class AsyncClient(Client):
 
         Equivalent to `Client.get_covid_data`
         """
-        if self.version in ["4", "3"]:
-            raise InvalidVersionError(
-                f"Version {self.version} does not support this method."
-            )
-            return
+        self._check_supported("covid")
 
-        response = await self._session.get(
-            f"{self._base_url}/covid", params={"country": country}
-        )
-        _check_status(response)
-        response = await response.json()
-
-        if country is None:
-            return GlobalCovidData(
-                total_cases=response.get("totalCases"),
-                total_deaths=response.get("totalDeaths"),
-                total_recovered=response.get("totalRecovered"),
-                active_cases=response.get("activeCases"),
-                closed_cases=response.get("closedCases"),
-                condition=CovidCondition(
-                    mild=response.get("condition")["mild"],
-                    critical=response.get("condition")["critical"],
-                ),
+        if self.cache is not None:
+            return await self.cache.get_or_fetch_async(
+                "covid",
+                self._cache_key("covid", country=country),
+                lambda: self._call("covid", country=country),
             )
-
-        return CountryCovidData(
-            country=Country(
-                name=response.get("country")["name"],
-                flag_img=response.get("country")["flagImg"],
-            ),
-            cases=Cases(
-                total=response.get("cases")["total"],
-                recovered=response.get("cases")["recovered"],
-                deaths=response.get("cases")["deaths"],
-            ),
-            closed_cases=ClosedCases(
-                total=response.get("closedCases")["total"],
-                percentage=ClosedCasesPercentage(
-                    death=response.get("closedCases")["percentage"]["death"],
-                    discharge=response.get("closedCases")["percentage"][
-                        "discharge"
-                    ],
-                ),
-            ),
-        )
+        return await self._call("covid", country=country)
 
     async def canvas(
         self,
@@ -881,30 +1372,361 @@ class AsyncClient(Client):
         txt: str = None,
         save_to: str = None,
     ):
-        _validate_method_image(
-            method.lower(), img1=img1, img2=img2, img3=img3, txt=txt
-        )
-        query = _image_query_params(
-            method.lower(), img1=img1, img2=img2, img3=img3, txt=txt
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Equivalent to `Client.canvas`, `save_to` may also be an async writer like
+        `asyncio.StreamWriter` or an aiofiles file. Like pipes, these can't be rewound
+        for a retry.
+        """
+        query = _canvas_query(method, img1=img1, img2=img2, img3=img3, txt=txt)
+        if self.canvas_cache is not None:
+            data = await self._fetch_canvas(query)
+            if save_to is None:
+                return io.BytesIO(data)
+            return await _write_image_async(data, save_to)
+
+        target = _canvas_target(save_to)
+
+        async def read(response):
+            file = target()
+            written = await _write_canvas_async(
+                response.content.iter_chunked(_CHUNK_SIZE), file
+            )
+            return file if save_to is None else written
+
+        result = await self._stream("canvas", read, **query)
+        if save_to is None:
+            result.seek(0)
+        return result
+
+    async def canvas_image(
+        self,
+        method: str,
+        *,
+        img1: str = None,
+        img2: str = None,
+        img3: str = None,
+        txt: str = None,
+        spool_threshold: Optional[int] = SPOOL_THRESHOLD,
+    ) -> CanvasImage:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Equivalent to `Client.canvas_image`
+        """
+        query = _canvas_query(method, img1=img1, img2=img2, img3=img3, txt=txt)
+
+        async def read(response) -> _Spool:
+            spool = _Spool(spool_threshold)
+            try:
+                await _write_canvas_async(
+                    response.content.iter_chunked(_CHUNK_SIZE), spool
+                )
+            except BaseException:
+                spool.close()
+                raise
+            return spool
+
+        started = time.monotonic()
+        if self.canvas_cache is not None:
+            spool = _Spool(spool_threshold)
+            spool.write(await self._fetch_canvas(query))
+        else:
+            spool = await self._stream("canvas", read, **query)
+        return CanvasImage(query["method"], spool, time.monotonic() - started)
+
+    async def _fetch_canvas(self, query: dict) -> bytes:
+        """Equivalent to `Client._fetch_canvas`"""
+        key = self._canvas_key(query)
+        data = await self.canvas_cache.get_async(key)
+        if data is None:
+
+            async def read(response) -> bytes:
+                buffer = io.BytesIO()
+                await _write_canvas_async(
+                    response.content.iter_chunked(_CHUNK_SIZE), buffer
+                )
+                return buffer.getvalue()
+
+            data = await self._stream("canvas", read, **query)
+            await self.canvas_cache.put_async(key, data)
+        return data
+
+    async def fetch_many(
+        self, calls: Iterable, *, concurrency: int = 10
+    ) -> List[BatchResult]:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Runs many calls concurrently over the client's session.
+
+        Parameters:
+            calls (Iterable) : The calls to run. Each call can be a `BatchRequest`, a method name
+                               or a tuple of `(method, kwargs)` or `(method, args, kwargs)`.
+                               Supported methods are listed in `BATCH_METHODS`.
+            concurrency (optional) (int) : Maximum number of calls in flight at once. Defaults to 10.
+
+        Returns:
+            List[BatchResult]: One result per call, in the same order as `calls`. Errors raised by
+                               a call, including a malformed call, are stored on its result
+                               instead of being raised.
+
+        Example:
+            results = await client.fetch_many(
+                [("get_joke", {"type": "dev"}), ("get_weather", ("London",), {})],
+                concurrency=20,
+            )
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        calls = list(calls)
+        results = [None] * len(calls)
+        pending = iter(enumerate(calls))
+
+        async def worker():
+            for index, call in pending:
+                request = None
+                try:
+                    request = BatchRequest.from_call(call)
+                    result = await getattr(self, request.method)(
+                        *request.args, **request.kwargs
+                    )
+                except Exception as exc:
+                    results[index] = BatchResult(request=request, error=exc)
+                else:
+                    results[index] = BatchResult(request=request, result=result)
+
+        workers = min(concurrency, len(calls))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+    async def gather_ai_responses(
+        self,
+        messages: Iterable[str],
+        plan: str = "",
+        *,
+        concurrency: int = 10,
+        **kwargs,
+    ) -> List[BatchResult]:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Gets AI responses for many messages concurrently.
+
+        This is a shorthand for `fetch_many` where every call is `get_ai_response`.
+        `plan` and other keyword arguments are passed to each `get_ai_response` call.
+
+        Returns:
+            List[BatchResult]: One result per message, in the same order as `messages`.
+        """
+        return await self.fetch_many(
+            (
+                BatchRequest(
+                    method="get_ai_response",
+                    args=(message, plan),
+                    kwargs=kwargs,
+                )
+                for message in messages
+            ),
+            concurrency=concurrency,
         )
-        response = await self._session.post(
-            f"{self._base_url}/canvas", params=query
+
+    async def canvas_many(
+        self,
+        jobs: Iterable,
+        output_dir: Optional[str] = None,
+        *,
+        concurrency: int = 10,
+        executor: Optional[Union[str, concurrent.futures.Executor]] = None,
+        offload_threshold: Optional[int] = OFFLOAD_THRESHOLD,
+        manifest: Optional[str] = "manifest.jsonl",
+    ) -> AsyncIterator[CanvasResult]:
+        """
+        Generates many canvas images concurrently, yielding them as they finish.
+
+        Requests overlap like with `fetch_many`. Decoding the base64 of an image holds
+        the GIL, so response bodies of at least `offload_threshold` bytes are decoded,
+        and written to `output_dir`, in `executor` instead of the event loop.
+
+        Parameters:
+            jobs (Iterable) : The images to generate. Each job can be a `CanvasJob`, a `dict`
+                              of its attributes or a method name. Jobs are consumed lazily.
+                              A job named like an earlier one fails instead of overwriting
+                              its image.
+            output_dir (optional) (str) : The directory to write the images to, created if
+                                          needed. Without it results carry the images instead.
+            concurrency (optional) (int) : Maximum number of requests in flight at once.
+            executor (optional) (str or Executor) : `process` or `thread` for a pool created for
+                                                    the call, or an executor to use. Defaults to
+                                                    `process` with `output_dir`, where workers
+                                                    write the images themselves, else `thread`.
+                                                    A process pool starts new workers on every
+                                                    call, forking the program on Linux, so pass
+                                                    a long-lived executor when calling this often.
+            offload_threshold (optional) (int) : Response bodies smaller than this are decoded in
+                                                 the event loop. `None` never uses the executor.
+            manifest (optional) (str) : The file in `output_dir` a JSON line is appended to for
+                                        every result. `None` writes no manifest.
+
+        Yields:
+            CanvasResult: One result per job, in the order they finish. Errors raised for a
+                          job are stored on its result instead of being raised.
+
+        Example:
+            jobs = [{"method": "trigger", "img1": url, "name": str(user_id)} for user_id, url in avatars]
+            async for result in client.canvas_many(jobs, "out", concurrency=20):
+                if not result.ok:
+                    print(result.job.name, result.error)
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        if executor is None:
+            executor = "thread" if output_dir is None else "process"
+        owned = isinstance(executor, str)
+        if owned:
+            if not executor in CANVAS_EXECUTORS:
+                raise ValueError(f"Invalid executor. Choose from {CANVAS_EXECUTORS}")
+            executor = (
+                concurrent.futures.ProcessPoolExecutor()
+                if executor == "process"
+                else concurrent.futures.ThreadPoolExecutor()
+            )
+
+        manifest_file = None
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            if manifest is not None:
+                manifest_file = open(os.path.join(output_dir, manifest), "a")
+
+        pending = enumerate(jobs)
+        # The names written to `output_dir` so far, to catch jobs of the same name.
+        names = set()
+        results = asyncio.Queue(maxsize=concurrency)
+
+        async def worker():
+            try:
+                for index, job in pending:
+                    await results.put(
+                        await self._render_canvas(
+                            index, job, output_dir, names, executor, offload_threshold
+                        )
+                    )
+            except Exception as exc:
+                await results.put(exc)
+            else:
+                await results.put(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            running = len(workers)
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                    continue
+                if isinstance(result, Exception):
+                    raise result
+                if manifest_file is not None:
+                    manifest_file.write(json.dumps(result._manifest_entry()) + "\n")
+                    manifest_file.flush()
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if manifest_file is not None:
+                manifest_file.close()
+            if owned:
+                # Cancelling the workers cancelled their calls still queued in it.
+                executor.shutdown(wait=False)
+
+    async def _render_canvas(
+        self,
+        index: int,
+        job,
+        output_dir: Optional[str],
+        names: set,
+        executor: concurrent.futures.Executor,
+        offload_threshold: Optional[int],
+    ) -> CanvasResult:
+        started = time.monotonic()
+        try:
+            job = CanvasJob.from_job(job)
+            query = job._query()
+            path = None
+            if output_dir is not None:
+                name = job.name or f"{index:06d}-{query['method']}"
+                if name in names:
+                    raise ValueError(f"Another job is already written to {name!r}.")
+                names.add(name)
+                path = os.path.join(output_dir, name)
+
+            cache = self.canvas_cache
+            key = None if cache is None else self._canvas_key(query)
+            cached = None if cache is None else await cache.get_async(key)
+            if cached is not None:
+                # Only the write is left to do.
+                work, argument = _save_image, cached
+            else:
+                work = _decode_canvas
+                argument = await self._stream(
+                    "canvas", lambda response: response.read(), **query
+                )
+
+            keep = cache is not None and cached is None
+            if offload_threshold is not None and len(argument) >= offload_threshold:
+                loop = asyncio.get_running_loop()
+                data, size, content_type, path = await loop.run_in_executor(
+                    executor, work, argument, path, keep
+                )
+            else:
+                data, size, content_type, path = work(argument, path, keep)
+
+            if keep:
+                await cache.put_async(key, data)
+                if path is not None:
+                    data = None
+        except Exception as exc:
+            return CanvasResult(
+                job=job if isinstance(job, CanvasJob) else CanvasJob(),
+                index=index,
+                latency=time.monotonic() - started,
+                error=exc,
+            )
+        return CanvasResult(
+            job=job,
+            index=index,
+            path=path,
+            data=data,
+            size=size,
+            content_type=content_type,
+            latency=time.monotonic() - started,
         )
-        _check_status(response)
-        json = await response.json()[0]
-        base = json["base64"]
-        b64 = base64.b64decode(base)
-        if file := save_to:
-            return open(file, "wb").write(b64)
-        else:
-            return io.BytesIO(b64)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(connector=self.transport.create_connector())
+
+    def pool_stats(self) -> PoolStats:
+        """Equivalent to `Client.pool_stats`"""
+        return _connector_pool_stats(self._session.connector)
 
     async def close(self):
         """
         This function is a coroutine
         ----------------------------
 
-        Closes a _session
+        Closes a _session, unless it was passed to the client
 
         """
-        await self._session.close()
+        self._stop_probe()
+        for pool in self._prefetch_pools.values():
+            pool.cancel()
+        if self._owns_session:
+            await self._session.close()
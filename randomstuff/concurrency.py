@@ -0,0 +1,194 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+import asyncio
+import time
+
+from ._helper import _wait_for_slot
+
+
+@dataclass(frozen=True)
+class ConcurrencyStats:
+    """
+    Represents the state of a `ConcurrencyLimiter`.
+
+    Attributes
+    ----------
+
+      limit : int
+        The number of requests currently allowed in flight.
+
+      in_flight : int
+        Requests being sent right now.
+
+      queued : int
+        Requests waiting for a free slot.
+
+      increases : int
+        Times the limit grew.
+
+      decreases : int
+        Times the limit was cut.
+
+      latency : Optional[float]
+        Moving average of response times in seconds the limiter compares new ones to.
+    """
+
+    limit: int
+    in_flight: int = 0
+    queued: int = 0
+    increases: int = 0
+    decreases: int = 0
+    latency: Optional[float] = None
+
+
+class ConcurrencyLimiter:
+    """
+    Adapts how many requests `AsyncClient` has in flight to what the API can serve.
+
+    Pass an instance to `AsyncClient` through the `concurrency_limiter` parameter.
+    Requests over the limit wait in a queue. The limit follows AIMD: every response
+    which isn't slower than `latency_tolerance` times the average grows the limit by
+    `1 / limit`, so by about one per round trip, while it is being used. A latency
+    spike, 429, 5xx, connection error or timeout cuts the limit by `decrease_factor`,
+    at most once per average response time so that one burst of failures doesn't
+    collapse it.
+
+    Parameters
+    ----------
+      initial_limit : Optional[int]
+        The limit to start with.
+
+      min_limit : Optional[int]
+        The limit is never cut below this.
+
+      max_limit : Optional[int]
+        The limit never grows above this.
+
+      decrease_factor : Optional[float]
+        The limit is multiplied by this when the API is overloaded.
+
+      latency_tolerance : Optional[float]
+        A response slower than this many times the average counts as a latency spike.
+
+      smoothing : Optional[float]
+        Weight of a new response time in the moving average, between 0 and 1.
+    """
+
+    def __init__(
+        self,
+        initial_limit: Optional[int] = 10,
+        *,
+        min_limit: Optional[int] = 1,
+        max_limit: Optional[int] = 200,
+        decrease_factor: Optional[float] = 0.5,
+        latency_tolerance: Optional[float] = 2.0,
+        smoothing: Optional[float] = 0.1,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters = deque()
+        self._latency = None
+        self._last_decrease = 0.0
+        self._increases = 0
+        self._decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """The number of requests currently allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Requests being sent right now."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a free slot."""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def _acquire(self) -> None:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        await _wait_for_slot(waiter, self._pass_on, lambda: self._leave(waiter))
+
+    def _pass_on(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    def _leave(self, waiter: asyncio.Future) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def _release(self, latency: float, overloaded: Optional[bool]) -> None:
+        # `overloaded` is None when the request says nothing about the API, like when
+        # it was cancelled.
+        used = self._in_flight
+        self._in_flight -= 1
+
+        if overloaded is not None:
+            average = self._latency
+            spike = average is not None and latency > average * self.latency_tolerance
+            if overloaded or spike:
+                self._decrease(average if average is not None else latency)
+            elif used * 2 >= self._limit:
+                # Only grow a limit which is actually used, otherwise it says nothing
+                # about what the API can serve.
+                self._increase()
+
+            if not overloaded:
+                if average is None:
+                    self._latency = latency
+                else:
+                    self._latency += self.smoothing * (latency - average)
+
+        self._wake()
+
+    def _increase(self) -> None:
+        limit = min(self.max_limit, self._limit + 1 / self._limit)
+        if int(limit) > int(self._limit):
+            self._increases += 1
+        self._limit = limit
+
+    def _decrease(self, round_trip: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < round_trip:
+            return
+        self._last_decrease = now
+        limit = max(self.min_limit, self._limit * self.decrease_factor)
+        if int(limit) < int(self._limit):
+            self._decreases += 1
+        self._limit = limit
+
+    def stats(self) -> ConcurrencyStats:
+        """Returns the current `ConcurrencyStats`."""
+        return ConcurrencyStats(
+            limit=self.limit,
+            in_flight=self._in_flight,
+            queued=self.queue_depth,
+            increases=self._increases,
+            decreases=self._decreases,
+            latency=self._latency,
+        )
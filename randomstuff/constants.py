@@ -17,12 +17,28 @@ WAIFU_TYPES = ["waifu", "neko", "shinobu", "megumin", "bully", "cuddle"]
 
 PLANS = ["", "pro", "ultra", "biz", "mega"]  # Order lowest -> highest
 
+# Client-side default quotas per plan as (requests per second, burst).
+# These are conservative defaults, pass explicit limits to RateLimiter to match your key.
+PLAN_RATE_LIMITS = {
+    "": (1, 5),
+    "pro": (5, 10),
+    "ultra": (10, 20),
+    "biz": (20, 40),
+    "mega": (50, 100),
+}
+
 VERSIONS = ["3", "4", "5"]
 DISCONTINUED_VERSIONS = ["2"]  # Order: oldest -> newest
 
+# Default seconds cached responses are kept for, per endpoint.
+CACHE_TTLS = {"weather": 600, "covid": 3600}
+
 SERVERS_V4 = ["primary", "backup", "unstable"]
 SERVERS_V5 = ["main", "backup"]
 
+# AI servers per version, the first one is the default.
+AI_SERVERS = {"4": SERVERS_V4, "5": SERVERS_V5}
+
 ONE_IMAGE_METHODS = [
     "affect",
     "beautiful",
@@ -0,0 +1,41 @@
+from typing import Any, Callable, Union
+import importlib
+
+
+JSON_DECODERS = ["auto", "orjson", "ujson", "json"]
+
+# Order in which "auto" tries the decoders, fastest first.
+_PREFERRED_DECODERS = ["orjson", "ujson", "json"]
+
+JSONDecoder = Callable[[bytes], Any]
+
+
+def _load_decoder(name: str) -> JSONDecoder:
+    return importlib.import_module(name).loads
+
+
+def get_json_decoder(decoder: Union[str, JSONDecoder] = "auto") -> JSONDecoder:
+    """Returns a function decoding a JSON response body from its raw bytes.
+
+    Parameters
+    ----------
+      decoder : Union[str, Callable[[bytes], Any]]
+        Either one of `JSON_DECODERS` or a function taking the body bytes. `auto`
+        (default) picks the fastest installed one of `orjson`, `ujson` and the
+        standard library's `json`. Naming a decoder which isn't installed raises
+        `ImportError`.
+    """
+    if callable(decoder):
+        return decoder
+
+    if not decoder in JSON_DECODERS:
+        raise ValueError(f"Invalid JSON decoder. Choose from {JSON_DECODERS}")
+
+    if decoder != "auto":
+        return _load_decoder(decoder)
+
+    for name in _PREFERRED_DECODERS:
+        try:
+            return _load_decoder(name)
+        except ImportError:
+            continue
@@ -5,10 +5,11 @@ class HTTPError(Exception):
     when API is has something wrong.
     """
 
-    def __init__(self, message, status):
+    def __init__(self, message, status, retry_after=None):
         super().__init__(message)
         self.message = message
         self.status = status
+        self.retry_after = retry_after
 
 
 class ArgumentError(Exception):
@@ -110,6 +111,88 @@ class RateLimited(Exception):
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     Raised when the API key is being Rate Limited.
+
+    Attributes
+    ----------
+
+      retry_after : Optional[float]
+        Seconds after which the API allows requests again, if it said so.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(RateLimited):
+    """
+    Inherits from `RateLimited`
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Raised by the client-side `RateLimiter` when a request would exceed the configured
+    quota. The request is never sent to the API.
+
+    Attributes
+    ----------
+
+      retry_after : float
+        Seconds after which the request would be allowed.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message, retry_after=retry_after)
+        self.message = message
+
+
+class CircuitOpen(HTTPError):
+    """
+    Inherits from `HTTPError`
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Raised by the client-side `CircuitBreaker` while the API is considered down for an
+    endpoint or AI server. The request is never sent to the API.
+
+    Attributes
+    ----------
+
+      circuit : str
+        The name of the open circuit, like `weather` or `ai/main`.
+
+      retry_after : float
+        Seconds after which the circuit lets a trial request through.
+    """
+
+    def __init__(self, message, circuit, retry_after):
+        super().__init__(message, status=None, retry_after=retry_after)
+        self.circuit = circuit
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a call can't finish before the deadline set with `randomstuff.deadline`.
     """
 
     pass
+
+
+class QueueFull(Exception):
+    """
+    Raised by the client-side `RequestScheduler` when a request doesn't fit in its
+    queue, or was dropped from it to make room for a newer one. The request is never
+    sent to the API.
+
+    Attributes
+    ----------
+
+      tenant : Optional[str]
+        The tenant of the request.
+
+      priority : str
+        The priority of the request, one of `PRIORITIES`.
+    """
+
+    def __init__(self, message, tenant, priority):
+        super().__init__(message)
+        self.message = message
+        self.tenant = tenant
+        self.priority = priority
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Optional
+import threading
+
+
+class HedgePolicy:
+    """
+    Controls hedged requests for `AsyncClient.get_ai_response`.
+
+    When an AI request hasn't been answered within the `percentile` of recent response
+    times, the same request is sent to the alternate server. Whichever answers first is
+    returned and the other one is cancelled. If the first server fails before a hedge
+    is sent, the request fails over to the alternate server instead. Requests to a
+    server passed to `get_ai_response` are never hedged.
+
+    To cap the extra load, every request earns `budget` hedge tokens (up to `burst`) and
+    every hedge spends one. With the default budget, hedging adds at most 5% requests.
+
+    Pass an instance to `AsyncClient` through the `hedge_policy` parameter.
+
+    Parameters
+    ----------
+      percentile : Optional[float]
+        The percentile of recent latencies, between 0 and 100, after which to hedge.
+
+      initial_delay : Optional[float]
+        Seconds to wait before hedging until `min_samples` latencies are recorded.
+
+      min_delay : Optional[float]
+        The lower bound of the hedging delay in seconds.
+
+      window : Optional[int]
+        How many recent latencies are kept.
+
+      min_samples : Optional[int]
+        The number of latencies required before `percentile` is used.
+
+      budget : Optional[float]
+        The hedges allowed per request, as a fraction.
+
+      burst : Optional[int]
+        Maximum hedge tokens that can be saved up.
+    """
+
+    def __init__(
+        self,
+        percentile: Optional[float] = 95,
+        *,
+        initial_delay: Optional[float] = 1.0,
+        min_delay: Optional[float] = 0.01,
+        window: Optional[int] = 200,
+        min_samples: Optional[int] = 20,
+        budget: Optional[float] = 0.05,
+        burst: Optional[int] = 10,
+    ):
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if budget < 0:
+            raise ValueError("budget cannot be negative")
+
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.burst = burst
+        self._latencies = deque(maxlen=window)
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Returns the seconds to wait for an answer before hedging."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+
+        index = min(
+            len(latencies) - 1, int(len(latencies) * self.percentile / 100)
+        )
+        return max(self.min_delay, latencies[index])
+
+    def observe(self, latency: float) -> None:
+        """Records the response time of an answered request."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
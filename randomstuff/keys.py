@@ -0,0 +1,231 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+import threading
+import time
+
+from .constants import *
+from .errors import *
+from ._helper import _parse_retry_after
+from .ratelimit import _header_number, _reset_delay
+
+
+# Seconds a key answered with 429 is at least left alone.
+_MIN_COOLDOWN = 1.0
+
+
+@dataclass(frozen=True)
+class KeyUsage:
+    """
+    Represents the usage of a single API key of a `KeyPool`.
+
+    Attributes
+    ----------
+
+      plan : str
+        The plan of the key.
+
+      weight : float
+        The share of requests the key gets when every key has budget left.
+
+      requests : int
+        Requests sent with the key.
+
+      rate_limited : int
+        Requests the API answered with 429 for this key.
+
+      remaining : Optional[int]
+        The requests left in the current window, from the `X-RateLimit-Remaining` header
+        of the last response. `None` if the API hasn't sent it.
+
+      cooldown : float
+        Seconds until the key is used again, 0 if it is available.
+
+      rate : float
+        Requests per second sent with the key recently.
+
+      capacity : float
+        Requests per second the key's plan allows, from `PLAN_RATE_LIMITS`.
+    """
+
+    plan: str
+    weight: float
+    requests: int = 0
+    rate_limited: int = 0
+    remaining: Optional[int] = None
+    cooldown: float = 0.0
+    rate: float = 0.0
+    capacity: float = 0.0
+
+
+class _PooledKey:
+    def __init__(self, key: str, plan: str, weight: float, window: float):
+        self.key = key
+        self.plan = plan
+        self.weight = weight
+        self.window = window
+        self.current = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+        self.remaining = None
+        self.limit = None
+        self.available_at = 0.0
+        self.sent = deque()
+
+    def effective_weight(self) -> float:
+        if self.remaining is not None and self.limit:
+            # Keep a little weight so that keys with an outdated budget get used and
+            # learn their new one.
+            return self.weight * min(1.0, max(1, self.remaining) / self.limit)
+        return self.weight
+
+    def record(self, now: float) -> None:
+        self.requests += 1
+        self.sent.append(now)
+        self.rate(now)
+
+    def rate(self, now: float) -> float:
+        while self.sent and self.sent[0] <= now - self.window:
+            self.sent.popleft()
+        return len(self.sent) / self.window
+
+
+class KeyPool:
+    """
+    Spreads requests of a client across several API keys.
+
+    Pass an instance to `Client` or `AsyncClient` through the `key_pool` parameter
+    instead of an `api_key`. Every request is sent with the next key of a smooth
+    weighted round-robin. A key's weight is the rate of its plan in `PLAN_RATE_LIMITS`,
+    scaled down by the budget it has left once the API sends `X-RateLimit-Remaining`
+    and `X-RateLimit-Limit`.
+
+    When the API answers 429 for a key, the key cools down for its `Retry-After`, or
+    `cooldown` seconds, but at least a second, and the request is sent again with
+    another key. Every key is tried at most once per request. The client raises
+    `RateLimited` when they are all rate limited or cooling down.
+
+    Parameters
+    ----------
+      keys : Iterable[Union[str, Tuple[str, str]]]
+        The API keys, either alone or as a tuple of `(key, plan)`. Keys without a plan
+        are assumed to be on the free plan.
+
+      cooldown : Optional[float]
+        Seconds a rate limited key isn't used if the API didn't send `Retry-After`.
+
+      window : Optional[float]
+        Seconds over which the recent request rate of keys is measured.
+
+    Example
+    -------
+
+    pool = randomstuff.KeyPool([("key-1", "pro"), ("key-2", "pro"), "key-3"])
+    async with randomstuff.AsyncClient(key_pool=pool) as client:
+        ...
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[Union[str, Tuple[str, str]]],
+        *,
+        cooldown: Optional[float] = 60.0,
+        window: Optional[float] = 60.0,
+    ):
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._keys = {}
+
+        for key in keys:
+            key, plan = (key, "") if isinstance(key, str) else key
+            if not plan in PLANS:
+                raise InvalidPlanError(f"Invalid Plan. Choose from {PLANS}")
+            if key in self._keys:
+                raise ValueError("API keys of a pool must be unique")
+            self._keys[key] = _PooledKey(key, plan, PLAN_RATE_LIMITS[plan][0], window)
+
+        if not self._keys:
+            raise ValueError("A key pool needs at least one API key")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def acquire(self) -> str:
+        """Returns the API key to send the next request with.
+
+        Raises `RateLimited` if every key is cooling down.
+        """
+        with self._lock:
+            now = time.monotonic()
+            best = None
+            total = 0.0
+            for key in self._keys.values():
+                if key.available_at > now:
+                    continue
+                weight = key.effective_weight()
+                key.current += weight
+                total += weight
+                if best is None or key.current > best.current:
+                    best = key
+
+            if best is None:
+                wait = min(key.available_at for key in self._keys.values()) - now
+                raise RateLimited(
+                    f"Every API key of the pool is rate limited. Retry after {wait:.2f}s.",
+                    retry_after=wait,
+                )
+
+            best.current -= total
+            best.record(now)
+            return best.key
+
+    def update(self, key: str, headers: Mapping, status: int) -> None:
+        """Records the rate limit headers and status of a response sent with a key."""
+        remaining = _header_number(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        limit = _header_number(headers, "X-RateLimit-Limit", "RateLimit-Limit")
+        reset = _header_number(headers, "X-RateLimit-Reset", "RateLimit-Reset")
+
+        with self._lock:
+            now = time.monotonic()
+            key = self._keys[key]
+            if limit is not None:
+                key.limit = limit
+            if remaining is not None:
+                key.remaining = int(remaining)
+                if remaining <= 0 and reset is not None:
+                    key.available_at = max(key.available_at, now + _reset_delay(reset))
+
+            if status == 429:
+                retry_after = _parse_retry_after(headers)
+                if retry_after is None:
+                    retry_after = self.cooldown
+                key.rate_limited += 1
+                # The budget is unknown again once the key has cooled down.
+                key.remaining = None
+                # A Retry-After of 0 or in the past would put the key straight back.
+                key.available_at = max(
+                    key.available_at, now + max(retry_after, _MIN_COOLDOWN)
+                )
+
+    def usage(self) -> Dict[str, KeyUsage]:
+        """Returns the `KeyUsage` of every key."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key.key: KeyUsage(
+                    plan=key.plan,
+                    weight=key.weight,
+                    requests=key.requests,
+                    rate_limited=key.rate_limited,
+                    remaining=key.remaining,
+                    cooldown=max(0.0, key.available_at - now),
+                    rate=key.rate(now),
+                    capacity=PLAN_RATE_LIMITS[key.plan][0],
+                )
+                for key in self._keys.values()
+            }
+
+    def utilization(self) -> float:
+        """Returns the recent request rate of all keys as a fraction of their capacity."""
+        usage = self.usage().values()
+        return sum(key.rate for key in usage) / sum(key.capacity for key in usage)
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from typing import Dict, Optional
+import threading
+
+
+class ClientMetrics:
+    """
+    Represents the counters collected by a client.
+
+    Every client has an instance of this class as its `metrics` attribute. Counters are
+    kept per endpoint (`ai`, `joke`, `image`, `waifu`, `weather`, `covid` or `canvas`).
+
+    Counters
+    --------
+
+      retries :
+        Requests that were sent again by the client's `RetryPolicy`.
+
+      retries_exhausted :
+        Requests that kept failing after all attempts of the `RetryPolicy`.
+
+      failovers :
+        AI requests sent again to another server by the `ServerSelector`.
+
+      probes :
+        Health probes sent by the `ServerSelector`.
+
+      hedges :
+        Extra AI requests sent by the `HedgePolicy`.
+
+      hedge_wins :
+        Hedged AI requests which answered before the original one.
+
+      key_rotations :
+        Requests sent again with another key of the `KeyPool` after a 429.
+
+    Example
+    -------
+
+    client.metrics.get("retries")         # All endpoints
+    client.metrics.get("retries", "ai")   # Only AI endpoint
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(int))
+
+    def increment(self, name: str, endpoint: str, value: int = 1) -> None:
+        """Increments a counter of an endpoint."""
+        with self._lock:
+            self._counters[name][endpoint] += value
+
+    def get(self, name: str, endpoint: Optional[str] = None) -> int:
+        """Returns a counter for an endpoint or, if `endpoint` is `None`, for all endpoints."""
+        with self._lock:
+            counters = self._counters.get(name, {})
+            if endpoint is None:
+                return sum(counters.values())
+            return counters.get(endpoint, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Returns a copy of all counters as `{name: {endpoint: value}}`."""
+        with self._lock:
+            return {
+                name: dict(counters) for name, counters in self._counters.items()
+            }
+
+    def reset(self) -> None:
+        """Resets all counters to zero."""
+        with self._lock:
+            self._counters.clear()
@@ -0,0 +1,92 @@
+from typing import Optional
+from urllib.parse import urlencode
+
+from .constants import *
+from .errors import *
+from ._endpoints import ENDPOINTS
+
+
+# Params of the v5 AI endpoint which change per call and are not part of a persona.
+_CALL_PARAMS = ["message", "server", "uid"]
+
+
+class _EncodedURL(str):
+    """A URL whose query is complete and already encoded, sent without `params`."""
+
+
+class BotPersona:
+    """
+    Represents a reusable customisation of the v5 AI endpoint.
+
+    The customisation parameters of `get_ai_response` are validated and URL encoded
+    once when the persona is created, along with the plan and server. Passing the
+    persona to `get_ai_response` through the `persona` parameter then only appends
+    the encoded message, server and uid to the URL, which is sent as is instead of
+    being encoded again by the HTTP library. This is cheaper for bots sending a lot
+    of messages.
+
+    Parameters
+    ----------
+      plan : Optional[str]
+        The plan to use. This is used instead of the `plan` of `get_ai_response`.
+
+      server : Optional[str]
+        The server to get responses from, one of `SERVERS_V5`. If this is `None`,
+        the client's `ServerSelector` or `HedgePolicy` picks it, or `main` is used.
+
+      **customisation :
+        The customisation parameters of `get_ai_response` like `name`, `master` or
+        `favorite_color`. The API's defaults are used for the ones left out.
+
+    Example
+    -------
+
+    persona = randomstuff.BotPersona(name="Mia", master="Ahmad", gender="Female")
+    response = await client.get_ai_response("Hi", persona=persona)
+    """
+
+    def __init__(
+        self, plan: Optional[str] = "", server: Optional[str] = None, **customisation
+    ):
+        if not plan in PLANS:
+            raise InvalidPlanError(f"Invalid Plan. Choose from {PLANS}")
+
+        if server is not None and not server in SERVERS_V5:
+            raise InvalidServerError(f"Invalid server type. Choose from {SERVERS_V5}.")
+
+        endpoint = ENDPOINTS["5"]["ai"]
+        fields = [
+            (param, value, default)
+            for param, value, default in endpoint.params
+            if not param in _CALL_PARAMS
+        ]
+        unknown = set(customisation) - {value for _, value, _ in fields}
+        if unknown:
+            raise ValueError(
+                f"Unknown customisation parameters: {', '.join(sorted(unknown))}"
+            )
+
+        self.plan = plan
+        self.server = server
+        self.customisation = {
+            value: customisation.get(value, default) for _, value, default in fields
+        }
+        self.path = (endpoint.plan_path if plan else endpoint.path).format(plan=plan)
+        self.query = urlencode(
+            [(param, self.customisation[value]) for param, value, _ in fields]
+        )
+
+    def __repr__(self):
+        return f"<BotPersona plan={self.plan!r} server={self.server!r}>"
+
+    def url(self, base_url: str, params: Optional[dict] = None) -> str:
+        """
+        Returns the endpoint URL with the encoded customisation for a base URL.
+
+        `params` are encoded and appended to the query, the returned URL is then
+        complete and sent without being encoded again.
+        """
+        if not params:
+            return f"{base_url}/{self.path}?{self.query}"
+        query = "&".join(filter(None, [self.query, urlencode(params)]))
+        return _EncodedURL(f"{base_url}/{self.path}?{query}")
@@ -0,0 +1,177 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import time
+
+from .scheduler import _background
+
+
+@dataclass(frozen=True)
+class PrefetchConfig:
+    """
+    Represents the options of prefetch pools of `AsyncClient`.
+
+    `get_joke`, `get_image` and `get_waifu` return random content, so results can be
+    fetched before they're asked for. With prefetching enabled, `AsyncClient` keeps a
+    pool of results per method and type. Calls return a pooled result instantly and
+    only request the API themselves when the pool is empty. A pool is refilled in the
+    background whenever it drops to `low_water`.
+
+    Attributes
+    ----------
+
+      size : int
+        Maximum number of results kept per pool.
+
+      low_water : int
+        A refill starts once a pool has this many results or less.
+
+      concurrency : int
+        Maximum number of requests a single refill sends at once.
+    """
+
+    size: int = 20
+    low_water: int = 5
+    concurrency: int = 2
+
+    def __post_init__(self):
+        if self.size < 1:
+            raise ValueError("size must be at least 1")
+        if not 0 <= self.low_water < self.size:
+            raise ValueError("low_water must be between 0 and size")
+        if self.concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+
+@dataclass(frozen=True)
+class PrefetchStats:
+    """
+    Represents the state of a single prefetch pool.
+
+    Attributes
+    ----------
+
+      depth : int
+        The number of results currently in the pool.
+
+      size : int
+        The maximum number of results in the pool.
+
+      hits : int
+        Calls answered from the pool.
+
+      misses : int
+        Calls which found the pool empty and requested the API.
+
+      refills : int
+        Completed background refills.
+
+      errors : int
+        Requests of refills which failed.
+
+      fetch_latency : Optional[float]
+        Average seconds a single prefetch request took, over recent requests.
+
+      refill_duration : Optional[float]
+        Seconds the last refill took to fill the pool.
+    """
+
+    depth: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    refills: int = 0
+    errors: int = 0
+    fetch_latency: Optional[float] = None
+    refill_duration: Optional[float] = None
+
+
+class _PrefetchPool:
+    _EMPTY = object()
+
+    def __init__(self, fetch: Callable[[], Awaitable[Any]], config: PrefetchConfig):
+        self.fetch = fetch
+        self.config = config
+        self.items = deque()
+        self.task = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.errors = 0
+        self.fetch_latency = None
+        self.refill_duration = None
+
+    def pop(self) -> Any:
+        if self.items:
+            self.hits += 1
+            item = self.items.popleft()
+        else:
+            self.misses += 1
+            item = self._EMPTY
+        self.refill()
+        return item
+
+    def refill(self, force: bool = False) -> Optional[asyncio.Future]:
+        threshold = self.config.size - 1 if force else self.config.low_water
+        if self.task is None and len(self.items) <= threshold:
+            self.task = asyncio.ensure_future(self._refill())
+        return self.task
+
+    async def _fetch_one(self) -> Any:
+        started = time.monotonic()
+        item = await self.fetch()
+        latency = time.monotonic() - started
+        if self.fetch_latency is None:
+            self.fetch_latency = latency
+        else:
+            self.fetch_latency = 0.2 * latency + 0.8 * self.fetch_latency
+        return item
+
+    async def _refill(self) -> Optional[Exception]:
+        """Fills the pool, returns the first error if a request failed."""
+        _background()
+        started = time.monotonic()
+        try:
+            while len(self.items) < self.config.size:
+                batch = min(self.config.concurrency, self.config.size - len(self.items))
+                results = await asyncio.gather(
+                    *(self._fetch_one() for _ in range(batch)),
+                    return_exceptions=True,
+                )
+                errors = []
+                for result in results:
+                    if isinstance(result, Exception):
+                        errors.append(result)
+                    elif isinstance(result, BaseException):
+                        raise result
+                    elif len(self.items) < self.config.size:
+                        self.items.append(result)
+                self.errors += len(errors)
+                if errors:
+                    # Leave it to the next call to try again instead of hammering
+                    # an API that is failing.
+                    return errors[0]
+            self.refills += 1
+            self.refill_duration = time.monotonic() - started
+        finally:
+            # After `cancel`, a newer refill may have started before this one ended.
+            if self.task is asyncio.current_task():
+                self.task = None
+
+    def cancel(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def stats(self) -> PrefetchStats:
+        return PrefetchStats(
+            depth=len(self.items),
+            size=self.config.size,
+            hits=self.hits,
+            misses=self.misses,
+            refills=self.refills,
+            errors=self.errors,
+            fetch_latency=self.fetch_latency,
+            refill_duration=self.refill_duration,
+        )
@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+import asyncio
+import threading
+import time
+
+from .constants import PLANS, PLAN_RATE_LIMITS
+from .errors import DeadlineExceeded, InvalidPlanError, RateLimitExceeded
+from ._helper import _parse_retry_after
+from .timeouts import _remaining
+
+
+RATE_LIMIT_MODES = ["wait", "reject"]
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Represents a token bucket quota.
+
+    Attributes
+    ----------
+
+      rate : float
+        Requests allowed per second on average.
+
+      burst : int
+        Maximum number of requests that can be sent at once after being idle.
+    """
+
+    rate: float = 1.0
+    burst: int = 1
+
+    def __post_init__(self):
+        if self.rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+
+
+class _TokenBucket:
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.tokens = float(limit.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(
+                self.limit.burst, self.tokens + elapsed * self.limit.rate
+            )
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.limit.rate)
+        return wait
+
+    def take(self) -> None:
+        # Tokens may go negative, which queues later callers behind this one.
+        self.tokens -= 1
+
+    def clamp(self, remaining: int) -> None:
+        self.tokens = min(self.tokens, remaining)
+
+    def pause(self, until: float) -> None:
+        self.paused_until = max(self.paused_until, until)
+
+
+class RateLimiter:
+    """
+    A client-side token bucket rate limiter.
+
+    Requests are checked against a bucket for the plan and, optionally, a bucket for the
+    endpoint before being sent. The buckets adapt to `X-RateLimit-Remaining`,
+    `X-RateLimit-Reset` and `Retry-After` headers returned by the API.
+
+    Pass an instance to `Client` or `AsyncClient` through the `rate_limiter` parameter.
+    A limiter can be shared by several clients using the same API key.
+
+    Parameters
+    ----------
+      plan : Optional[str]
+        The plan whose quota from `PLAN_RATE_LIMITS` is used as the overall limit.
+
+      limit : Optional[RateLimit]
+        The overall limit. Overrides the plan's default quota.
+
+      endpoints : Optional[Dict[str, RateLimit]]
+        Additional limits per endpoint. Endpoints are named `ai`, `joke`, `image`,
+        `waifu`, `weather`, `covid` and `canvas`.
+
+      mode : Optional[str]
+        `wait` (default) to queue requests until they're allowed or `reject` to
+        raise `RateLimitExceeded` right away.
+
+      max_wait : Optional[float]
+        In `wait` mode, requests that would wait longer than this many seconds raise
+        `RateLimitExceeded` instead. `None` means wait as long as required.
+
+    Example
+    -------
+
+    limiter = randomstuff.RateLimiter(
+        "pro", endpoints={"ai": randomstuff.RateLimit(rate=2, burst=5)}
+    )
+    client = randomstuff.Client(api_key="key", rate_limiter=limiter)
+    """
+
+    def __init__(
+        self,
+        plan: Optional[str] = "",
+        *,
+        limit: Optional[RateLimit] = None,
+        endpoints: Optional[Dict[str, RateLimit]] = None,
+        mode: Optional[str] = "wait",
+        max_wait: Optional[float] = None,
+    ):
+        if not plan in PLANS:
+            raise InvalidPlanError(f"Invalid Plan. Choose from {PLANS}")
+
+        if not mode in RATE_LIMIT_MODES:
+            raise ValueError(f"Invalid mode. Choose from {RATE_LIMIT_MODES}")
+
+        self.plan = plan
+        self.mode = mode
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._global = _TokenBucket(limit or RateLimit(*PLAN_RATE_LIMITS[plan]))
+        self._endpoints = {
+            endpoint: _TokenBucket(endpoint_limit)
+            for endpoint, endpoint_limit in (endpoints or {}).items()
+        }
+
+    def _reserve(self, endpoint: str) -> float:
+        buckets = [self._global]
+        if endpoint in self._endpoints:
+            buckets.append(self._endpoints[endpoint])
+
+        with self._lock:
+            now = time.monotonic()
+            wait = max(bucket.delay(now) for bucket in buckets)
+            limit = 0.0 if self.mode == "reject" else self.max_wait
+            if wait > 0 and limit is not None and wait > limit:
+                raise RateLimitExceeded(
+                    f"Client-side rate limit for {endpoint!r} exceeded. Retry after {wait:.2f}s.",
+                    retry_after=wait,
+                )
+            remaining = _remaining()
+            if wait > 0 and remaining is not None and wait >= remaining:
+                raise DeadlineExceeded(
+                    f"Client-side rate limit for {endpoint!r} allows the request only after the deadline."
+                )
+            for bucket in buckets:
+                bucket.take()
+        return wait
+
+    def acquire(self, endpoint: str) -> None:
+        """Blocks until a request to `endpoint` is allowed."""
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, endpoint: str) -> None:
+        """
+        This function is a coroutine
+        ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+        Equivalent to `acquire` but sleeps without blocking the event loop.
+        """
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update(self, endpoint: str, headers: Mapping, status: int) -> None:
+        """Adapts the budget to the rate limit headers of a response."""
+        remaining = _header_number(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        reset = _header_number(headers, "X-RateLimit-Reset", "RateLimit-Reset")
+        retry_after = _parse_retry_after(headers)
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._global
+            bucket.delay(now)
+
+            if remaining is not None:
+                bucket.clamp(int(remaining))
+                if remaining <= 0 and reset is not None:
+                    bucket.pause(now + _reset_delay(reset))
+
+            if status == 429:
+                bucket.clamp(0)
+                bucket.pause(now + (retry_after if retry_after is not None else 1.0))
+                if endpoint in self._endpoints:
+                    self._endpoints[endpoint].clamp(0)
+
+
+def _header_number(headers: Mapping, *names: str) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _reset_delay(reset: float) -> float:
+    # Some APIs send the reset as a unix timestamp, others as seconds from now.
+    if reset > 1e9:
+        return max(0.0, reset - time.time())
+    return max(0.0, reset)
+
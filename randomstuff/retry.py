@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple, Type
+import random
+import time
+
+from .errors import CircuitOpen, HTTPError, RateLimited, RateLimitExceeded
+from .timeouts import _remaining
+
+
+JITTER_MODES = ["full", "equal", "none"]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Represents how a client retries failed requests.
+
+    Pass an instance to `Client` or `AsyncClient` through the `retry_policy` parameter.
+    It applies to every endpoint method.
+
+    Attributes
+    ----------
+
+      max_attempts : int
+        Maximum number of times a request is sent, including the first attempt.
+
+      backoff_base : float
+        The delay in seconds before the first retry, before jitter is applied.
+
+      backoff_factor : float
+        The delay is multiplied by this after every retry.
+
+      max_backoff : float
+        The upper bound of a single delay, before `Retry-After` is considered.
+
+      jitter : str
+        `full` (default) picks a random delay between 0 and the backoff, `equal` keeps at
+        least half of the backoff and `none` disables jitter.
+
+      respect_retry_after : bool
+        Whether to wait at least as long as the `Retry-After` header of the API says.
+
+      deadline : Optional[float]
+        Total seconds a request may take across all attempts. A retry which would
+        start after the deadline is not made. `None` means no deadline.
+
+      retry_on : Tuple[Type[Exception], ...]
+        The errors that are retried. `RateLimitExceeded` raised by a `RateLimiter` in
+        `reject` mode and `CircuitOpen` raised by a `CircuitBreaker` are never retried.
+    """
+
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_factor: float = 2.0
+    max_backoff: float = 30.0
+    jitter: str = "full"
+    respect_retry_after: bool = True
+    deadline: Optional[float] = None
+    retry_on: Tuple[Type[Exception], ...] = (RateLimited, HTTPError)
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if not self.jitter in JITTER_MODES:
+            raise ValueError(f"Invalid jitter. Choose from {JITTER_MODES}")
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Returns the delay before retrying after `attempt` failed attempts."""
+        delay = min(
+            self.max_backoff,
+            self.backoff_base * self.backoff_factor ** (attempt - 1),
+        )
+        if self.jitter == "full":
+            delay = random.uniform(0, delay)
+        elif self.jitter == "equal":
+            delay = delay / 2 + random.uniform(0, delay / 2)
+
+        if self.respect_retry_after and retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _start(self) -> "_RetryState":
+        return _RetryState(self)
+
+
+class _RetryState:
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.attempts = 0
+        self.started = time.monotonic()
+
+    def retryable(self, error: Exception) -> bool:
+        return isinstance(error, self.policy.retry_on) and not isinstance(
+            error, (RateLimitExceeded, CircuitOpen)
+        )
+
+    def next_delay(self, error: Exception) -> Optional[float]:
+        """Returns the delay before the next attempt or `None` if it shouldn't be made."""
+        self.attempts += 1
+        if self.attempts >= self.policy.max_attempts:
+            return None
+
+        delay = self.policy.backoff(
+            self.attempts, getattr(error, "retry_after", None)
+        )
+        deadline = self.policy.deadline
+        if deadline is not None and (
+            time.monotonic() - self.started + delay >= deadline
+        ):
+            return None
+        # No point in waiting for an attempt the deadline of the call doesn't leave
+        # time for.
+        remaining = _remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
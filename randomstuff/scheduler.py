@@ -0,0 +1,360 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+
+from .errors import QueueFull
+from .timeouts import _detach
+from ._helper import _wait_for_slot
+
+
+PRIORITIES = ["high", "normal", "low"]
+
+OVERFLOW_POLICIES = ["reject", "drop_oldest", "block"]
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    """
+    Represents the state of a `RequestScheduler`.
+
+    Attributes
+    ----------
+
+      running : int
+        Requests being sent right now.
+
+      queued : int
+        Requests waiting to be sent.
+
+      rejected : int
+        Requests which raised `QueueFull` because the queue was full.
+
+      dropped : int
+        Queued requests which raised `QueueFull` to make room for newer ones.
+
+      priorities : Dict[str, int]
+        Queued requests per priority.
+
+      tenants : Dict[str, int]
+        Queued requests per tenant, only of tenants with requests queued.
+    """
+
+    running: int = 0
+    queued: int = 0
+    rejected: int = 0
+    dropped: int = 0
+    priorities: Dict[str, int] = field(default_factory=dict)
+    tenants: Dict[Optional[str], int] = field(default_factory=dict)
+
+
+# The (tenant, priority) set with scheduling(). None keeps the default.
+_context = ContextVar("_context", default=(None, None))
+
+
+@contextmanager
+def scheduling(tenant: Optional[str] = None, priority: Optional[str] = None):
+    """Sets the tenant and priority of the requests made inside the `with` block.
+
+    Only has an effect on clients with a `RequestScheduler`. Arguments left `None` keep
+    the value of an outer block. Without a tenant, the `uid` of AI requests is used.
+
+    Example:
+        with randomstuff.scheduling(tenant=str(guild.id), priority="high"):
+            response = await client.get_ai_response(message)
+    """
+    if priority is not None and not priority in PRIORITIES:
+        raise ValueError(f"Invalid priority. Choose from {PRIORITIES}")
+
+    current_tenant, current_priority = _context.get()
+    token = _context.set(
+        (
+            current_tenant if tenant is None else tenant,
+            current_priority if priority is None else priority,
+        )
+    )
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _background() -> None:
+    """Prepares the current context for a background task.
+
+    Background tasks like prefetch refills, cache revalidation and server probes copy
+    the context of the call which started them. They call this first to drop its
+    timeouts and deadline, which they must outlive, and to make their requests low
+    priority so that they never hold up calls waiting for their result.
+    """
+    _detach()
+    tenant, _ = _context.get()
+    _context.set((tenant, "low"))
+
+
+def _scheduled(params: Optional[Mapping]) -> Tuple[Optional[str], str]:
+    tenant, priority = _context.get()
+    if tenant is None and params:
+        tenant = params.get("uid")
+    return tenant, priority or "normal"
+
+
+class _Ticket:
+    def __init__(self, tenant: Optional[str], priority: str, finish: float, order: int):
+        self.tenant = tenant
+        self.priority = priority
+        self.finish = finish
+        self.order = order
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued = True
+
+
+class RequestScheduler:
+    """
+    Decides the order in which `AsyncClient` sends requests.
+
+    Pass an instance to `AsyncClient` through the `scheduler` parameter. At most
+    `max_concurrency` requests are sent at once and the others wait in a queue. Use
+    `scheduling` to set the tenant, like a guild ID, and priority of requests.
+
+    Requests of a higher priority always go first. Prefetch refills, cache
+    revalidation and server probes run as `low`, everything else as `normal` unless
+    set otherwise. Within a priority, tenants share the slots by weighted fair queuing:
+    a tenant with weight 2 gets twice the requests of one with weight 1 while both
+    have requests queued, however many one of them queues.
+
+    When the queue holds `max_queue` requests, or `max_tenant_queue` of the tenant, a
+    new request is handled by the `overflow` policy:
+      `reject` (default) raises `QueueFull` for the new request,
+      `drop_oldest` raises `QueueFull` for the oldest queued request of the tenant, or
+      of the lowest priority if the whole queue is full, and queues the new one,
+      `block` waits until there is room.
+
+    Parameters
+    ----------
+      max_concurrency : Optional[int]
+        Requests sent at once.
+
+      max_queue : Optional[int]
+        Requests queued at once across all tenants.
+
+      max_tenant_queue : Optional[int]
+        Requests queued at once for a single tenant.
+
+      overflow : Optional[str]
+        One of `OVERFLOW_POLICIES`.
+
+      weights : Optional[Mapping[str, float]]
+        The weights of tenants. Others have `default_weight`.
+
+      default_weight : Optional[float]
+        The weight of tenants not in `weights`.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = 10,
+        *,
+        max_queue: Optional[int] = 1000,
+        max_tenant_queue: Optional[int] = 100,
+        overflow: Optional[str] = "reject",
+        weights: Optional[Mapping[str, float]] = None,
+        default_weight: Optional[float] = 1.0,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_queue < 1 or max_tenant_queue < 1:
+            raise ValueError("Queue sizes must be at least 1")
+        if not overflow in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow. Choose from {OVERFLOW_POLICIES}")
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_tenant_queue = max_tenant_queue
+        self.overflow = overflow
+        self.default_weight = default_weight
+        self._weights = dict(weights or {})
+        self._running = 0
+        self._queued = 0
+        self._rejected = 0
+        self._dropped = 0
+        self._order = itertools.count()
+        # Per priority: a heap of (finish, order, ticket) by virtual finish time and
+        # the virtual time, the finish time of the last request sent.
+        self._heaps = {priority: [] for priority in PRIORITIES}
+        self._virtual_time = dict.fromkeys(PRIORITIES, 0.0)
+        # Per (priority, tenant): its queued tickets, oldest first, and the virtual
+        # finish time of the last one queued.
+        self._queues = {}
+        self._finishes = {}
+        self._tenants = {}
+        self._blocked = deque()
+
+    def set_weight(self, tenant: str, weight: float) -> None:
+        """Sets the weight of a tenant for requests queued from now on."""
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self._weights[tenant] = weight
+
+    @property
+    def running(self) -> int:
+        """Requests being sent right now."""
+        return self._running
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting to be sent."""
+        return self._queued
+
+    async def _acquire(self, tenant: Optional[str], priority: str) -> None:
+        if self._running < self.max_concurrency and not self._queued:
+            self._running += 1
+            return
+
+        ticket = await self._enqueue(tenant, priority)
+        self._dispatch()
+        await _wait_for_slot(ticket.future, self._release, lambda: self._leave(ticket))
+
+    def _leave(self, ticket: _Ticket) -> None:
+        if ticket.queued:
+            self._unqueue(ticket)
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+
+    def _full(self, tenant: Optional[str]) -> bool:
+        return (
+            self._queued >= self.max_queue
+            or self._tenants.get(tenant, 0) >= self.max_tenant_queue
+        )
+
+    async def _enqueue(self, tenant: Optional[str], priority: str) -> _Ticket:
+        while self._full(tenant):
+            if self.overflow == "block":
+                waiter = asyncio.get_running_loop().create_future()
+                self._blocked.append(waiter)
+                try:
+                    await waiter
+                finally:
+                    if waiter in self._blocked:
+                        self._blocked.remove(waiter)
+                continue
+
+            victim = None
+            if self.overflow == "drop_oldest":
+                victim = self._oldest(tenant, priority)
+            if victim is None:
+                self._rejected += 1
+                raise QueueFull(
+                    f"The request queue of tenant {tenant!r} is full.",
+                    tenant=tenant,
+                    priority=priority,
+                )
+            self._unqueue(victim)
+            if not victim.future.done():
+                self._dropped += 1
+                victim.future.set_exception(
+                    QueueFull(
+                        f"The request of tenant {victim.tenant!r} was dropped from "
+                        "the full queue to make room for a newer one.",
+                        tenant=victim.tenant,
+                        priority=victim.priority,
+                    )
+                )
+
+        key = (priority, tenant)
+        weight = self._weights.get(tenant, self.default_weight)
+        finish = (
+            max(self._virtual_time[priority], self._finishes.get(key, 0.0)) + 1 / weight
+        )
+        self._finishes[key] = finish
+        ticket = _Ticket(tenant, priority, finish, next(self._order))
+        heapq.heappush(self._heaps[priority], (finish, ticket.order, ticket))
+        self._queues.setdefault(key, deque()).append(ticket)
+        self._queued += 1
+        self._tenants[tenant] = self._tenants.get(tenant, 0) + 1
+        return ticket
+
+    def _oldest(self, tenant: Optional[str], priority: str) -> Optional[_Ticket]:
+        """Returns the queued request `drop_oldest` drops for a new one, if any."""
+        # Never drop a request of a higher priority than the new one.
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) :]):
+            if self._tenants.get(tenant, 0) >= self.max_tenant_queue:
+                queue = self._queues.get((lower, tenant))
+                if queue:
+                    return queue[0]
+            else:
+                heads = [
+                    queue[0]
+                    for (queued, _), queue in self._queues.items()
+                    if queued == lower
+                ]
+                if heads:
+                    return min(heads, key=lambda ticket: ticket.order)
+        return None
+
+    def _unqueue(self, ticket: _Ticket) -> None:
+        # Tickets stay in the heaps and are skipped there once unqueued.
+        ticket.queued = False
+        self._queued -= 1
+        key = (ticket.priority, ticket.tenant)
+        queue = self._queues[key]
+        if queue[0] is ticket:
+            queue.popleft()
+        else:
+            queue.remove(ticket)
+        if not queue:
+            del self._queues[key]
+            if len(self._finishes) > 2 * len(self._queues) + 64:
+                self._forget_idle()
+
+        self._tenants[ticket.tenant] -= 1
+        if not self._tenants[ticket.tenant]:
+            del self._tenants[ticket.tenant]
+
+        while self._blocked:
+            waiter = self._blocked.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _forget_idle(self) -> None:
+        # The finish time of an idle tenant which the virtual time has passed wouldn't
+        # affect its next request anyway.
+        for key, finish in list(self._finishes.items()):
+            if not key in self._queues and finish <= self._virtual_time[key[0]]:
+                del self._finishes[key]
+
+    def _dispatch(self) -> None:
+        while self._queued and self._running < self.max_concurrency:
+            for priority in PRIORITIES:
+                heap = self._heaps[priority]
+                while heap and not heap[0][2].queued:
+                    heapq.heappop(heap)
+                if heap:
+                    break
+            finish, _, ticket = heapq.heappop(heap)
+            self._unqueue(ticket)
+            # The waiting call may have been cancelled already.
+            if not ticket.future.done():
+                self._virtual_time[priority] = finish
+                self._running += 1
+                ticket.future.set_result(None)
+
+    def stats(self) -> SchedulerStats:
+        """Returns the current `SchedulerStats`."""
+        priorities = dict.fromkeys(PRIORITIES, 0)
+        for (priority, _), queue in self._queues.items():
+            priorities[priority] += len(queue)
+        return SchedulerStats(
+            running=self._running,
+            queued=self._queued,
+            rejected=self._rejected,
+            dropped=self._dropped,
+            priorities=priorities,
+            tenants=dict(self._tenants),
+        )
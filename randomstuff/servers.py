@@ -0,0 +1,203 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import threading
+import time
+
+from .constants import SERVERS_V4, SERVERS_V5
+from .errors import InvalidServerError, InvalidVersionError
+
+
+@dataclass(frozen=True)
+class ServerStats:
+    """
+    Represents the health of an AI server as seen by a `ServerSelector`.
+
+    Attributes
+    ----------
+
+      server : str
+        The name of server.
+
+      latency : Optional[float]
+        Exponentially weighted moving average of response time in seconds. This is
+        `None` until the server has answered once.
+
+      error_rate : float
+        Exponentially weighted moving average of failures, between 0 and 1.
+
+      healthy : bool
+        Whether the server's error rate is below the selector's threshold.
+
+      requests : int
+        The number of requests recorded for this server, including probes.
+
+      last_checked : Optional[float]
+        `time.monotonic()` of the last recorded request.
+    """
+
+    server: str = None
+    latency: Optional[float] = None
+    error_rate: float = 0.0
+    healthy: bool = True
+    requests: int = 0
+    last_checked: Optional[float] = None
+
+
+class ServerSelector:
+    """
+    Picks the AI server for `get_ai_response` based on observed latency and errors.
+
+    Pass an instance to `Client` or `AsyncClient` through the `server_selector` parameter.
+    AI requests that don't set `server` (or set it to `"auto"`) are routed to the first
+    healthy server, in the order of `servers`, unless another healthy server is more than
+    `latency_factor` times faster. When a request fails with a server error it is sent
+    again to the next server so failing over to `backup` doesn't surface an error.
+
+    While the client is open, a background probe periodically sends a small AI request
+    to servers that are unhealthy or haven't been used for `probe_interval` seconds so
+    traffic shifts back once they recover. Probes count against your API quota.
+
+    Parameters
+    ----------
+      servers : Optional[List[str]]
+        The servers to choose from, in order of preference. Defaults to `SERVERS_V5`
+        for v5 and `["primary", "backup"]` for v4. Version 3 has no servers.
+
+      alpha : Optional[float]
+        The weight of the newest sample in the moving averages.
+
+      error_threshold : Optional[float]
+        A server is unhealthy while its error rate is at or above this.
+
+      latency_factor : Optional[float]
+        How many times slower than the fastest healthy server a server can be before
+        it loses its place in the order.
+
+      probe_interval : Optional[float]
+        Seconds between health probes. `None` disables probing.
+    """
+
+    def __init__(
+        self,
+        servers: Optional[List[str]] = None,
+        *,
+        alpha: Optional[float] = 0.3,
+        error_threshold: Optional[float] = 0.5,
+        latency_factor: Optional[float] = 2.0,
+        probe_interval: Optional[float] = 30.0,
+    ):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1")
+
+        self.servers = list(servers) if servers is not None else None
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.latency_factor = latency_factor
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ServerStats] = {}
+
+    def _bind(self, version: str) -> None:
+        if version == "3":
+            raise InvalidVersionError("Version 3 does not support server selection.")
+
+        valid = SERVERS_V5 if version == "5" else SERVERS_V4
+        if self.servers is None:
+            self.servers = list(SERVERS_V5 if version == "5" else SERVERS_V4[:2])
+
+        for server in self.servers:
+            if not server in valid:
+                raise InvalidServerError(
+                    f"Invalid server type. Must be one from {valid}."
+                )
+
+        with self._lock:
+            for server in self.servers:
+                self._stats.setdefault(server, ServerStats(server=server))
+
+    def ranked(self) -> List[str]:
+        """Returns the servers in the order they should be tried."""
+        with self._lock:
+            stats = [self._stats[server] for server in self.servers]
+
+        healthy = [stat for stat in stats if stat.healthy]
+        unhealthy = sorted(
+            (stat for stat in stats if not stat.healthy),
+            key=lambda stat: stat.error_rate,
+        )
+        known = [stat.latency for stat in healthy if stat.latency is not None]
+        if known:
+            limit = min(known) * self.latency_factor
+            fast = [
+                stat
+                for stat in healthy
+                if stat.latency is None or stat.latency <= limit
+            ]
+            slow = [stat for stat in healthy if stat not in fast]
+            healthy = fast + slow
+
+        return [stat.server for stat in healthy + unhealthy]
+
+    def select(self) -> str:
+        """Returns the server the next request should go to."""
+        return self.ranked()[0]
+
+    def _record(self, server: str, latency: Optional[float]) -> None:
+        with self._lock:
+            stat = self._stats.get(server)
+            if stat is None:
+                return
+
+            failed = latency is None
+            if stat.requests == 0:
+                error_rate = float(failed)
+            else:
+                error_rate = (
+                    self.alpha * failed + (1 - self.alpha) * stat.error_rate
+                )
+
+            if failed:
+                new_latency = stat.latency
+            elif stat.latency is None:
+                new_latency = latency
+            else:
+                new_latency = (
+                    self.alpha * latency + (1 - self.alpha) * stat.latency
+                )
+
+            self._stats[server] = ServerStats(
+                server=server,
+                latency=new_latency,
+                error_rate=error_rate,
+                healthy=error_rate < self.error_threshold,
+                requests=stat.requests + 1,
+                last_checked=time.monotonic(),
+            )
+
+    def record_success(self, server: str, latency: float) -> None:
+        """Records a successful request to a server which took `latency` seconds."""
+        self._record(server, latency)
+
+    def record_failure(self, server: str) -> None:
+        """Records a failed request to a server."""
+        self._record(server, None)
+
+    def due_for_probe(self) -> List[str]:
+        """Returns the servers which should be probed now."""
+        if self.probe_interval is None:
+            return []
+
+        now = time.monotonic()
+        with self._lock:
+            return [
+                stat.server
+                for stat in (self._stats[server] for server in self.servers)
+                if not stat.healthy
+                or stat.last_checked is None
+                or now - stat.last_checked >= self.probe_interval
+            ]
+
+    def stats(self) -> Dict[str, ServerStats]:
+        """Returns the current stats of every server."""
+        with self._lock:
+            return dict(self._stats)
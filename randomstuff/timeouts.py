@@ -0,0 +1,169 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+import asyncio
+import time
+
+import aiohttp
+
+from .errors import DeadlineExceeded
+
+
+@dataclass(frozen=True)
+class TimeoutConfig:
+    """
+    Represents the timeouts of a single request, in seconds.
+
+    Both `Client` and `AsyncClient` accept an instance of this class through the
+    `timeout` parameter. Use `request_timeout` to override them for some calls and
+    `deadline` to bound calls as a whole. `None` disables a timeout.
+
+    Attributes
+    ----------
+
+      connect : Optional[float]
+        Maximum time to establish a connection, including waiting for a free one in
+        the pool with `AsyncClient`.
+
+      read : Optional[float]
+        Maximum time to wait for data from the API after connecting.
+
+      total : Optional[float]
+        Maximum time of the whole request. `requests` has no timeout for the whole
+        request so with `Client` this only caps `connect` and `read`.
+    """
+
+    connect: Optional[float] = 10.0
+    read: Optional[float] = 30.0
+    total: Optional[float] = 60.0
+
+    def _requests_timeout(self) -> Tuple[Optional[float], Optional[float]]:
+        return _cap(self.connect, self.total), _cap(self.read, self.total)
+
+    def _aiohttp_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total, connect=self.connect, sock_read=self.read
+        )
+
+
+# The fields of request_timeout() overriding the client's timeouts. Fields left None
+# keep the client's.
+_override = ContextVar("_override", default=None)
+
+# time.monotonic() by which calls in the current context must finish.
+_deadline = ContextVar("_deadline", default=None)
+
+
+@contextmanager
+def request_timeout(
+    connect: Optional[float] = None,
+    read: Optional[float] = None,
+    total: Optional[float] = None,
+):
+    """Overrides the timeouts of clients for the calls made inside the `with` block.
+
+    Timeouts left `None` keep the client's value. Like `deadline`, this applies to
+    the current thread and asyncio tasks created inside the block.
+
+    Example:
+        with randomstuff.request_timeout(read=5):
+            response = await client.get_ai_response("Hi")
+    """
+    token = _override.set(TimeoutConfig(connect=connect, read=read, total=total))
+    try:
+        yield
+    finally:
+        _override.reset(token)
+
+
+@contextmanager
+def deadline(at: float):
+    """Bounds the calls made inside the `with` block by an absolute deadline.
+
+    `at` is a `time.monotonic()` value. Every request is given at most the time left
+    until then, retries and their backoff, waiting for the `RateLimiter` and hedging
+    only happen while there is time left, and `DeadlineExceeded` is raised once the
+    deadline has passed. Nested deadlines can only make the deadline earlier.
+
+    The deadline is a context variable: asyncio tasks created inside the block
+    inherit it, but threads, including `run_in_executor`, start without it. Run work
+    sent to threads with `contextvars.copy_context().run` to bound it too.
+
+    Example:
+        with randomstuff.deadline(time.monotonic() + 2):
+            joke = client.get_joke()
+            weather = client.get_weather("London")
+    """
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _remaining() -> Optional[float]:
+    """Returns the seconds left until the current deadline or `None` without one."""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.monotonic()
+
+
+def _check_deadline() -> Optional[float]:
+    remaining = _remaining()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("The deadline of the call has passed.")
+    return remaining
+
+
+async def _wait_within_deadline(awaitable, waiting_for: str):
+    """Awaits `awaitable`, raising `DeadlineExceeded` if the deadline passes first."""
+    try:
+        return await asyncio.wait_for(awaitable, _remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(
+            f"The deadline passed while waiting for {waiting_for}."
+        ) from None
+
+
+def _cap(timeout: Optional[float], limit: Optional[float]) -> Optional[float]:
+    if limit is None:
+        return timeout
+    if timeout is None:
+        return limit
+    return min(timeout, limit)
+
+
+def _resolve_timeout(config: TimeoutConfig) -> TimeoutConfig:
+    """Returns the timeouts for a request sent now, raising if the deadline passed."""
+    override = _override.get()
+    if override is not None:
+        config = replace(
+            config,
+            **{
+                field: value
+                for field, value in vars(override).items()
+                if value is not None
+            },
+        )
+
+    remaining = _check_deadline()
+    if remaining is None:
+        return config
+    return TimeoutConfig(
+        connect=_cap(config.connect, remaining),
+        read=_cap(config.read, remaining),
+        total=_cap(config.total, remaining),
+    )
+
+
+def _detach() -> None:
+    """Drops the timeouts and deadline of the current context.
+
+    Background tasks copy the context of the call which started them but must outlive
+    its deadline, so `scheduler._background` calls this first.
+    """
+    _override.set(None)
+    _deadline.set(None)
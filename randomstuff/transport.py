@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+from typing import Optional
+import asyncio
+import socket
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """
+    Represents the connection pooling options used by a client.
+
+    Both `Client` and `AsyncClient` accept an instance of this class through the
+    `transport` parameter. The defaults match the defaults of `aiohttp`.
+
+    Attributes
+    ----------
+
+      pool_size : int
+        Maximum number of connections kept by the client. For `Client`, this is the
+        number of connections kept per host since `requests` pools connections per host.
+
+      per_host : int
+        Maximum number of simultaneous connections to a single host. `0` means no
+        limit other than `pool_size`.
+
+      keepalive_timeout : Optional[float]
+        Seconds an idle connection is kept open for reuse. For `Client`, idle connections
+        are kept until the server closes them and this enables TCP keep-alive probes after
+        this many idle seconds instead. `None` disables keep-alive.
+
+      dns_cache_ttl : Optional[int]
+        Seconds resolved addresses are cached for. `None` disables the cache. This is
+        only used by `AsyncClient` as `requests` has no DNS cache.
+
+      tcp_nodelay : bool
+        Whether to disable Nagle's algorithm on sockets. `aiohttp` always enables
+        TCP_NODELAY so this is only used by `Client`.
+    """
+
+    pool_size: int = 100
+    per_host: int = 0
+    keepalive_timeout: Optional[float] = 15.0
+    dns_cache_ttl: Optional[int] = 10
+    tcp_nodelay: bool = True
+
+    def __post_init__(self):
+        if self.pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if self.per_host < 0:
+            raise ValueError("per_host cannot be negative")
+
+    def _socket_options(self) -> list:
+        options = [
+            option
+            for option in HTTPConnection.default_socket_options
+            if option[:2] != (socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        ]
+        options.append(
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.tcp_nodelay))
+        )
+        if self.keepalive_timeout is not None:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                options.append(
+                    (
+                        socket.IPPROTO_TCP,
+                        socket.TCP_KEEPIDLE,
+                        max(1, int(self.keepalive_timeout)),
+                    )
+                )
+        return options
+
+    def create_requests_session(self) -> requests.Session:
+        """Creates a `requests.Session` using this configuration."""
+        session = requests.Session()
+        adapter = _PoolAdapter(
+            socket_options=self._socket_options(),
+            pool_connections=self.pool_size,
+            pool_maxsize=self.per_host or self.pool_size,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if self.keepalive_timeout is None:
+            session.headers["Connection"] = "close"
+        return session
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        """Creates an `aiohttp.TCPConnector` using this configuration.
+
+        This must be called while an event loop is running.
+        """
+        return aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            force_close=self.keepalive_timeout is None,
+            use_dns_cache=self.dns_cache_ttl is not None,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    """
+    Represents a snapshot of a client's connection pool.
+
+    Attributes
+    ----------
+
+      limit : int
+        The maximum number of connections.
+
+      limit_per_host : int
+        The maximum number of connections per host. `0` means no limit.
+
+      in_use : int
+        The number of connections currently serving a request.
+
+      idle : int
+        The number of open connections waiting to be reused.
+
+      waiting : int
+        The number of requests waiting for a free connection. This is always `0`
+        for `Client` as `requests` opens an extra connection instead of waiting.
+
+      hosts : int
+        The number of hosts with pooled connections.
+    """
+
+    limit: int = 0
+    limit_per_host: int = 0
+    in_use: int = 0
+    idle: int = 0
+    waiting: int = 0
+    hosts: int = 0
+
+    @property
+    def utilization(self) -> float:
+        """The fraction of `limit` currently in use."""
+        return self.in_use / self.limit if self.limit else 0.0
+
+
+class _PoolAdapter(HTTPAdapter):
+    def __init__(self, socket_options: list, **kwargs):
+        self._socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self._socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _requests_pool_stats(
+    session: requests.Session, config: TransportConfig
+) -> PoolStats:
+    in_use = idle = hosts = 0
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            hosts += 1
+            queued = list(pool.pool.queue)
+            idle += sum(1 for conn in queued if conn is not None)
+            in_use += pool.pool.maxsize - len(queued)
+
+    return PoolStats(
+        limit=config.pool_size,
+        limit_per_host=config.per_host,
+        in_use=in_use,
+        idle=idle,
+        hosts=hosts,
+    )
+
+
+def _connector_pool_stats(connector: aiohttp.BaseConnector) -> PoolStats:
+    conns = getattr(connector, "_conns", {})
+    waiters = getattr(connector, "_waiters", {})
+    return PoolStats(
+        limit=connector.limit,
+        limit_per_host=connector.limit_per_host,
+        in_use=len(getattr(connector, "_acquired", ())),
+        idle=sum(len(idle) for idle in conns.values()),
+        waiting=sum(len(queue) for queue in waiters.values()),
+        hosts=len(
+            {key for key, idle in conns.items() if idle}
+            | {key for key, queue in waiters.items() if queue}
+            | {
+                key
+                for key, acquired in getattr(
+                    connector, "_acquired_per_host", {}
+                ).items()
+                if acquired
+            }
+        ),
+    )
+
+
+# The sessions returned by shared_session(), per event loop. A session references
+# its loop, so weak keys wouldn't let loops be collected. Entries of closed loops
+# are dropped instead.
+_shared_sessions = {}
+
+
+def _drop_closed_loops() -> None:
+    for loop in [loop for loop in _shared_sessions if loop.is_closed()]:
+        del _shared_sessions[loop]
+
+
+def shared_session(transport: Optional[TransportConfig] = None) -> aiohttp.ClientSession:
+    """Returns the process-wide `aiohttp.ClientSession` of the running event loop.
+
+    Pass it to any number of `AsyncClient` instances through their `session` parameter
+    so that they share one pool of keep-alive connections, whatever API key they use.
+    `transport` is only used when the session is created. Clients don't close the
+    shared session, await `close_shared_session` when you are done with it.
+    """
+    _drop_closed_loops()
+    loop = asyncio.get_running_loop()
+    session = _shared_sessions.get(loop)
+    if session is None or session.closed:
+        session = _shared_sessions[loop] = aiohttp.ClientSession(
+            connector=(transport or TransportConfig()).create_connector()
+        )
+    return session
+
+
+async def close_shared_session() -> None:
+    """Closes the session returned by `shared_session` for the running event loop."""
+    _drop_closed_loops()
+    session = _shared_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -20,10 +20,10 @@ setup(
         "Topic :: Software Development :: Build Tools",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
     ],
     keywords="api-wrapper randomstuff api wrapper",
     project_urls={
@@ -32,6 +32,7 @@ setup(
         "Tracker": "https://github.com/nerdguyahmad/randomstuff.py/issues",
     },
     install_requires=["aiohttp", "requests", "colorama"],
-    python_requires=">=3.6",
+    extras_require={"speedups": ["orjson"]},
+    python_requires=">=3.8",
     packages=find_packages(include=["randomstuff", "randomstuff.*"]),
 )
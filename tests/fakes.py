@@ -0,0 +1,85 @@
+"""
+Stand-ins for `aiohttp.ClientSession` so clients can be tested without a network.
+
+    session = FakeSession(lambda request: FakeResponse(json=[{"response": "Hi"}]))
+    client = randomstuff.AsyncClient(api_key="key", session=session)
+
+The handler gets the `FakeRequest` and returns a `FakeResponse`, or a coroutine of
+one to simulate latency.
+"""
+import asyncio
+import base64
+import inspect
+import json as _json
+from dataclasses import dataclass, field
+
+
+@dataclass
+class FakeRequest:
+    method: str
+    url: str
+    params: dict = field(default_factory=dict)
+    headers: dict = field(default_factory=dict)
+
+
+class _Content:
+    def __init__(self, body: bytes, chunk_size: int):
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def iter_chunked(self, size: int):
+        size = self._chunk_size or size
+        for start in range(0, len(self._body), size):
+            yield self._body[start : start + size]
+
+
+class FakeResponse:
+    def __init__(self, status=200, body=b"", *, json=None, headers=None, chunk_size=None):
+        self.status = status
+        self.body = _json.dumps(json).encode() if json is not None else body
+        self.headers = headers or {}
+        self.text = self.body.decode(errors="replace")
+        self.content = _Content(self.body, chunk_size)
+
+    async def read(self) -> bytes:
+        return self.body
+
+
+def canvas_response(image: bytes, **kwargs) -> FakeResponse:
+    """Returns the canvas endpoint's response for `image`."""
+    return FakeResponse(json=[{"base64": base64.b64encode(image).decode()}], **kwargs)
+
+
+class _Pending:
+    def __init__(self, session, request):
+        self._session = session
+        self._request = request
+
+    async def __aenter__(self):
+        response = self._session.handler(self._request)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        return False
+
+
+class FakeSession:
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.closed = False
+
+    def request(self, method, url, *, headers=None, timeout=None, params=None, **kwargs):
+        request = FakeRequest(method, url, dict(params or {}), dict(headers or {}))
+        self.requests.append(request)
+        return _Pending(self, request)
+
+    async def close(self):
+        self.closed = True
+
+
+def run(coro):
+    """Runs a coroutine in a new event loop."""
+    return asyncio.run(coro)
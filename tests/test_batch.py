@@ -0,0 +1,74 @@
+import asyncio
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+
+def ai_server(delays=None, failing=()):
+    """Answers with the message sent, after its delay, and 500 for `failing`."""
+    delays = delays or {}
+    state = {"in_flight": 0, "peak": 0}
+
+    async def handler(request):
+        message = request.params["message"]
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep(delays.get(message, 0.001))
+        finally:
+            state["in_flight"] -= 1
+        if message in failing:
+            return FakeResponse(500, b"broken")
+        return FakeResponse(json=[{"response": message.upper()}])
+
+    return handler, state
+
+
+def batch_client(handler):
+    session = FakeSession(handler)
+    return randomstuff.AsyncClient(api_key="key", session=session), session
+
+
+def test_results_keep_the_order_of_the_calls():
+    handler, _ = ai_server(delays={"a": 0.03, "b": 0.02, "c": 0.01})
+    client, _ = batch_client(handler)
+
+    results = run(client.gather_ai_responses(["a", "b", "c", "d"]))
+    assert [result.result.response for result in results] == ["A", "B", "C", "D"]
+    assert [result.request.args[0] for result in results] == ["a", "b", "c", "d"]
+    assert all(result.ok for result in results)
+
+
+def test_errors_stay_in_their_own_slot():
+    handler, _ = ai_server(failing={"bad"})
+    client, session = batch_client(handler)
+
+    results = run(
+        client.fetch_many(
+            [
+                ("get_ai_response", {"message": "good"}),
+                "not_a_method",
+                ("get_ai_response", {"message": "bad"}),
+                ("get_ai_response",),
+                ("get_ai_response", {"message": "also good"}),
+            ]
+        )
+    )
+    assert [result.ok for result in results] == [True, False, False, False, True]
+    assert isinstance(results[1].error, ValueError)
+    assert results[1].request is None
+    assert isinstance(results[2].error, randomstuff.HTTPError)
+    assert results[2].request.kwargs == {"message": "bad"}
+    assert isinstance(results[3].error, TypeError)
+    assert results[4].result.response == "ALSO GOOD"
+    assert len(session.requests) == 3
+
+
+def test_concurrency_bounds_calls_in_flight():
+    handler, state = ai_server(delays={str(index): 0.01 for index in range(12)})
+    client, session = batch_client(handler)
+
+    results = run(client.gather_ai_responses(map(str, range(12)), concurrency=3))
+    assert all(result.ok for result in results)
+    assert len(session.requests) == 12
+    assert state["peak"] == 3
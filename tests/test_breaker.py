@@ -0,0 +1,158 @@
+import json
+import pathlib
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+JOKE = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/joke.json").read_text()
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(randomstuff.breaker.time, "monotonic", clock)
+    return clock
+
+
+def breaker_client(statuses, **kwargs):
+    """Answers with the next status of `statuses`, a joke for 200."""
+    statuses = iter(statuses)
+
+    def handler(request):
+        status = next(statuses)
+        if status == 200:
+            return FakeResponse(json=JOKE)
+        return FakeResponse(status, b"broken")
+
+    events = []
+    breaker = randomstuff.CircuitBreaker(
+        on_state_change=events.append, recovery_timeout=30.0, **kwargs
+    )
+    session = FakeSession(handler)
+    client = randomstuff.AsyncClient(
+        api_key="key", session=session, circuit_breaker=breaker
+    )
+    return client, session, breaker, events
+
+
+def joke(client):
+    async def call():
+        try:
+            return await client.get_joke()
+        except Exception as exc:
+            return exc
+
+    return run(call())
+
+
+def transitions(events):
+    return [(event.previous, event.state) for event in events]
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    client, session, breaker, events = breaker_client([500] * 3, failure_threshold=3)
+
+    for _ in range(3):
+        assert isinstance(joke(client), randomstuff.HTTPError)
+    (circuit,) = breaker.stats()
+    assert breaker.state(circuit) == "open"
+    assert transitions(events) == [("closed", "open")]
+
+    error = joke(client)
+    assert isinstance(error, randomstuff.CircuitOpen)
+    assert error.retry_after == pytest.approx(30.0)
+    assert len(session.requests) == 3
+    assert breaker.stats()[circuit].rejected == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    client, _, breaker, events = breaker_client(
+        [500, 500, 200, 500, 500], failure_threshold=3
+    )
+
+    for _ in range(5):
+        joke(client)
+    (stats,) = breaker.stats().values()
+    assert stats.state == "closed"
+    assert stats.failures == 2
+    assert events == []
+
+
+def test_half_open_trial_closes_the_circuit(clock):
+    client, session, breaker, events = breaker_client(
+        [500, 200, 200], failure_threshold=1
+    )
+
+    joke(client)
+    clock.now += 29.0
+    assert isinstance(joke(client), randomstuff.CircuitOpen)
+
+    clock.now += 1.0
+    assert isinstance(joke(client), randomstuff.Joke)
+    assert transitions(events) == [
+        ("closed", "open"),
+        ("open", "half_open"),
+        ("half_open", "closed"),
+    ]
+    assert isinstance(joke(client), randomstuff.Joke)
+    assert len(session.requests) == 3
+
+
+def test_failed_trial_opens_the_circuit_again(clock):
+    client, session, breaker, events = breaker_client(
+        [500, 500, 200], failure_threshold=1
+    )
+
+    joke(client)
+    clock.now += 30.0
+    assert isinstance(joke(client), randomstuff.HTTPError)
+    (circuit,) = breaker.stats()
+    assert breaker.state(circuit) == "open"
+    assert transitions(events) == [
+        ("closed", "open"),
+        ("open", "half_open"),
+        ("half_open", "open"),
+    ]
+
+    # The recovery timeout starts over from the failed trial.
+    clock.now += 29.0
+    assert isinstance(joke(client), randomstuff.CircuitOpen)
+    clock.now += 1.0
+    assert isinstance(joke(client), randomstuff.Joke)
+    assert len(session.requests) == 3
+
+
+def test_success_threshold_needs_several_trials(clock):
+    client, _, breaker, _ = breaker_client(
+        [500, 200, 200], failure_threshold=1, success_threshold=2
+    )
+
+    joke(client)
+    clock.now += 30.0
+    joke(client)
+    (circuit,) = breaker.stats()
+    assert breaker.state(circuit) == "half_open"
+    joke(client)
+    assert breaker.state(circuit) == "closed"
+
+
+def test_client_errors_do_not_count(clock):
+    client, _, breaker, _ = breaker_client([404] * 3, failure_threshold=2)
+
+    for _ in range(3):
+        joke(client)
+    (stats,) = breaker.stats().values()
+    assert stats.state == "closed"
+    assert stats.failures == 0
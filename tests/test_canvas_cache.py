@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, canvas_response, run
+
+GIF = b"GIF89a" + bytes(range(256))
+
+
+def key(name: str) -> str:
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = randomstuff.CanvasCache(300)
+    cache.put(key("a"), b"a" * 100)
+    cache.put(key("b"), b"b" * 100)
+    cache.put(key("c"), b"c" * 100)
+    assert cache.get(key("a")) == b"a" * 100
+
+    cache.put(key("d"), b"d" * 100)
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) is not None
+    assert cache.get(key("c")) is not None
+    assert cache.stats().bytes == 300
+    assert cache.stats().entries == 3
+
+
+def test_images_larger_than_the_memory_budget_are_not_kept():
+    cache = randomstuff.CanvasCache(100)
+    cache.put(key("a"), b"a" * 50)
+    cache.put(key("b"), b"b" * 101)
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == b"a" * 50
+
+
+def test_no_memory_limit():
+    cache = randomstuff.CanvasCache(None)
+    for name in "abc":
+        cache.put(key(name), name.encode() * 10_000)
+    assert cache.stats().entries == 3
+    assert cache.stats().bytes == 30_000
+
+
+def test_negative_memory_limit():
+    with pytest.raises(ValueError):
+        randomstuff.CanvasCache(-1)
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    cache = randomstuff.CanvasCache(directory=str(tmp_path))
+    cache.put(key("a"), b"image a")
+
+    cache = randomstuff.CanvasCache(directory=str(tmp_path))
+    assert cache.stats().disk_entries == 1
+    assert cache.stats().disk_bytes == 7
+    assert cache.get(key("a")) == b"image a"
+    assert cache.get(key("a")) == b"image a"
+    stats = cache.stats()
+    assert (stats.hits, stats.disk_hits, stats.misses) == (1, 1, 0)
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = randomstuff.CanvasCache(0, directory=str(tmp_path), max_disk_bytes=250)
+    cache.put(key("a"), b"a" * 100)
+    cache.put(key("b"), b"b" * 100)
+    assert cache.get(key("a")) is not None
+
+    cache.put(key("c"), b"c" * 100)
+    assert sorted(os.listdir(tmp_path)) == sorted([key("a"), key("c")])
+    assert cache.stats().disk_bytes == 200
+    assert cache.get(key("b")) is None
+
+
+def test_foreign_files_are_ignored(tmp_path):
+    (tmp_path / "README").write_text("not an image")
+    (tmp_path / f"{key('a')}.123.tmp").write_bytes(b"partial")
+    cache = randomstuff.CanvasCache(directory=str(tmp_path))
+    assert cache.stats().disk_entries == 0
+    assert cache.get("README") is None
+
+    cache.put(key("a"), b"image")
+    cache.clear()
+    assert sorted(os.listdir(tmp_path)) == sorted(["README", f"{key('a')}.123.tmp"])
+
+
+def test_async_disk_tier_runs_in_executor(tmp_path):
+    cache = randomstuff.CanvasCache(0, directory=str(tmp_path))
+    threads = []
+    read, write = cache._read, cache._write
+    cache._read = lambda *args: threads.append(threading.get_ident()) or read(*args)
+    cache._write = lambda *args: threads.append(threading.get_ident()) or write(*args)
+
+    async def use():
+        await cache.put_async(key("a"), b"image")
+        return await cache.get_async(key("a"))
+
+    assert run(use()) == b"image"
+    assert len(threads) == 2
+    assert not threading.get_ident() in threads
+
+
+def canvas_client(cache):
+    session = FakeSession(lambda request: canvas_response(GIF))
+    client = randomstuff.AsyncClient(api_key="key", session=session, canvas_cache=cache)
+    return client, session
+
+
+def test_client_counts_hits_and_misses():
+    cache = randomstuff.CanvasCache()
+    client, session = canvas_client(cache)
+
+    async def calls():
+        first = await client.canvas("trigger", img1="a")
+        second = await client.canvas("TRIGGER", img1="a")
+        image = await client.canvas_image("trigger", img1="a")
+        other = await client.canvas("trigger", img1="b")
+        return first.read(), second.read(), bytes(image), other.read()
+
+    assert run(calls()) == (GIF, GIF, GIF, GIF)
+    assert len(session.requests) == 2
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 2, 2)
+    assert stats.hit_rate == 0.5
+
+
+def test_client_reads_the_disk_tier_of_an_earlier_cache(tmp_path):
+    client, session = canvas_client(randomstuff.CanvasCache(directory=str(tmp_path)))
+    run(client.canvas("trigger", img1="a"))
+
+    cache = randomstuff.CanvasCache(directory=str(tmp_path))
+    client, session = canvas_client(cache)
+    assert run(client.canvas("trigger", img1="a")).read() == GIF
+    assert session.requests == []
+    assert cache.stats().disk_hits == 1
+
+
+def test_client_doesnt_cache_errors():
+    cache = randomstuff.CanvasCache()
+    session = FakeSession(lambda request: FakeResponse(503, b"down"))
+    client = randomstuff.AsyncClient(api_key="key", session=session, canvas_cache=cache)
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.canvas("trigger", img1="a"))
+    assert cache.stats().entries == 0
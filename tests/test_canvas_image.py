@@ -0,0 +1,74 @@
+import io
+import mmap
+
+import pytest
+
+import randomstuff
+from randomstuff.canvas import _Spool
+from fakes import FakeSession, canvas_response, run
+
+GIF = b"GIF89a" + bytes(range(256)) * 4
+
+
+def image_of(data: bytes, threshold, chunk: int = 100) -> randomstuff.CanvasImage:
+    spool = _Spool(threshold)
+    for start in range(0, len(data), chunk):
+        spool.write(data[start : start + chunk])
+    return randomstuff.CanvasImage("trigger", spool, 0.1)
+
+
+@pytest.mark.parametrize(
+    "threshold, mapped",
+    [(None, False), (len(GIF), False), (len(GIF) - 1, True), (0, True)],
+)
+def test_spool_threshold(threshold, mapped):
+    with image_of(GIF, threshold) as image:
+        assert image.mapped is mapped
+        assert isinstance(image.data.obj, mmap.mmap) is mapped
+        assert image.data.readonly
+        assert bytes(image) == GIF
+        assert len(image) == image.size == len(GIF)
+        assert image.content_type == "image/gif"
+        assert image.filename == "trigger.gif"
+
+
+def test_empty_image():
+    with image_of(b"", 0) as image:
+        assert not image.mapped
+        assert bytes(image) == b""
+        assert image.content_type == "application/octet-stream"
+
+
+@pytest.mark.parametrize("threshold, left_open", [(None, io.BytesIO), (0, mmap.mmap)])
+def test_close_with_live_slices(threshold, left_open):
+    image = image_of(GIF, threshold)
+    head = image.data[:4]
+    with pytest.raises(BufferError):
+        image.close()
+    assert bytes(head) == b"GIF8"
+    # The temporary file is closed even though the mapping can't be yet.
+    assert [type(owner) for owner in image._owners] == [left_open]
+
+    head.release()
+    image.close()
+    assert image._owners == ()
+
+
+def test_save_and_upload(tmp_path):
+    with image_of(GIF, 0) as image:
+        assert image.save(tmp_path / "image.gif") == len(GIF)
+        filename, data, content_type = image.upload()
+        assert (filename, bytes(data), content_type) == ("trigger.gif", GIF, "image/gif")
+        del data
+    assert (tmp_path / "image.gif").read_bytes() == GIF
+
+
+@pytest.mark.parametrize("threshold, mapped", [(None, False), (100, True)])
+def test_client_canvas_image(threshold, mapped):
+    session = FakeSession(lambda request: canvas_response(GIF, chunk_size=97))
+    client = randomstuff.AsyncClient(api_key="key", session=session)
+    image = run(client.canvas_image("Trigger", img1="a", spool_threshold=threshold))
+    with image:
+        assert image.method == "trigger"
+        assert image.mapped is mapped
+        assert bytes(image) == GIF
@@ -0,0 +1,224 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, canvas_response, run
+
+GIF = b"GIF89a" + bytes(range(256)) * 4
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+def canvas_server(delays=None, images=None, statuses=None):
+    """Answers canvas requests by `img1`, after its delay and with its image or status."""
+    delays, images, statuses = delays or {}, images or {}, statuses or {}
+
+    async def handler(request):
+        img1 = request.params.get("img1")
+        await asyncio.sleep(delays.get(img1, 0))
+        if img1 in statuses:
+            return FakeResponse(statuses[img1], b"error")
+        return canvas_response(images.get(img1, GIF))
+
+    return handler
+
+
+def client_for(handler, **kwargs):
+    return randomstuff.AsyncClient(api_key="key", session=FakeSession(handler), **kwargs)
+
+
+async def collect(client, jobs, *args, **kwargs):
+    kwargs.setdefault("executor", "thread")
+    return [result async for result in client.canvas_many(jobs, *args, **kwargs)]
+
+
+def trigger(img1, **kwargs):
+    return {"method": "trigger", "img1": img1, **kwargs}
+
+
+def test_results_are_yielded_as_they_finish():
+    client = client_for(canvas_server({"slow": 0.2, "medium": 0.1}))
+    jobs = [trigger("slow"), trigger("medium"), trigger("fast")]
+    results = run(collect(client, jobs))
+    assert [result.index for result in results] == [2, 1, 0]
+    assert all(result.ok and result.data == GIF for result in results)
+    assert results[0].content_type == "image/gif"
+
+
+def test_errors_are_stored_on_results():
+    client = client_for(canvas_server(statuses={"down": 503}))
+    jobs = [trigger("ok"), trigger("down"), {"method": "trigger"}, "nope"]
+    results = sorted(run(collect(client, jobs)), key=lambda result: result.index)
+    assert results[0].ok
+    assert isinstance(results[1].error, randomstuff.HTTPError)
+    assert isinstance(results[2].error, ValueError)
+    assert isinstance(results[3].error, ValueError)
+    assert [result.ok for result in results] == [True, False, False, False]
+
+
+def test_manifest_and_files(tmp_path):
+    client = client_for(canvas_server(images={"b": PNG}, statuses={"down": 503}))
+    jobs = [trigger("a", name="first"), trigger("b"), trigger("down")]
+    results = run(collect(client, jobs, str(tmp_path)))
+
+    by_index = {result.index: result for result in results}
+    assert by_index[0].path == str(tmp_path / "first.gif")
+    assert by_index[0].data is None
+    assert (tmp_path / "first.gif").read_bytes() == GIF
+    assert (tmp_path / "000001-trigger.png").read_bytes() == PNG
+
+    lines = (tmp_path / "manifest.jsonl").read_text().splitlines()
+    entries = {entry["index"]: entry for entry in map(json.loads, lines)}
+    assert len(entries) == 3
+    assert entries[0]["file"] == "first.gif"
+    assert entries[0]["method"] == "trigger"
+    assert entries[0]["img1"] == "a"
+    assert entries[0]["size"] == len(GIF)
+    assert entries[0]["content_type"] == "image/gif"
+    assert entries[0]["error"] is None
+    assert entries[1]["file"] == "000001-trigger.png"
+    assert entries[2]["file"] is None
+    assert "HTTPError" in entries[2]["error"]
+
+
+def test_no_manifest(tmp_path):
+    client = client_for(canvas_server())
+    run(collect(client, [trigger("a")], str(tmp_path), manifest=None))
+    assert os.listdir(tmp_path) == ["000000-trigger.gif"]
+
+
+@pytest.mark.parametrize("name", ["../x", "a/b", "/tmp/x", "..", ".", "", "a\\b"])
+def test_names_must_be_file_names(tmp_path, name):
+    client = client_for(canvas_server())
+    output = tmp_path / "out"
+    [result] = run(collect(client, [trigger("a", name=name)], str(output)))
+    assert isinstance(result.error, ValueError)
+    assert os.listdir(tmp_path) == ["out"]
+    assert os.listdir(output) == ["manifest.jsonl"]
+
+
+def test_duplicate_names_fail(tmp_path):
+    client = client_for(canvas_server(images={"b": PNG}))
+    jobs = [trigger("a", name="same"), trigger("b", name="same")]
+    results = sorted(run(collect(client, jobs, str(tmp_path))), key=lambda r: r.index)
+    assert results[0].ok
+    assert isinstance(results[1].error, ValueError)
+    assert sorted(os.listdir(tmp_path)) == ["manifest.jsonl", "same.gif"]
+
+
+class RecordingExecutor(concurrent.futures.ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_offload_threshold():
+    small, large = b"GIF89a", GIF * 16
+    client = client_for(canvas_server(images={"small": small, "large": large}))
+    executor = RecordingExecutor()
+    try:
+        results = run(
+            collect(
+                client,
+                [trigger("small"), trigger("large")],
+                executor=executor,
+                offload_threshold=len(GIF) * 4,
+            )
+        )
+    finally:
+        executor.shutdown()
+    assert executor.submitted == 1
+    assert sorted(result.size for result in results) == [len(small), len(large)]
+
+    executor = RecordingExecutor()
+    try:
+        run(collect(client, [trigger("large")], executor=executor, offload_threshold=None))
+    finally:
+        executor.shutdown()
+    assert executor.submitted == 0
+
+
+@pytest.mark.parametrize(
+    "output, expected", [(False, "ThreadPoolExecutor"), (True, "ProcessPoolExecutor")]
+)
+def test_default_executor(tmp_path, monkeypatch, output, expected):
+    created = []
+
+    def recording(name):
+        def create(*args, **kwargs):
+            created.append(name)
+            return RecordingExecutor()
+
+        return create
+
+    for name in ["ThreadPoolExecutor", "ProcessPoolExecutor"]:
+        monkeypatch.setattr(concurrent.futures, name, recording(name))
+    client = client_for(canvas_server())
+    output_dir = str(tmp_path) if output else None
+    results = run(
+        collect(client, [trigger("a")], output_dir, executor=None, offload_threshold=0)
+    )
+    assert results[0].ok
+    assert created == [expected]
+
+
+@pytest.mark.parametrize("executor", randomstuff.CANVAS_EXECUTORS)
+def test_offloaded_decoding(tmp_path, executor):
+    client = client_for(canvas_server(images={"b": PNG}))
+    jobs = [trigger("a"), trigger("b")]
+    results = run(
+        collect(client, jobs, str(tmp_path), executor=executor, offload_threshold=0)
+    )
+    assert all(result.ok for result in results)
+    assert (tmp_path / "000000-trigger.gif").read_bytes() == GIF
+    assert (tmp_path / "000001-trigger.png").read_bytes() == PNG
+
+    results = run(collect(client, jobs, executor=executor, offload_threshold=0))
+    assert sorted(result.data for result in results) == sorted([GIF, PNG])
+
+
+def test_invalid_arguments():
+    client = client_for(canvas_server())
+    with pytest.raises(ValueError):
+        run(collect(client, [], concurrency=0))
+    with pytest.raises(ValueError):
+        run(collect(client, [], executor="fiber"))
+
+
+def test_breaking_early_cancels_remaining_jobs():
+    started, cancelled = [], []
+
+    async def handler(request):
+        img1 = request.params["img1"]
+        started.append(img1)
+        try:
+            await asyncio.sleep(0 if img1 == "fast" else 10)
+        except asyncio.CancelledError:
+            cancelled.append(img1)
+            raise
+        return canvas_response(GIF)
+
+    def jobs():
+        yield trigger("fast")
+        for index in range(100):
+            yield trigger(f"slow-{index}")
+
+    async def consume():
+        client = client_for(handler)
+        results = client.canvas_many(jobs(), concurrency=4, executor="thread")
+        async for result in results:
+            assert result.ok
+            break
+        await results.aclose()
+
+    run(asyncio.wait_for(consume(), 5))
+    # Only the workers' jobs were started and those still running were cancelled.
+    assert len(started) <= 5
+    assert sorted(cancelled) == sorted(started[1:])
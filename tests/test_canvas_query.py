@@ -0,0 +1,97 @@
+import pytest
+
+import randomstuff
+from randomstuff._helper import _CANVAS_METHODS, _canvas_query
+
+A, B, C = "https://example.com/a.png", "https://example.com/b.png", "https://example.com/c.png"
+
+
+def test_every_method_has_an_entry():
+    assert sorted(method.name for method in _CANVAS_METHODS.values()) == sorted(
+        randomstuff.ALL_METHODS
+    )
+
+
+def test_one_image():
+    assert _canvas_query("trigger", img1=A) == {"method": "trigger", "img1": A}
+
+
+def test_two_images():
+    assert _canvas_query("kiss", img1=A, img2=B) == {
+        "method": "kiss",
+        "img1": A,
+        "img2": B,
+    }
+
+
+def test_three_images():
+    assert _canvas_query("distracted", img1=A, img2=B, img3=C) == {
+        "method": "distracted",
+        "img1": A,
+        "img2": B,
+        "img3": C,
+    }
+
+
+def test_text():
+    assert _canvas_query("changemymind", txt="Tabs") == {
+        "method": "changemymind",
+        "txt": "Tabs",
+    }
+
+
+def test_inputs_a_method_doesnt_take_are_dropped():
+    assert _canvas_query("trigger", img1=A, img2=B, txt="x") == {
+        "method": "trigger",
+        "img1": A,
+    }
+
+
+@pytest.mark.parametrize(
+    "method, inputs, message",
+    [
+        ("trigger", {}, "img1 is required for method trigger"),
+        ("kiss", {"img1": A}, "img1 and img2 are required for method kiss"),
+        ("kiss", {"img2": B}, "img1 and img2 are required for method kiss"),
+        (
+            "distracted",
+            {"img1": A, "img2": B},
+            "img1, img2 and img3 are required for method distracted",
+        ),
+        ("changemymind", {}, "txt is required for method changemymind"),
+    ],
+)
+def test_missing_inputs(method, inputs, message):
+    with pytest.raises(ValueError, match=f"^{message}$"):
+        _canvas_query(method, **inputs)
+
+
+@pytest.mark.parametrize("empty", [None, ""])
+@pytest.mark.parametrize(
+    "method, inputs, param",
+    [
+        ("trigger", {}, "img1"),
+        ("kiss", {"img1": A}, "img2"),
+        ("distracted", {"img1": A, "img2": B}, "img3"),
+        ("changemymind", {}, "txt"),
+    ],
+)
+def test_empty_inputs_are_missing(method, inputs, param, empty):
+    with pytest.raises(ValueError, match="required"):
+        _canvas_query(method, **{**inputs, param: empty})
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError, match="^Method not supported"):
+        _canvas_query("nope", img1=A)
+
+
+@pytest.mark.parametrize("method", ["trigger", "TRIGGER", "Trigger"])
+def test_methods_are_case_insensitive(method):
+    assert _canvas_query(method, img1=A)["method"] == "trigger"
+
+
+@pytest.mark.parametrize("method", ["jokeOverHead", "jokeoverhead", "JOKEOVERHEAD"])
+def test_camel_case_method_is_sent_as_documented(method):
+    assert "jokeOverHead" in randomstuff.ALL_METHODS
+    assert _canvas_query(method, img1=A) == {"method": "jokeOverHead", "img1": A}
@@ -0,0 +1,280 @@
+import base64
+import io
+import json
+import random
+
+import aiohttp
+import pytest
+
+import randomstuff
+from randomstuff.canvas import _Base64Stream, _write_canvas, _write_canvas_async
+from fakes import FakeSession, canvas_response, run
+
+
+def body_of(image: bytes, *, wrap: int = None, escape_slashes: bool = False, **extra):
+    encoded = base64.b64encode(image).decode()
+    if wrap:
+        encoded = "\n".join(
+            encoded[start : start + wrap] for start in range(0, len(encoded), wrap)
+        )
+    body = json.dumps([{**extra, "base64": encoded}])
+    if escape_slashes:
+        body = body.replace("/", "\\/")
+    return body.encode()
+
+
+def split(body: bytes, rng: random.Random):
+    chunks, start = [], 0
+    while start < len(body):
+        size = rng.choice([1, 2, 3, 4, 5, 7, 64, rng.randint(1, 300)])
+        chunks.append(body[start : start + size])
+        start += size
+    return chunks
+
+
+def decode(chunks) -> bytes:
+    stream = _Base64Stream()
+    data = b"".join(stream.feed(chunk) for chunk in chunks)
+    stream.close()
+    return data
+
+
+def test_random_chunk_boundaries():
+    rng = random.Random(0)
+    for _ in range(300):
+        image = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 2000)))
+        body = body_of(
+            image,
+            wrap=rng.choice([None, 60, 76, 3]),
+            escape_slashes=rng.random() < 0.5,
+            **rng.choice([{}, {"name": "x"}, {"url": "https://a/b"}]),
+        )
+        assert decode(split(body, rng)) == image
+
+
+def test_whole_body_in_one_chunk():
+    image = bytes(range(256)) * 8
+    assert decode([body_of(image, wrap=76, escape_slashes=True)]) == image
+
+
+def test_escape_split_across_chunks():
+    # Bytes whose base64 is all slashes.
+    image = b"\xff" * 30
+    body = body_of(image, escape_slashes=True)
+    index = body.index(b"\\/")
+    assert decode([body[: index + 1], body[index + 1 :]]) == image
+    assert decode([bytes([byte]) for byte in body]) == image
+
+
+def test_key_split_across_chunks():
+    image = b"GIF89a"
+    body = body_of(image)
+    index = body.index(b"base64")
+    for cut in range(index - 1, index + 8):
+        assert decode([body[:cut], body[cut:]]) == image
+
+
+def test_whitespace_around_colon():
+    body = b'[{"base64"  :\n  "' + base64.b64encode(b"image") + b'"}]'
+    assert decode([body[:12], body[12:]]) == b"image"
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'[{"url": "https://example.com"}]',
+        b"",
+        b"[]",
+    ],
+)
+def test_missing_base64_key(body):
+    stream = _Base64Stream()
+    assert stream.feed(body) == b""
+    with pytest.raises(ValueError):
+        stream.close()
+
+
+def test_base64_not_a_string():
+    with pytest.raises(ValueError):
+        decode([b'[{"base64": null}]'])
+
+
+def test_body_ending_inside_the_string():
+    body = body_of(b"image" * 10)
+    with pytest.raises(ValueError):
+        decode([body[: len(body) // 2]])
+
+
+def test_path_targets_are_reopened_for_every_attempt(tmp_path):
+    path = tmp_path / "image.gif"
+    long, short = b"GIF89a" + b"long" * 100, b"GIF89a"
+    assert _write_canvas([body_of(long)], path) == len(long)
+    assert _write_canvas([body_of(short)], str(path)) == len(short)
+    assert path.read_bytes() == short
+
+    with pytest.raises(ValueError):
+        _write_canvas([body_of(long)[:300]], path)
+    assert _write_canvas([body_of(short)], path) == len(short)
+    assert path.read_bytes() == short
+
+
+def test_path_targets_are_reopened_for_every_async_attempt(tmp_path):
+    path = tmp_path / "image.gif"
+    long, short = b"GIF89a" + b"long" * 100, b"GIF89a"
+
+    async def chunks(body):
+        for start in range(0, len(body), 50):
+            yield body[start : start + 50]
+
+    async def write():
+        with pytest.raises(ValueError):
+            await _write_canvas_async(chunks(body_of(long)[:300]), path)
+        return await _write_canvas_async(chunks(body_of(short)), path)
+
+    assert run(write()) == len(short)
+    assert path.read_bytes() == short
+
+
+def test_file_objects_are_not_closed():
+    target = io.BytesIO()
+    _write_canvas([body_of(b"image")], target)
+    assert not target.closed
+    assert target.getvalue() == b"image"
+
+
+def test_async_writers_are_drained():
+    class Writer:
+        def __init__(self):
+            self.data = b""
+            self.drains = 0
+
+        def write(self, data):
+            self.data += data
+
+        async def drain(self):
+            self.drains += 1
+
+    async def chunks():
+        yield body_of(b"image" * 100)
+
+    writer = Writer()
+    run(_write_canvas_async(chunks(), writer))
+    assert writer.data == b"image" * 100
+    assert writer.drains >= 1
+
+
+class _Broken:
+    """Content which fails half way through the body, like a dropped connection."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def iter_chunked(self, size: int):
+        yield self._body[: len(self._body) // 2]
+        raise aiohttp.ClientPayloadError("connection lost")
+
+
+def test_retried_download_rewrites_the_path(tmp_path):
+    image = b"GIF89a" + bytes(range(256)) * 4
+    attempts = []
+
+    def handler(request):
+        response = canvas_response(image)
+        if not attempts:
+            response.content = _Broken(response.body)
+        attempts.append(request)
+        return response
+
+    retry = randomstuff.RetryPolicy(
+        backoff_base=0, retry_on=(aiohttp.ClientPayloadError,)
+    )
+    client = randomstuff.AsyncClient(
+        api_key="key", session=FakeSession(handler), retry_policy=retry
+    )
+    path = tmp_path / "image.gif"
+    assert run(client.canvas("trigger", img1="a", save_to=str(path))) == len(image)
+    assert len(attempts) == 2
+    assert path.read_bytes() == image
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_retried_download_in_memory(cache):
+    image = b"GIF89a" + bytes(range(256)) * 4
+    attempts = []
+
+    def handler(request):
+        response = canvas_response(image)
+        if not attempts:
+            response.content = _Broken(response.body)
+        attempts.append(request)
+        return response
+
+    retry = randomstuff.RetryPolicy(
+        backoff_base=0, retry_on=(aiohttp.ClientPayloadError,)
+    )
+    client = randomstuff.AsyncClient(
+        api_key="key",
+        session=FakeSession(handler),
+        retry_policy=retry,
+        canvas_cache=randomstuff.CanvasCache() if cache else None,
+    )
+    assert run(client.canvas("trigger", img1="a")).read() == image
+    assert len(attempts) == 2
+
+
+def test_retried_download_rewinds_seekable_files(tmp_path):
+    image = b"GIF89a" + bytes(range(256)) * 4
+    attempts = []
+
+    def handler(request):
+        response = canvas_response(image)
+        if not attempts:
+            response.content = _Broken(response.body)
+        attempts.append(request)
+        return response
+
+    retry = randomstuff.RetryPolicy(
+        backoff_base=0, retry_on=(aiohttp.ClientPayloadError,)
+    )
+    client = randomstuff.AsyncClient(
+        api_key="key", session=FakeSession(handler), retry_policy=retry
+    )
+    with open(tmp_path / "image.gif", "w+b") as file:
+        file.write(b"header")
+        assert run(client.canvas("trigger", img1="a", save_to=file)) == len(image)
+    assert (tmp_path / "image.gif").read_bytes() == b"header" + image
+
+
+def test_retried_download_to_an_unseekable_writer_raises():
+    image = b"GIF89a" + bytes(range(256)) * 4
+    attempts = []
+
+    def handler(request):
+        response = canvas_response(image)
+        if not attempts:
+            response.content = _Broken(response.body)
+        attempts.append(request)
+        return response
+
+    class Pipe(io.RawIOBase):
+        def __init__(self):
+            self.data = b""
+
+        def writable(self):
+            return True
+
+        def write(self, data):
+            self.data += bytes(data)
+            return len(data)
+
+    retry = randomstuff.RetryPolicy(
+        backoff_base=0, retry_on=(aiohttp.ClientPayloadError,)
+    )
+    client = randomstuff.AsyncClient(
+        api_key="key", session=FakeSession(handler), retry_policy=retry
+    )
+    pipe = Pipe()
+    with pytest.raises(randomstuff.UnsupportedOperation):
+        run(client.canvas("trigger", img1="a", save_to=pipe))
+    assert len(attempts) == 2
+    assert len(pipe.data) < len(image)
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pathlib
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+JOKE = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/joke.json").read_text()
+)
+
+
+def limited_client(statuses=None, latency=0.01, **kwargs):
+    """Answers a joke after `latency`, or the next of `statuses` at once."""
+    statuses = iter(statuses or ())
+    state = {"in_flight": 0, "peak": 0}
+
+    async def handler(request):
+        status = next(statuses, 200)
+        if status != 200:
+            return FakeResponse(status, b"overloaded")
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            state["in_flight"] -= 1
+        return FakeResponse(json=JOKE)
+
+    limiter = randomstuff.ConcurrencyLimiter(**kwargs)
+    client = randomstuff.AsyncClient(
+        api_key="key", session=FakeSession(handler), concurrency_limiter=limiter
+    )
+    return client, limiter, state
+
+
+async def jokes(client, count):
+    return await asyncio.gather(
+        *(client.get_joke() for _ in range(count)), return_exceptions=True
+    )
+
+
+def test_limit_grows_while_it_is_used():
+    client, limiter, state = limited_client(initial_limit=2)
+
+    results = run(jokes(client, 40))
+    assert all(isinstance(result, randomstuff.Joke) for result in results)
+    stats = limiter.stats()
+    assert stats.limit > 2
+    assert stats.increases == stats.limit - 2
+    assert stats.decreases == 0
+    assert stats.in_flight == stats.queued == 0
+    assert state["peak"] <= stats.limit
+
+
+def test_limit_bounds_requests_in_flight():
+    client, limiter, state = limited_client(initial_limit=3, max_limit=3)
+
+    run(jokes(client, 12))
+    assert state["peak"] == 3
+    assert limiter.limit == 3
+
+
+def test_unused_limit_does_not_grow():
+    client, limiter, _ = limited_client(initial_limit=10)
+
+    async def calls():
+        for _ in range(10):
+            await client.get_joke()
+
+    run(calls())
+    assert limiter.limit == 10
+    assert limiter.stats().increases == 0
+
+
+def test_overload_cuts_the_limit_once_per_round_trip():
+    client, limiter, _ = limited_client([200, 503, 429, 429], initial_limit=8)
+
+    async def calls():
+        await client.get_joke()
+        assert isinstance((await jokes(client, 1))[0], randomstuff.HTTPError)
+        assert limiter.limit == 4
+        # Sent right after the cut, this says nothing new about the API.
+        assert isinstance((await jokes(client, 1))[0], randomstuff.RateLimited)
+        assert limiter.limit == 4
+        await asyncio.sleep(0.02)
+        await jokes(client, 1)
+        assert limiter.limit == 2
+
+    run(calls())
+    assert limiter.stats().decreases == 2
+
+
+def test_limit_is_not_cut_below_the_minimum():
+    client, limiter, _ = limited_client([503] * 3, initial_limit=4, min_limit=3)
+
+    async def calls():
+        for _ in range(3):
+            await jokes(client, 1)
+            await asyncio.sleep(0.02)
+
+    run(calls())
+    assert limiter.limit == 3
+
+
+def test_cancelled_waiters_pass_their_slot_on():
+    limiter = randomstuff.ConcurrencyLimiter(initial_limit=1)
+
+    async def calls():
+        await limiter._acquire()
+        handed = asyncio.create_task(limiter._acquire())
+        queued = asyncio.create_task(limiter._acquire())
+        left = asyncio.create_task(limiter._acquire())
+        await asyncio.sleep(0)
+        left.cancel()
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 2
+
+        # The slot is handed over, then the call cancelled before it runs.
+        limiter._release(0.01, None)
+        handed.cancel()
+        await asyncio.wait_for(queued, 1)
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 0
+
+    run(calls())
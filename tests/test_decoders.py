@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+import randomstuff
+
+BODY = json.dumps([{"response": "Grüße 👋"}], ensure_ascii=False).encode()
+
+
+def test_json_decodes_bytes():
+    decode = randomstuff.get_json_decoder("json")
+    assert decode is json.loads
+    assert decode(BODY) == [{"response": "Grüße 👋"}]
+
+
+def test_auto_decodes_bytes():
+    assert randomstuff.get_json_decoder()(BODY) == [{"response": "Grüße 👋"}]
+
+
+def test_callables_are_used_as_is():
+    decode = lambda body: body
+    assert randomstuff.get_json_decoder(decode) is decode
+
+
+def test_invalid_decoder():
+    with pytest.raises(ValueError):
+        randomstuff.get_json_decoder("yaml")
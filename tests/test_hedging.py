@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+
+def ai_server(delays=None, down=()):
+    """Answers AI requests after the delay of their server, 503 for servers in `down`."""
+    delays = delays or {}
+
+    async def handler(request):
+        server = request.params["server"]
+        await asyncio.sleep(delays.get(server, 0))
+        if server in down:
+            return FakeResponse(503, b"server down")
+        return FakeResponse(json=[{"response": f"from {server}"}])
+
+    return handler
+
+
+def hedged_client(handler, **kwargs):
+    kwargs.setdefault("initial_delay", 0.05)
+    policy = randomstuff.HedgePolicy(**kwargs)
+    session = FakeSession(handler)
+    client = randomstuff.AsyncClient(api_key="key", session=session, hedge_policy=policy)
+    return client, session
+
+
+def servers(session):
+    return [request.params["server"] for request in session.requests]
+
+
+def test_fast_answer_is_not_hedged():
+    client, session = hedged_client(ai_server())
+    response = run(client.get_ai_response("Hi"))
+    assert response.message == "from main"
+    assert servers(session) == ["main"]
+    assert client.metrics.get("hedges", "ai") == 0
+
+
+def test_hedge_wins_over_slow_primary():
+    client, session = hedged_client(ai_server({"main": 1}))
+    started = time.monotonic()
+    response = run(client.get_ai_response("Hi"))
+    assert time.monotonic() - started < 0.5
+    assert response.message == "from backup"
+    assert servers(session) == ["main", "backup"]
+    assert client.metrics.get("hedges", "ai") == 1
+    assert client.metrics.get("hedge_wins", "ai") == 1
+
+
+def test_primary_failing_fast_fails_over():
+    client, session = hedged_client(ai_server(down={"main"}))
+    response = run(client.get_ai_response("Hi"))
+    assert response.message == "from backup"
+    assert servers(session) == ["main", "backup"]
+    assert client.metrics.get("hedges", "ai") == 0
+    assert client.metrics.get("failovers", "ai") == 1
+
+
+def test_primary_failing_without_hedge_budget_fails_over():
+    client, session = hedged_client(
+        ai_server({"main": 0.1}, down={"main"}), budget=0, burst=0
+    )
+    response = run(client.get_ai_response("Hi"))
+    assert response.message == "from backup"
+    assert client.metrics.get("hedges", "ai") == 0
+
+
+def test_both_servers_failing_raises():
+    client, _ = hedged_client(ai_server({"main": 0.1}, down={"main", "backup"}))
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.get_ai_response("Hi"))
+
+
+def test_pinned_server_is_not_hedged():
+    client, session = hedged_client(ai_server({"backup": 0.2}))
+    response = run(client.get_ai_response("Hi", server="backup"))
+    assert response.message == "from backup"
+    assert servers(session) == ["backup"]
+
+
+def test_pinned_server_failing_is_not_failed_over():
+    client, session = hedged_client(ai_server(down={"backup"}))
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.get_ai_response("Hi", server="backup"))
+    assert servers(session) == ["backup"]
+
+
+def test_deadline_shorter_than_hedge_delay_doesnt_hedge():
+    client, session = hedged_client(ai_server({"main": 0.1}), initial_delay=1)
+
+    async def call():
+        with randomstuff.deadline(time.monotonic() + 0.5):
+            return await client.get_ai_response("Hi")
+
+    response = run(call())
+    assert response.message == "from main"
+    assert servers(session) == ["main"]
+    assert client.metrics.get("hedges", "ai") == 0
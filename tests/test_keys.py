@@ -0,0 +1,130 @@
+import asyncio
+import json
+import pathlib
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+JOKE = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/joke.json").read_text()
+)
+
+
+def key_server(limited=(), headers=None):
+    """Answers 429 for the keys in `limited` and a joke for the others."""
+
+    def handler(request):
+        if request.headers["Authorization"] in limited:
+            return FakeResponse(429, b"slow down", headers=headers or {})
+        return FakeResponse(json=JOKE)
+
+    return handler
+
+
+def pooled_client(handler, keys=("key-1", "key-2", "key-3"), **kwargs):
+    session = FakeSession(handler)
+    pool = randomstuff.KeyPool(keys, **kwargs)
+    return randomstuff.AsyncClient(key_pool=pool, session=session), session, pool
+
+
+def used_keys(session):
+    return [request.headers["Authorization"] for request in session.requests]
+
+
+def test_requests_rotate_across_keys():
+    client, session, pool = pooled_client(key_server())
+
+    async def calls():
+        for _ in range(6):
+            await client.get_joke()
+
+    run(calls())
+    assert sorted(used_keys(session)) == ["key-1"] * 2 + ["key-2"] * 2 + ["key-3"] * 2
+    assert all(usage.requests == 2 for usage in pool.usage().values())
+
+
+def test_rate_limited_key_is_rotated_away_from():
+    client, session, pool = pooled_client(key_server(limited={"key-1"}))
+
+    async def calls():
+        return [await client.get_joke() for _ in range(4)]
+
+    assert len(run(calls())) == 4
+    assert used_keys(session).count("key-1") == 1
+    assert client.metrics.get("key_rotations", "joke") == 1
+    usage = pool.usage()["key-1"]
+    assert usage.rate_limited == 1
+    assert usage.cooldown > 50
+
+
+def test_every_key_rate_limited_raises():
+    keys = {"key-1", "key-2", "key-3"}
+    client, session, _ = pooled_client(key_server(limited=keys))
+    with pytest.raises(randomstuff.RateLimited) as error:
+        run(client.get_joke())
+    assert not isinstance(error.value, randomstuff.RateLimitExceeded)
+    assert sorted(used_keys(session)) == sorted(keys)
+
+    # Every key is cooling down now, so the next call doesn't send anything.
+    with pytest.raises(randomstuff.RateLimited) as error:
+        run(client.get_joke())
+    assert error.value.retry_after > 50
+    assert len(session.requests) == 3
+
+
+@pytest.mark.parametrize(
+    "retry_after", ["0", "-5", "Wed, 21 Oct 2015 07:28:00 GMT"]
+)
+def test_zero_cooldown_doesnt_loop(retry_after):
+    keys = {"key-1", "key-2"}
+    client, session, pool = pooled_client(
+        key_server(limited=keys, headers={"Retry-After": retry_after}), keys=keys
+    )
+
+    async def call():
+        return await asyncio.wait_for(client.get_joke(), 2)
+
+    with pytest.raises(randomstuff.RateLimited):
+        run(call())
+    assert len(session.requests) == 2
+    assert all(usage.cooldown > 0.5 for usage in pool.usage().values())
+
+
+def test_client_side_rate_limit_isnt_rotated():
+    session = FakeSession(key_server())
+    client = randomstuff.AsyncClient(
+        key_pool=randomstuff.KeyPool(["key-1", "key-2"]),
+        session=session,
+        rate_limiter=randomstuff.RateLimiter(
+            limit=randomstuff.RateLimit(rate=1, burst=1), mode="reject"
+        ),
+    )
+
+    async def calls():
+        await client.get_joke()
+        await client.get_joke()
+
+    with pytest.raises(randomstuff.RateLimitExceeded):
+        run(calls())
+    assert len(session.requests) == 1
+    assert client.metrics.get("key_rotations", "joke") == 0
+
+
+def test_exhausted_budget_cools_the_key_down():
+    pool = randomstuff.KeyPool(["key-1", "key-2"])
+    pool.update(
+        "key-1", {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"}, 200
+    )
+    assert [pool.acquire() for _ in range(3)] == ["key-2"] * 3
+    assert pool.usage()["key-1"].cooldown > 25
+
+
+def test_invalid_pools():
+    with pytest.raises(ValueError):
+        randomstuff.KeyPool([])
+    with pytest.raises(ValueError):
+        randomstuff.KeyPool(["key", "key"])
+    with pytest.raises(randomstuff.InvalidPlanError):
+        randomstuff.KeyPool([("key", "platinum")])
@@ -0,0 +1,58 @@
+import json
+import pathlib
+
+import yarl
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+AI = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/ai.json").read_text()
+)
+
+CUSTOMISATION = {
+    "name": "Mia & Co",
+    "master": "Ahmad",
+    "gender": "Female",
+    "favorite_color": "Green/Blue",
+}
+
+
+def ai_client():
+    session = FakeSession(lambda request: FakeResponse(json=AI))
+    client = randomstuff.AsyncClient(api_key="key", version="5", session=session)
+    return client, session
+
+
+def sent_url(request):
+    """Returns the URL the request is sent to, the way aiohttp builds it."""
+    return yarl.URL(str(request.url), encoded=True).update_query(request.params)
+
+
+def test_persona_url_matches_the_baseline():
+    persona = randomstuff.BotPersona("pro", server="main", **CUSTOMISATION)
+    message = "Hi there, how are you? 100% & more"
+    client, session = ai_client()
+
+    async def calls():
+        await client.get_ai_response(
+            message, "pro", server="main", uid="user-1", **CUSTOMISATION
+        )
+        await client.get_ai_response(message, uid="user-1", persona=persona)
+
+    run(calls())
+    baseline, call = session.requests
+    assert call.params == {}
+    assert isinstance(call.url, yarl.URL)
+    assert sent_url(call).path == sent_url(baseline).path
+    assert dict(sent_url(call).query) == dict(sent_url(baseline).query)
+
+
+def test_persona_url_is_encoded_once():
+    persona = randomstuff.BotPersona(name="Mia")
+    client, session = ai_client()
+    run(client.get_ai_response("a+b c", uid="user-1", persona=persona))
+
+    (call,) = session.requests
+    assert "message=a%2Bb+c" in str(call.url)
+    assert call.url.query["message"] == "a+b c"
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import json
+import pathlib
+
+import pytest
+
+import randomstuff
+from randomstuff.prefetch import _PrefetchPool
+from fakes import FakeResponse, FakeSession, run
+
+JOKE = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/joke.json").read_text()
+)
+
+
+def joke_server(fail_after=None):
+    """Answers jokes with increasing ids, 503 after `fail_after` jokes."""
+    ids = itertools.count()
+
+    def handler(request):
+        joke_id = next(ids)
+        if fail_after is not None and joke_id >= fail_after:
+            return FakeResponse(503, b"down")
+        return FakeResponse(json={**JOKE, "id": joke_id})
+
+    return handler
+
+
+def prefetching_client(handler, cls=randomstuff.AsyncClient, **kwargs):
+    config = randomstuff.PrefetchConfig(**{"size": 4, "low_water": 1, **kwargs})
+    session = FakeSession(handler)
+    return cls(api_key="key", session=session, prefetch=config), session
+
+
+def test_prefill_fills_the_pool():
+    client, session = prefetching_client(joke_server())
+
+    async def use():
+        await client.prefill("get_joke", type="dev")
+        stats = client.prefetch_stats()[("joke", "dev", "")]
+        joke = await client.get_joke(type="dev")
+        return stats, joke
+
+    stats, joke = run(use())
+    assert stats.depth == 4
+    assert stats.refills == 1
+    assert joke.id == 0
+    assert all(request.params["type"] == "dev" for request in session.requests)
+
+
+def test_prefill_doesnt_call_the_public_method():
+    class Client(randomstuff.AsyncClient):
+        async def get_joke(self, *args, **kwargs):
+            joke = await super().get_joke(*args, **kwargs)
+            return joke.category.upper()
+
+    client, _ = prefetching_client(joke_server(), cls=Client)
+
+    async def use():
+        await client.prefill("get_joke")
+        return await client.get_joke()
+
+    assert run(use()) == JOKE["category"].upper()
+
+
+def test_prefill_raises_refill_errors():
+    client, _ = prefetching_client(joke_server(fail_after=2), concurrency=1)
+
+    async def use():
+        with pytest.raises(randomstuff.HTTPError):
+            await client.prefill("get_joke")
+        return client.prefetch_stats()[("joke", "any", "")]
+
+    stats = run(use())
+    assert stats.depth == 2
+    assert stats.errors == 1
+    assert stats.refills == 0
+
+
+def test_prefill_validates_arguments():
+    client, session = prefetching_client(joke_server())
+    with pytest.raises(randomstuff.InvalidType):
+        run(client.prefill("get_joke", type="nope"))
+    with pytest.raises(ValueError):
+        run(client.prefill("get_weather", "London"))
+    assert session.requests == []
+
+
+def test_prefill_requires_prefetching():
+    client = randomstuff.AsyncClient(api_key="key", session=FakeSession(joke_server()))
+    with pytest.raises(randomstuff.UnsupportedOperation):
+        run(client.prefill("get_joke"))
+
+
+def test_calls_are_answered_from_the_pool():
+    client, session = prefetching_client(joke_server())
+
+    async def use():
+        first = await client.get_joke()
+        await asyncio.sleep(0.05)
+        jokes = [await client.get_joke() for _ in range(3)]
+        return first, jokes
+
+    first, jokes = run(use())
+    assert first.id == 0
+    assert [joke.id for joke in jokes] == [1, 2, 3]
+    stats = client.prefetch_stats()[("joke", "any", "")]
+    assert (stats.hits, stats.misses) == (3, 1)
+
+
+def test_cancelled_refill_leaves_a_newer_one_alone():
+    async def slow():
+        await asyncio.sleep(0.01)
+        return object()
+
+    config = randomstuff.PrefetchConfig(size=2, low_water=1)
+    pool = _PrefetchPool(slow, config)
+
+    async def use():
+        first = pool.refill()
+        await asyncio.sleep(0)
+        pool.cancel()
+        second = pool.refill()
+        assert second is not first
+        await asyncio.gather(first, return_exceptions=True)
+        assert pool.task is second
+        await second
+        assert pool.task is None
+        assert len(pool.items) == 2
+
+    run(use())
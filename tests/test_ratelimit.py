@@ -0,0 +1,164 @@
+import json
+import pathlib
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+JOKE = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/joke.json").read_text()
+)
+
+
+class Clock:
+    """Stands in for the `time` module of the limiter, sleeping advances it."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000.0 + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(randomstuff.ratelimit, "time", clock)
+    return clock
+
+
+def test_burst_then_waits_for_tokens(clock):
+    limiter = randomstuff.RateLimiter(limit=randomstuff.RateLimit(rate=2, burst=3))
+
+    for _ in range(3):
+        limiter.acquire("joke")
+    assert clock.sleeps == []
+
+    limiter.acquire("joke")
+    limiter.acquire("joke")
+    assert clock.sleeps == pytest.approx([0.5, 0.5])
+
+
+def test_idle_time_refills_up_to_the_burst(clock):
+    limiter = randomstuff.RateLimiter(limit=randomstuff.RateLimit(rate=1, burst=2))
+
+    limiter.acquire("joke")
+    limiter.acquire("joke")
+    clock.now += 60
+    for _ in range(3):
+        limiter.acquire("joke")
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_endpoint_limits_apply_on_top(clock):
+    limiter = randomstuff.RateLimiter(
+        limit=randomstuff.RateLimit(rate=10, burst=10),
+        endpoints={"ai": randomstuff.RateLimit(rate=1, burst=1)},
+    )
+
+    limiter.acquire("ai")
+    limiter.acquire("joke")
+    assert clock.sleeps == []
+    limiter.acquire("ai")
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_reject_mode_raises_instead_of_waiting(clock):
+    limiter = randomstuff.RateLimiter(
+        limit=randomstuff.RateLimit(rate=2, burst=1), mode="reject"
+    )
+
+    limiter.acquire("joke")
+    with pytest.raises(randomstuff.RateLimitExceeded) as info:
+        limiter.acquire("joke")
+    assert info.value.retry_after == pytest.approx(0.5)
+
+    # The rejected request took no token.
+    clock.now += 0.5
+    limiter.acquire("joke")
+    assert clock.sleeps == []
+
+
+def test_max_wait_rejects_long_waits(clock):
+    limiter = randomstuff.RateLimiter(
+        limit=randomstuff.RateLimit(rate=1, burst=1), max_wait=0.5
+    )
+
+    limiter.acquire("joke")
+    with pytest.raises(randomstuff.RateLimitExceeded):
+        limiter.acquire("joke")
+    clock.now += 0.6
+    limiter.acquire("joke")
+    assert clock.sleeps == pytest.approx([0.4])
+
+
+def test_remaining_header_clamps_the_bucket(clock):
+    limiter = randomstuff.RateLimiter(limit=randomstuff.RateLimit(rate=1, burst=10))
+
+    limiter.update("joke", {"X-RateLimit-Remaining": "1"}, 200)
+    limiter.acquire("joke")
+    limiter.acquire("joke")
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_exhausted_quota_pauses_until_the_reset(clock):
+    limiter = randomstuff.RateLimiter(limit=randomstuff.RateLimit(rate=10, burst=10))
+
+    limiter.update(
+        "joke", {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "5"}, 200
+    )
+    limiter.acquire("joke")
+    assert clock.sleeps == pytest.approx([5.0])
+
+    reset = clock.time() + 3
+    limiter.update(
+        "joke", {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}, 200
+    )
+    limiter.acquire("joke")
+    assert clock.sleeps[-1] == pytest.approx(3.0)
+
+
+def test_429_pauses_for_retry_after(clock):
+    limiter = randomstuff.RateLimiter(limit=randomstuff.RateLimit(rate=10, burst=10))
+
+    limiter.update("joke", {"Retry-After": "7"}, 429)
+    limiter.acquire("joke")
+    assert clock.sleeps == pytest.approx([7.0])
+
+
+def test_client_feeds_response_headers_to_the_limiter(clock):
+    responses = iter(
+        [
+            FakeResponse(
+                json=JOKE,
+                headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0.2"},
+            ),
+            FakeResponse(json=JOKE),
+        ]
+    )
+    limiter = randomstuff.RateLimiter(
+        limit=randomstuff.RateLimit(rate=10, burst=10), mode="reject"
+    )
+    client = randomstuff.AsyncClient(
+        api_key="key",
+        session=FakeSession(lambda request: next(responses)),
+        rate_limiter=limiter,
+    )
+
+    async def calls():
+        await client.get_joke()
+        with pytest.raises(randomstuff.RateLimitExceeded):
+            await client.get_joke()
+        clock.now += 0.2
+        await client.get_joke()
+
+    run(calls())
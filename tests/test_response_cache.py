@@ -0,0 +1,143 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import randomstuff
+from fakes import run
+
+
+def test_failed_fetch_is_raised_in_waiting_threads():
+    cache = randomstuff.ResponseCache({"weather": 60})
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        raise randomstuff.HTTPError("down", status=503)
+
+    errors = []
+
+    def lookup():
+        try:
+            cache.get_or_fetch("weather", "London", fetch)
+        except randomstuff.HTTPError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=lookup) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while cache.stats().coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 5
+    stats = cache.stats()
+    assert (stats.misses, stats.coalesced) == (1, 4)
+
+    # The failure isn't cached.
+    assert cache.get_or_fetch("weather", "London", lambda: "sunny") == "sunny"
+
+
+def test_successful_fetch_is_shared_by_waiting_threads():
+    cache = randomstuff.ResponseCache({"weather": 60})
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return "sunny"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_fetch("weather", "London", fetch))
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats().coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["sunny"] * 5
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_raised_in_waiting_tasks():
+    cache = randomstuff.ResponseCache({"weather": 60})
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise randomstuff.HTTPError("down", status=503)
+
+    async def lookups():
+        return await asyncio.gather(
+            *(cache.get_or_fetch_async("weather", "London", fetch) for _ in range(5)),
+            return_exceptions=True,
+        )
+
+    results = run(lookups())
+    assert len(calls) == 1
+    assert all(isinstance(result, randomstuff.HTTPError) for result in results)
+
+
+def test_memory_cache_length_excludes_expired_entries():
+    cache = randomstuff.MemoryCache()
+    now = time.time()
+    cache.set("old", 1, now - 10, now - 1)
+    cache.set("new", 2, now, now + 60)
+    assert len(cache) == 1
+    assert cache.get("old") is None
+    assert cache.get("new") == (2, now)
+
+
+def test_stats_size_excludes_expired_entries():
+    cache = randomstuff.ResponseCache({"weather": 0.05})
+    cache.get_or_fetch("weather", "London", lambda: "sunny")
+    assert cache.stats().size == 1
+    time.sleep(0.1)
+    assert cache.stats().size == 0
+
+
+def test_sqlite_backend_is_used_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "cache.db")
+    backend = randomstuff.SQLiteCache(path, timeout=2)
+    cache = randomstuff.ResponseCache({"weather": 60}, backend=backend)
+
+    # Another process holds the write lock for a while.
+    locker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    locker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, locker.rollback).start()
+
+    async def fetch():
+        return "sunny"
+
+    async def ticker(ticks):
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def use():
+        ticks = []
+        task = asyncio.ensure_future(ticker(ticks))
+        value = await cache.get_or_fetch_async("weather", "London", fetch)
+        task.cancel()
+        return value, ticks, await cache.stats_async()
+
+    value, ticks, stats = run(use())
+    assert value == "sunny"
+    # The loop kept running while the write waited for the lock.
+    assert len(ticks) > 10
+    assert stats.size == 1
+    assert cache.get_or_fetch("weather", "London", lambda: "rainy") == "sunny"
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import pathlib
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+JOKE = json.loads(
+    (pathlib.Path(__file__).parent.parent / "benchmarks/payloads/joke.json").read_text()
+)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the delays the client sleeps for without waiting."""
+    delays = []
+    sleep = asyncio.sleep
+
+    async def record(delay, *args, **kwargs):
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(randomstuff.client.asyncio, "sleep", record)
+    return delays
+
+
+def retrying_client(responses, **kwargs):
+    responses = iter(responses)
+    session = FakeSession(lambda request: next(responses))
+    policy = randomstuff.RetryPolicy(**{"jitter": "none", **kwargs})
+    client = randomstuff.AsyncClient(api_key="key", session=session, retry_policy=policy)
+    return client, session
+
+
+def failure(status=503, retry_after=None):
+    headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+    return FakeResponse(status, b"try again", headers=headers)
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    policy = randomstuff.RetryPolicy(
+        backoff_base=0.5, backoff_factor=2, max_backoff=3, jitter="none"
+    )
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [
+        0.5,
+        1.0,
+        2.0,
+        3.0,
+        3.0,
+    ]
+
+
+@pytest.mark.parametrize("jitter, low", [("full", 0.0), ("equal", 2.0)])
+def test_jitter_stays_within_the_backoff(jitter, low):
+    policy = randomstuff.RetryPolicy(backoff_base=4, jitter=jitter)
+    delays = [policy.backoff(1) for _ in range(200)]
+    assert all(low <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_after_overrides_the_backoff_cap():
+    policy = randomstuff.RetryPolicy(backoff_base=1, max_backoff=2, jitter="none")
+    assert policy.backoff(1, retry_after=10) == 10
+    assert policy.backoff(3, retry_after=0.5) == 2
+
+    ignoring = randomstuff.RetryPolicy(
+        backoff_base=1, jitter="none", respect_retry_after=False
+    )
+    assert ignoring.backoff(1, retry_after=10) == 1
+
+
+def test_client_retries_with_the_backoff_schedule(sleeps):
+    client, session = retrying_client(
+        [failure(), failure(429), failure(), FakeResponse(json=JOKE)],
+        max_attempts=4,
+        backoff_base=0.5,
+    )
+
+    assert isinstance(run(client.get_joke()), randomstuff.Joke)
+    assert sleeps == [0.5, 1.0, 2.0]
+    assert len(session.requests) == 4
+    assert client.metrics.get("retries", "joke") == 3
+
+
+def test_client_waits_for_retry_after(sleeps):
+    client, _ = retrying_client(
+        [failure(429, retry_after=7), FakeResponse(json=JOKE)], backoff_base=0.5
+    )
+
+    run(client.get_joke())
+    assert sleeps == [7.0]
+
+
+def test_retries_stop_after_max_attempts(sleeps):
+    client, session = retrying_client([failure()] * 3, max_attempts=3)
+
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.get_joke())
+    assert len(session.requests) == 3
+    assert client.metrics.get("retries", "joke") == 2
+    assert client.metrics.get("retries_exhausted", "joke") == 1
+
+
+def test_retry_after_past_the_deadline_is_not_waited_for(sleeps):
+    client, session = retrying_client(
+        [failure(503, retry_after=60), FakeResponse(json=JOKE)], deadline=10
+    )
+
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.get_joke())
+    assert sleeps == []
+    assert len(session.requests) == 1
+
+
+def test_client_errors_are_not_retried(sleeps):
+    client, session = retrying_client([FakeResponse(401, b"bad key")])
+
+    with pytest.raises(randomstuff.BadAPIKey):
+        run(client.get_joke())
+    assert len(session.requests) == 1
+    assert sleeps == []
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+
+def scheduled_client(**kwargs):
+    """Returns a client whose first request holds the only slot until released."""
+    held = asyncio.Event()
+
+    async def handler(request):
+        if request.params["message"] == "hold":
+            await held.wait()
+        return FakeResponse(json=[{"response": "ok"}])
+
+    session = FakeSession(handler)
+    scheduler = randomstuff.RequestScheduler(max_concurrency=1, **kwargs)
+    client = randomstuff.AsyncClient(api_key="key", session=session, scheduler=scheduler)
+    return client, session, scheduler, held
+
+
+async def ask(client, message, tenant=None, priority=None):
+    with randomstuff.scheduling(tenant=tenant, priority=priority):
+        return await client.get_ai_response(message)
+
+
+async def send_queued(client, held, calls):
+    """Queues `calls` of (message, tenant, priority) behind a held request."""
+    hold = asyncio.create_task(ask(client, "hold"))
+    await asyncio.sleep(0)
+    tasks = []
+    for message, tenant, priority in calls:
+        tasks.append(asyncio.create_task(ask(client, message, tenant, priority)))
+        await asyncio.sleep(0)
+    held.set()
+    return await asyncio.gather(hold, *tasks, return_exceptions=True)
+
+
+def sent(session):
+    return [request.params["message"] for request in session.requests][1:]
+
+
+def test_higher_priorities_go_first():
+    client, session, scheduler, held = scheduled_client()
+
+    run(
+        send_queued(
+            client,
+            held,
+            [
+                ("low", None, "low"),
+                ("normal-1", None, None),
+                ("high", None, "high"),
+                ("normal-2", None, "normal"),
+            ],
+        )
+    )
+    assert sent(session) == ["high", "normal-1", "normal-2", "low"]
+    assert scheduler.stats().running == scheduler.stats().queued == 0
+
+
+def test_tenants_share_slots_fairly():
+    client, session, _, held = scheduled_client()
+
+    calls = [(f"a{index}", "a", None) for index in range(6)]
+    calls += [(f"b{index}", "b", None) for index in range(2)]
+    run(send_queued(client, held, calls))
+    assert sent(session) == ["a0", "b0", "a1", "b1", "a2", "a3", "a4", "a5"]
+
+
+def test_weights_split_slots():
+    client, session, _, held = scheduled_client(weights={"a": 2})
+
+    calls = [(f"a{index}", "a", None) for index in range(6)]
+    calls += [(f"b{index}", "b", None) for index in range(6)]
+    run(send_queued(client, held, calls))
+    assert [message[0] for message in sent(session)[:9]] == list("aabaabaab")
+
+
+def test_uid_is_the_default_tenant():
+    client, session, scheduler, held = scheduled_client()
+
+    async def calls():
+        hold = asyncio.create_task(ask(client, "hold"))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(client.get_ai_response(f"{uid}{index}", uid=uid))
+            for uid in ["x", "y"]
+            for index in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats().tenants == {"x": 2, "y": 2}
+        held.set()
+        await asyncio.gather(hold, *tasks)
+
+    run(calls())
+    assert sent(session) == ["x0", "y0", "x1", "y1"]
+
+
+def test_full_queue_rejects_new_requests():
+    client, session, scheduler, held = scheduled_client(max_queue=2)
+
+    results = run(
+        send_queued(client, held, [("1", None, None), ("2", None, None), ("3", None, None)])
+    )
+    assert isinstance(results[-1], randomstuff.QueueFull)
+    assert sent(session) == ["1", "2"]
+    assert scheduler.stats().rejected == 1
+
+
+def test_drop_oldest_makes_room():
+    client, session, scheduler, held = scheduled_client(
+        max_tenant_queue=2, overflow="drop_oldest"
+    )
+
+    results = run(
+        send_queued(client, held, [("1", "a", None), ("2", "a", None), ("3", "a", None)])
+    )
+    assert isinstance(results[1], randomstuff.QueueFull)
+    assert sent(session) == ["2", "3"]
+    assert scheduler.stats().dropped == 1
+
+
+def test_invalid_priority():
+    with pytest.raises(ValueError):
+        with randomstuff.scheduling(priority="urgent"):
+            pass
+
+
+def test_cancelled_waiters_pass_their_slot_on():
+    scheduler = randomstuff.RequestScheduler(max_concurrency=1)
+
+    async def calls():
+        await scheduler._acquire("a", "normal")
+        handed = asyncio.create_task(scheduler._acquire("a", "normal"))
+        queued = asyncio.create_task(scheduler._acquire("b", "normal"))
+        left = asyncio.create_task(scheduler._acquire("c", "normal"))
+        await asyncio.sleep(0)
+        left.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 2
+
+        # The slot is handed over, then the call cancelled before it runs.
+        scheduler._release()
+        handed.cancel()
+        await asyncio.wait_for(queued, 1)
+        assert scheduler.running == 1
+        assert scheduler.queue_depth == 0
+
+    run(calls())
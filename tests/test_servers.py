@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import randomstuff
+from fakes import FakeResponse, FakeSession, run
+
+
+def server_client(down=(), **kwargs):
+    """Answers 503 from the servers in `down`, which can be changed later."""
+    down = set(down)
+
+    def handler(request):
+        if request.params["server"] in down:
+            return FakeResponse(503, b"unavailable")
+        return FakeResponse(json=[{"response": request.params["server"]}])
+
+    session = FakeSession(handler)
+    selector = randomstuff.ServerSelector(**kwargs)
+    client = randomstuff.AsyncClient(
+        api_key="key", session=session, server_selector=selector
+    )
+    return client, session, selector, down
+
+
+def servers(session):
+    return [request.params["server"] for request in session.requests]
+
+
+def test_moving_averages():
+    selector = randomstuff.ServerSelector(alpha=0.5)
+    selector._bind("5")
+
+    selector.record_success("main", 1.0)
+    selector.record_success("main", 2.0)
+    selector.record_failure("main")
+    stats = selector.stats()["main"]
+    assert stats.latency == pytest.approx(1.5)
+    assert stats.error_rate == pytest.approx(0.5)
+    assert not stats.healthy
+    assert stats.requests == 3
+
+
+def test_much_faster_server_goes_first():
+    selector = randomstuff.ServerSelector(latency_factor=2.0)
+    selector._bind("5")
+
+    selector.record_success("main", 0.3)
+    selector.record_success("backup", 0.2)
+    assert selector.ranked() == ["main", "backup"]
+    selector.record_success("main", 1.5)
+    assert selector.ranked() == ["backup", "main"]
+
+
+def test_unhealthy_server_goes_last():
+    selector = randomstuff.ServerSelector()
+    selector._bind("5")
+
+    selector.record_success("backup", 5.0)
+    selector.record_failure("main")
+    assert selector.ranked() == ["backup", "main"]
+
+
+def test_failing_server_fails_over():
+    client, session, selector, _ = server_client(down={"main"}, probe_interval=None)
+
+    async def calls():
+        first = await client.get_ai_response("Hi")
+        second = await client.get_ai_response("Hi")
+        return first, second
+
+    first, second = run(calls())
+    assert first.response == second.response == "backup"
+    # Main is unhealthy after the first failure, so the second call goes to backup.
+    assert servers(session) == ["main", "backup", "backup"]
+    assert client.metrics.get("failovers", "ai") == 1
+    assert not selector.stats()["main"].healthy
+
+
+def test_last_server_failing_raises():
+    client, session, _, _ = server_client(down={"main", "backup"}, probe_interval=None)
+
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.get_ai_response("Hi"))
+    assert servers(session) == ["main", "backup"]
+
+
+def test_explicit_server_is_not_failed_over():
+    client, session, _, _ = server_client(down={"main"}, probe_interval=None)
+
+    with pytest.raises(randomstuff.HTTPError):
+        run(client.get_ai_response("Hi", server="main"))
+    assert servers(session) == ["main"]
+
+
+def test_probe_brings_a_recovered_server_back():
+    # Only health decides the order here, not how fast the fake servers are.
+    client, session, selector, down = server_client(
+        down={"main"}, probe_interval=0.01, latency_factor=1e6
+    )
+
+    async def calls():
+        await client.get_ai_response("Hi")
+        assert selector.ranked() == ["backup", "main"]
+        down.clear()
+        while not selector.stats()["main"].healthy:
+            await asyncio.sleep(0.01)
+        response = await client.get_ai_response("Hi")
+        await client.close()
+        return response
+
+    response = run(asyncio.wait_for(calls(), 5))
+    assert response.response == "main"
+    assert any(request.params["message"] == "ping" for request in session.requests)
+    assert client.metrics.get("probes", "ai") >= 1
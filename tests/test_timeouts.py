@@ -0,0 +1,81 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+import randomstuff
+from randomstuff.timeouts import _remaining, _resolve_timeout
+from fakes import FakeResponse, FakeSession, run
+
+
+def test_nested_deadlines_only_get_earlier():
+    now = time.monotonic()
+    with randomstuff.deadline(now + 10):
+        with randomstuff.deadline(now + 20):
+            assert _remaining() <= 10
+        with randomstuff.deadline(now + 5):
+            assert _remaining() <= 5
+    assert _remaining() is None
+
+
+def test_timeouts_are_capped_by_the_deadline():
+    config = randomstuff.TimeoutConfig(connect=10, read=30, total=60)
+    with randomstuff.deadline(time.monotonic() + 2):
+        timeout = _resolve_timeout(config)
+    assert timeout.connect <= 2 and timeout.read <= 2 and timeout.total <= 2
+
+
+def test_request_timeout_overrides_some_fields():
+    config = randomstuff.TimeoutConfig(connect=10, read=30, total=60)
+    with randomstuff.request_timeout(read=5):
+        timeout = _resolve_timeout(config)
+    assert (timeout.connect, timeout.read, timeout.total) == (10, 5, 60)
+
+
+def test_passed_deadline_raises():
+    with randomstuff.deadline(time.monotonic() - 1):
+        with pytest.raises(randomstuff.DeadlineExceeded):
+            _resolve_timeout(randomstuff.TimeoutConfig())
+
+
+def test_deadline_follows_tasks_but_not_threads():
+    seen = {}
+
+    def in_thread(name):
+        seen[name] = _remaining()
+
+    async def use():
+        with randomstuff.deadline(time.monotonic() + 10):
+            seen["task"] = await asyncio.ensure_future(asyncio.sleep(0, _remaining()))
+            thread = threading.Thread(target=in_thread, args=("thread",))
+            thread.start()
+            thread.join()
+            context = contextvars.copy_context()
+            thread = threading.Thread(
+                target=context.run, args=(in_thread, "copied thread")
+            )
+            thread.start()
+            thread.join()
+
+    run(use())
+    assert seen["task"] is not None
+    assert seen["thread"] is None
+    assert seen["copied thread"] is not None
+
+
+def test_deadline_bounds_requests():
+    async def slow(request):
+        await asyncio.sleep(1)
+        return FakeResponse(json={})
+
+    client = randomstuff.AsyncClient(api_key="key", session=FakeSession(slow))
+
+    async def call():
+        with randomstuff.deadline(time.monotonic() + 0.05):
+            await asyncio.sleep(0.1)
+            await client.get_joke()
+
+    with pytest.raises(randomstuff.DeadlineExceeded):
+        run(call())
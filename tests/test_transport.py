@@ -0,0 +1,35 @@
+import asyncio
+import gc
+import weakref
+
+import randomstuff
+from randomstuff import transport
+
+
+def test_shared_session_is_per_loop():
+    async def use():
+        first = randomstuff.shared_session()
+        second = randomstuff.shared_session()
+        await randomstuff.close_shared_session()
+        return first, second
+
+    first, second = asyncio.run(use())
+    assert first is second
+    assert first.closed
+
+
+def test_closed_loops_are_released():
+    loops = []
+
+    async def use():
+        loops.append(weakref.ref(asyncio.get_running_loop()))
+        # Closed without close_shared_session, so the entry is left behind.
+        await randomstuff.shared_session().close()
+
+    for _ in range(5):
+        asyncio.run(use())
+    asyncio.run(randomstuff.close_shared_session())
+    gc.collect()
+
+    assert transport._shared_sessions == {}
+    assert all(loop() is None for loop in loops)